@@ -0,0 +1,170 @@
+"""
+Headless Runner
+===============
+Runs TeoModel from the command line without the visualization server:
+    python3 -m first_abm run --ticks 120 --params params.json --seed 1 --out run.npz
+
+--params takes a JSON file or an inline JSON object with TeoModel parameters,
+missing parameters default to the values of the web interface. --out writes
+the model variables to an .npz file (like the batch runner) or a .csv file;
+with --agents the agent-level variables are collected as well and --archive
+writes them to a run archive (see archive.py). Neither mesa's visualization
+modules nor pandas are imported, so the runner starts fast enough to be used
+as the worker of batch and cluster jobs. A throughput summary is printed to
+stderr at the end, --summary additionally writes it as JSON.
+
+`python3 -m first_abm stream --port 8522` serves the streaming web interface
+(see streaming.py) instead.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import numpy as np
+
+
+DEFAULT_PARAMETERS = {
+    'n_contributors': 60,
+    'n_char_sponsors': 20,
+    'n_ver_sponsors': 10,
+    'n_investors': 10,
+    'buffer_share': 20,
+    'exchange_reward_share': 20,
+    'new_user_growth': 10,
+    'churn_prob': 5,
+    'months_with_growth': 96,
+    'store_data': False,
+}
+
+
+def load_parameters(params):
+    """ Return the TeoModel parameters of a JSON file or an inline JSON object. """
+    parameters = dict(DEFAULT_PARAMETERS)
+    if params is None:
+        return parameters
+    if os.path.exists(params):
+        with open(params) as params_file:
+            parameters.update(json.load(params_file))
+    else:
+        parameters.update(json.loads(params))
+    return parameters
+
+
+def write_model_vars(model_vars, ticks, path):
+    """ Write the model variables to an .npz or a .csv file.
+    Args:
+        model_vars: Dictionary mapping model variables to lists of values.
+        ticks: Tick of every collected value, the model's schedule.steps after
+               the step it was collected in, like the output sinks use.
+        path: File name, the extension selects the format.
+    """
+    names = list(model_vars.keys())
+    if path.endswith('.npz'):
+        np.savez(path, meta=json.dumps({'names': names}), tick=np.asarray(ticks, dtype=np.int64),
+                 **{'var_%d' % i: np.asarray(model_vars[name]) for i, name in enumerate(names)})
+    elif path.endswith('.csv'):
+        with open(path, 'w', newline='') as out_file:
+            writer = csv.writer(out_file)
+            writer.writerow(['tick'] + names)
+            writer.writerows([tick] + list(values) for tick, values in
+                             zip(ticks, zip(*(model_vars[name] for name in names))))
+    else:
+        raise Exception("Unknown output format, use .npz or .csv: " + path)
+
+
+def run(args):
+    from .model import TeoModel
+    parameters = load_parameters(args.params)
+    parameters['collect_agents'] = args.agents or args.archive is not None
+    if args.seed is not None:
+        parameters['seed'] = args.seed
+    if args.timing or args.trace is not None:
+        parameters['timing'] = True
+    if args.trace is not None:
+        parameters['trace'] = True
+    if args.engine is not None:
+        parameters['engine'] = args.engine
+
+    start = time.perf_counter()
+    model = TeoModel(**parameters)
+    init_time = time.perf_counter() - start
+    agent_steps = 0
+    ticks = []
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        agent_steps += model.schedule.get_customer_count()
+        model.step()
+        ticks.append(model.schedule.steps)
+    run_time = time.perf_counter() - start
+    model.close()
+
+    if args.out is not None:
+        write_model_vars(model.datacollector.model_vars, ticks, args.out)
+    if args.archive is not None:
+        from .archive import write_archive
+        write_archive(model.datacollector, args.archive)
+    if args.trace is not None:
+        model.export_chrome_trace(args.trace)
+
+    summary = {
+        'ticks': args.ticks,
+        'init_s': init_time,
+        'run_s': run_time,
+        'ticks_per_s': args.ticks / run_time if run_time > 0 else None,
+        'agent_steps_per_s': agent_steps / run_time if run_time > 0 else None,
+        'final_customers': model.schedule.get_customer_count(),
+    }
+    sys.stderr.write('%d ticks in %.2fs (init %.2fs): %.2f ticks/s, %.0f agent steps/s, %d customers at the end\n' % (
+        args.ticks, run_time, init_time, summary['ticks_per_s'] or 0, summary['agent_steps_per_s'] or 0,
+        summary['final_customers']))
+    if args.summary is not None:
+        with open(args.summary, 'w') as summary_file:
+            json.dump(summary, summary_file, indent=2)
+    return summary
+
+
+def stream(args):
+    from .charts import page_charts, page_params
+    from .model import TeoModel
+    from .streaming import StreamingServer
+    server = StreamingServer(TeoModel, page_charts(args.distributions), "Teo Model",
+                             page_params(args.distributions), max_points=args.max_points)
+    server.launch(args.port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m first_abm', description='Run TeoModel without the web interface.')
+    commands = parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser('run', help='Run a single model.')
+    run_parser.add_argument('--ticks', type=int, default=120, help='Number of ticks to run.')
+    run_parser.add_argument('--params', help='JSON file or inline JSON object with TeoModel parameters.')
+    run_parser.add_argument('--seed', type=int, help='Seed of the random number generator.')
+    run_parser.add_argument('--out', help='File for the model variables, .npz or .csv.')
+    run_parser.add_argument('--agents', action='store_true', help='Collect the agent-level variables.')
+    run_parser.add_argument('--archive', help='Directory to archive the collected data to.')
+    run_parser.add_argument('--engine', choices=['object', 'vector', 'cohort'],
+                            help='Step customer objects, all customers with array operations or cohorts of customers.')
+    run_parser.add_argument('--timing', action='store_true', help='Record the phase timings of every tick.')
+    run_parser.add_argument('--trace', help='File for a Chrome trace of the phase timings, implies --timing.')
+    run_parser.add_argument('--summary', help='File to write the throughput summary to as JSON.')
+    stream_parser = commands.add_parser('stream', help='Serve the streaming web interface.')
+    stream_parser.add_argument('--port', type=int, default=8522, help='Port of the web interface.')
+    stream_parser.add_argument('--max-points', type=int, default=1000,
+                               help='Number of min/max buckets the charts are decimated to.')
+    stream_parser.add_argument('--distributions', action='store_true',
+                               help='Collect and chart the per-type distributions of the wallets and surpluses.')
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'stream':
+        stream(args)
+    else:
+        parser.print_help()
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,10 @@
 from mesa import Agent
 from .model import get_exchange_reward_per_euro, get_contribution_reward_per_hour, get_exchanged_euros
 from .model import get_total_teos, get_total_euros, get_total_hours
-import random
+from .state import StateField
+from .clearing import clear_exchanges, order_volume
+from .engine import split_partial_exits
+from .register import ActionRegister
 import numpy as np
 
 EXIT_PROBABILITY = 0.05
@@ -11,8 +14,18 @@ class Teo(Agent):
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
         self.model = model
-        self.action_register = []
+        self.action_register = ActionRegister()
         
+    def _volume(self, rows, values):
+        """Returns the total value of actions of several rows, counting every member of a cohort.
+
+        Args:
+            rows (ndarray): Row indices of the agents in the AgentState.
+            values (ndarray): Value per member of each row.
+
+        """
+        return (values * self.model.schedule.state.weight[rows]).sum()
+
     def register_deposit(self, agent, value):
         """Registers intended deposit value of an agent in the action-register.
 
@@ -21,20 +34,16 @@ class Teo(Agent):
             value (int): Intendend deposit value in euro.
 
         """
-        action = {
-            'unique_id': agent.unique_id,
-            'action': 'deposit',
-            'value': value
-        }
-        self.action_register.append(action)
+        self.action_register['deposit'].append(agent.row, value)
         
     def execute_deposits(self):
         """Executes all deposit actions from the action-register.
       
         """
-        deposits = [v for v in self.action_register if v['action'] == 'deposit']
-        for deposit in deposits:
-            self.model.schedule.agents_by_type['Customer'][deposit['unique_id']].euro_wallet += deposit['value']
+        deposits = self.action_register['deposit']
+        state = self.model.schedule.state
+        np.add.at(state.euro_wallet, deposits.rows, deposits.values)
+        self.model.schedule.ledger.record(euros=self._volume(deposits.rows, deposits.values))
 
     def register_sponsorship(self, agent, value):
         """Registers the intended sponsorship teos of an agent in the action-register
@@ -46,21 +55,16 @@ class Teo(Agent):
 
         """
         if value <= agent.teo_wallet - agent.staged_teo:
-            action = {
-                'unique_id': agent.unique_id,
-                'action': 'sponsorship',
-                'value': value
-            }
-            self.action_register.append(action)
+            self.action_register['sponsorship'].append(agent.row, value)
             agent.staged_teo += value       
             
     def execute_sponsorship(self):
         """Executes all sponsorship actions from the action-register.
       
         """
-        sponsorships = [v for v in self.action_register if v['action'] == 'sponsorship']
-        for sponsorship in sponsorships:
-            self.model.schedule.agents_by_type['Customer'][sponsorship['unique_id']].staged_teo += sponsorship['value']
+        sponsorships = self.action_register['sponsorship']
+        state = self.model.schedule.state
+        np.add.at(state.staged_teo, sponsorships.rows, sponsorships.values)
             
     def register_contribution(self, agent, value):
         """Registers the intended contribution hours of an agent in the action-register
@@ -72,21 +76,17 @@ class Teo(Agent):
 
         """
         if value <= agent.hour_wallet:
-            action = {
-                'unique_id': agent.unique_id,
-                'action': 'contribution',
-                'value': value
-            }
-            self.action_register.append(action)
+            self.action_register['contribution'].append(agent.row, value)
             
     def execute_contribution(self):
         """Executes all contribution actions from the action-register.
         
         """
-        contributions = [v for v in self.action_register if v['action'] == 'contribution']
-        for contribution in contributions:
-            self.model.schedule.agents_by_type['Customer'][contribution['unique_id']].hour_wallet -= contribution['value']
-            self.model.schedule.agents_by_type['Customer'][contribution['unique_id']].contributed_hours += contribution['value']
+        contributions = self.action_register['contribution']
+        state = self.model.schedule.state
+        np.subtract.at(state.hour_wallet, contributions.rows, contributions.values)
+        np.add.at(state.contributed_hours, contributions.rows, contributions.values)
+        self.model.schedule.ledger.record(hours=self._volume(contributions.rows, contributions.values))
 
     def register_withdraw(self, agent, value):
         """Registers the intended withdraw value of an agent in the action-register
@@ -98,23 +98,20 @@ class Teo(Agent):
 
         """
         if value <= agent.euro_wallet - agent.staged_euro and self.model.schedule.steps - agent.last_withdraw_tick >= 2:
-            action = {
-                'unique_id': agent.unique_id,
-                'action': 'withdraw',
-                'value': value
-            }
-            self.action_register.append(action)
+            self.action_register['withdraw'].append(agent.row, value)
             agent.staged_euro += value
         
     def execute_withdraws(self):
         """Executes all withdraw actions from the action-register.
         
         """
-        withdraws = [v for v in self.action_register if v['action'] == 'withdraw']
-        for withdraw in withdraws:
-            self.model.schedule.agents_by_type['Customer'][withdraw['unique_id']].euro_wallet -= withdraw['value']
-            self.model.schedule.agents_by_type['Customer'][withdraw['unique_id']].withdrawn_euros += withdraw['value']
-            self.model.schedule.agents_by_type['Customer'][withdraw['unique_id']].last_withdraw_tick = self.model.schedule.steps
+        withdraws = self.action_register['withdraw']
+        state = self.model.schedule.state
+        np.subtract.at(state.euro_wallet, withdraws.rows, withdraws.values)
+        np.add.at(state.withdrawn_euros, withdraws.rows, withdraws.values)
+        state.last_withdraw_tick[withdraws.rows] = self.model.schedule.steps
+        self.model.events.log_many('withdraw', state.agent_id[withdraws.rows], withdraws.values)
+        self.model.schedule.ledger.record(euros=-self._volume(withdraws.rows, withdraws.values))
 
     def register_euro_exchange(self, agent, value):
         """Registers the intended euro->teo exchange value of an agent in the action-register
@@ -126,12 +123,7 @@ class Teo(Agent):
 
         """
         if value <= agent.euro_wallet - agent.staged_euro:
-            action = {
-                'unique_id': agent.unique_id,
-                'action': 'euro_exchange',
-                'value': value
-            }
-            self.action_register.append(action)
+            self.action_register['euro_exchange'].append(agent.row, value)
             agent.staged_euro += value
             
     def register_teo_exchange(self, agent, value):
@@ -144,12 +136,7 @@ class Teo(Agent):
 
         """
         if value <= agent.teo_wallet - agent.staged_teo:
-            action = {
-                'unique_id': agent.unique_id,
-                'action': 'teo_exchange',
-                'value': value
-            }
-            self.action_register.append(action)
+            self.action_register['teo_exchange'].append(agent.row, value)
             agent.staged_teo += value
             
     def execute_exchanges(self):
@@ -158,63 +145,74 @@ class Teo(Agent):
         If the teo-exchange amount > euro-exchange amount, first all euro-to-teo exchanges are
         executed, then teo-to-euro exchanges are executed randomly until the exchanged amount exceeds
         the exchangeable euro amount. The last exchange is potentially done only partially. 
+        The matching is done on arrays by clear_exchanges and the wallet updates are applied in bulk.
+        A cohort row places one order for all its members, its fill is shared equally.
         
         """
-        #TODO: make this nicer and less verbose!
-        exchanged_euros = 0
-        exchanged_teos = 0
-        
-        euro_exchanges = [v for v in self.action_register if v['action'] == 'euro_exchange']
-        teo_exchanges = [v for v in self.action_register if v['action'] == 'teo_exchange']
-    
-        if len(teo_exchanges) == 0 or len(euro_exchanges) == 0 or \
-        (sum([v['value'] for v in teo_exchanges]) == 0 and sum([v['value'] for v in euro_exchanges]) == 0):
+        euro_exchanges = self.action_register['euro_exchange']
+        teo_exchanges = self.action_register['teo_exchange']
+        if len(teo_exchanges) == 0 or len(euro_exchanges) == 0:
             return
+
+        state = self.model.schedule.state
+        euro_rows, teo_rows = euro_exchanges.rows, teo_exchanges.rows
+        euro_weights, teo_weights = state.weight[euro_rows], state.weight[teo_rows]
+        euro_values = euro_exchanges.values * euro_weights
+        teo_values = teo_exchanges.values * teo_weights
+        euro_exchange_volume = order_volume(euro_values)
+        teo_exchange_volume = order_volume(teo_values)
+        if teo_exchange_volume == 0 and euro_exchange_volume == 0:
+            return
+
+        euro_filled, teo_filled = clear_exchanges(euro_values, teo_values, self.model.rng.permutation)
+        # fill per member, orders that are filled completely keep their exact value
+        euro_filled = np.where(euro_filled == euro_values, euro_exchanges.values, euro_filled / euro_weights)
+        teo_filled = np.where(teo_filled == teo_values, teo_exchanges.values, teo_filled / teo_weights)
+        euro_values, teo_values = euro_exchanges.values, teo_exchanges.values
+        if self.model.events.enabled['partial_fill']:
+            for rows, values, filled in ((euro_rows, euro_values, euro_filled), (teo_rows, teo_values, teo_filled)):
+                partial = (filled > 0) & (filled < values)
+                self.model.events.log_many('partial_fill', state.agent_id[rows[partial]], filled[partial])
+        if self.model.engine == 'cohort':
+            euro_rows, euro_filled = split_partial_exits(self.model, euro_rows, euro_values, euro_filled)
+            teo_rows, teo_filled = split_partial_exits(self.model, teo_rows, teo_values, teo_filled)
+        #the side that is filled completely is transferred first
+        if euro_exchange_volume >= teo_exchange_volume:
+            self._transfer_teos(teo_rows, teo_filled)
+            self._transfer_euros(euro_rows, euro_filled)
         else:
-            teo_exchange_volume = sum([v['value'] for v in teo_exchanges])
-            euro_exchange_volume = sum([v['value'] for v in euro_exchanges])
-            #in the case that euro register is larger, fullfill euro exchanges in random order until teo amount reached
-            if euro_exchange_volume >= teo_exchange_volume:
-                # transfer money for all agents in teo register
-                for exchange in teo_exchanges:
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].teo_wallet -= exchange['value']
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].euro_wallet += exchange['value']
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].exchanged_teos += exchange['value']
-                # fullfill euro exchanges in random order until total teo amount is reached
-                random.shuffle(euro_exchanges)
-                for exchange in euro_exchanges:
-                    if exchanged_euros + exchange['value'] > teo_exchange_volume:
-                        remaining_euros = teo_exchange_volume - exchanged_euros
-                        self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].euro_wallet -= remaining_euros
-                        self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].teo_wallet += remaining_euros
-                        self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].exchanged_euros += remaining_euros
-                        break
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].euro_wallet -= exchange['value']
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].teo_wallet += exchange['value']
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].exchanged_euros += exchange['value']
-                    exchanged_euros += exchange['value']
-            #in the case that teo register is larger, fullfill teo exchanges in random order until euro amount reached      
-            else:
-                # transfer money for all agents in euro register
-                for exchange in euro_exchanges:
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].euro_wallet -= exchange['value']
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].teo_wallet += exchange['value']
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].exchanged_euros += exchange['value']
-                # fullfill euro exchanges in random order until total teo amount is reached
-                random.shuffle(teo_exchanges)
-                for exchange in teo_exchanges:
-                    if exchanged_teos + exchange['value'] > euro_exchange_volume:
-                        remaining_teos = euro_exchange_volume - exchanged_teos
-                        self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].teo_wallet -= remaining_teos
-                        self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].euro_wallet += remaining_teos
-                        self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].exchanged_teos += remaining_teos
-
-                        break
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].teo_wallet -= exchange['value']
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].euro_wallet += exchange['value']
-                    self.model.schedule.agents_by_type['Customer'][exchange['unique_id']].exchanged_teos += exchange['value']
-
-                    exchanged_teos += exchange['value']
+            self._transfer_euros(euro_rows, euro_filled)
+            self._transfer_teos(teo_rows, teo_filled)
+
+    def _transfer_euros(self, rows, values):
+        """Exchanges euros for teos in the wallets of the given agents.
+
+        Args:
+            rows (ndarray): Row indices of the agents in the AgentState.
+            values (ndarray): Exchanged euros per agent.
+
+        """
+        state = self.model.schedule.state
+        np.subtract.at(state.euro_wallet, rows, values)
+        np.add.at(state.teo_wallet, rows, values)
+        np.add.at(state.exchanged_euros, rows, values)
+        volume = self._volume(rows, values)
+        self.model.schedule.ledger.record(euros=-volume, teos=volume, exchanged_euros=volume)
+
+    def _transfer_teos(self, rows, values):
+        """Exchanges teos for euros in the wallets of the given agents.
+
+        Args:
+            rows (ndarray): Row indices of the agents in the AgentState.
+            values (ndarray): Exchanged teos per agent.
+
+        """
+        state = self.model.schedule.state
+        np.subtract.at(state.teo_wallet, rows, values)
+        np.add.at(state.euro_wallet, rows, values)
+        np.add.at(state.exchanged_teos, rows, values)
+        volume = self._volume(rows, values)
+        self.model.schedule.ledger.record(euros=volume, teos=-volume)
     
     def reward_contributions(self):
         """Method that rewards agents that contributed in the current tick.
@@ -222,70 +220,110 @@ class Teo(Agent):
         """        
         contribution_reward_per_hour = get_contribution_reward_per_hour(self.model)
         #payout to agents according to the number of hours they contributed
-        for agent_id, agent in self.model.schedule.agents_by_type['Customer'].items():
-            agent.teo_wallet += agent.contributed_hours * contribution_reward_per_hour
-            agent.contribution_surplus += agent.contributed_hours * contribution_reward_per_hour
+        state = self.model.schedule.state
+        n = state.size
+        rewards = state.contributed_hours[:n] * contribution_reward_per_hour
+        state.teo_wallet[:n] += rewards
+        state.contribution_surplus[:n] += rewards
+        self.model.schedule.ledger.record(teos=self.model.schedule.ledger.hours * contribution_reward_per_hour)
 
     def reward_exchanges(self):
         """Method that rewards agents that exchanged euros for teos in the current tick.
 
         """
         exchange_reward_per_euro = get_exchange_reward_per_euro(self.model)
-        #payout to agents according to the number of hours they contributed
-        for agent_id, agent in self.model.schedule.agents_by_type['Customer'].items():
-            agent.teo_wallet += agent.exchanged_euros * exchange_reward_per_euro
-            agent.exchange_surplus += agent.exchanged_euros * exchange_reward_per_euro
+        #payout to agents according to the number of euros they exchanged
+        state = self.model.schedule.state
+        n = state.size
+        rewards = state.exchanged_euros[:n] * exchange_reward_per_euro
+        state.teo_wallet[:n] += rewards
+        state.exchange_surplus[:n] += rewards
+        self.model.schedule.ledger.record(teos=self.model.schedule.ledger.exchanged_euros * exchange_reward_per_euro)
 
     
     def reset_parameters(self):
-        self.action_register = []
+        self.action_register.reset()
     
     def step(self):
-        self.execute_deposits()
-        self.execute_contribution()
-        self.execute_sponsorship()
-        self.execute_exchanges()
-        self.execute_withdraws()
-        self.reward_contributions()
-        self.reward_exchanges()
+        timer = self.model.timer
+        with timer.phase('execute_deposits'):
+            self.execute_deposits()
+        with timer.phase('execute_contribution'):
+            self.execute_contribution()
+        with timer.phase('execute_sponsorship'):
+            self.execute_sponsorship()
+        with timer.phase('execute_exchanges'):
+            self.execute_exchanges()
+        with timer.phase('execute_withdraws'):
+            self.execute_withdraws()
+        with timer.phase('reward_contributions'):
+            self.reward_contributions()
+        with timer.phase('reward_exchanges'):
+            self.reward_exchanges()
         self.reset_parameters()
+        if self.model.debug:
+            self.model.schedule.ledger.verify(self.model.schedule.state)
         
 class Customer(Agent):
-    """Customer agent base class."""
-    
-    def __init__(self, unique_id, model, teo):
+    """Customer agent base class.
+
+    The state of a customer lives in its row of the AgentState owned by the
+    scheduler. The attributes below are views on that row.
+
+    """
+
+    monthly_deposit = StateField()
+    monthly_hours = StateField()
+
+    euro_wallet = StateField()
+    teo_wallet = StateField()
+
+    contribution_surplus = StateField()
+    exchange_surplus = StateField()
+
+    deposit_intent = StateField()
+    contribution_intent = StateField()
+    sponsor_intent = StateField()
+    teo_exchange_intent = StateField()
+    euro_exchange_intent = StateField()
+    withdraw_intent = StateField()
+
+    hour_wallet = StateField()
+    staged_euro = StateField()
+    staged_teo = StateField()
+    contributed_hours = StateField()
+    exchanged_euros = StateField()
+    exchanged_teos = StateField()
+    withdrawn_euros = StateField()
+
+    last_withdraw_tick = StateField()
+    exit_triggered = StateField()
+
+    churn_draw = StateField()
+    action_draw = StateField()
+    amount_draw = StateField()
+
+    def __init__(self, unique_id, model, teo, row):
+        """Creates a customer on its row of the AgentState.
+
+        Args:
+            unique_id (int): Id allocated for the customer with AgentState.allocate.
+            model (Model): Instance of the model class.
+            teo (Teo): The TEO agent.
+            row (int): Row allocated for the customer with AgentState.allocate.
+
+        """
         super().__init__(unique_id, model)
         self.model = model
         self.unique_id = unique_id
+        self.state = model.schedule.state
+        self.row = row
         
         self.monthly_deposit = 0
         self.monthly_hours = 0
-        
-        self.euro_wallet = 0
-        self.teo_wallet = 0
-
-        self.contribution_surplus = 0
-        self.exchange_surplus = 0
-        
-        self.deposit_intent = 0
-        self.contribution_intent = 0
-        self.sponsor_intent = 0
-        self.teo_exchange_intent = 0
-        self.euro_exchange_intent = 0
-        self.withdraw_intent = 0
-        
         self.hour_wallet = self.monthly_hours
-        self.staged_euro = 0
-        self.staged_teo = 0
-        self.contributed_hours = 0
-        self.exchanged_euros = 0
-        self.exchanged_teos = 0
-        self.withdrawn_euros = 0
                
         self.teo = teo
-
-        self.last_withdraw_tick = -1
-        self.exit_triggered = False
     
          
     def register_deposit(self, deposit_intent):
@@ -353,7 +391,7 @@ class Customer(Agent):
 
         The user stops depositing, sponsoring and contributing. She exchanges all teos 
         and withdraws remaining euros. If all money is removed from the system. The user
-        is removed from the system by Teo.
+        is removed from the schedule at the end of the tick.
 
         """     
         self.teo_exchange_intent = self.teo_wallet
@@ -363,36 +401,31 @@ class Customer(Agent):
         self.register_withdraw(self.withdraw_intent)
 
         if self.teo_wallet + self.euro_wallet == 0:
-            print('Agent exited: ', self.__class__.__name__)
-            self.model.schedule.remove(self)
+            self.model.events.log('exit', self.unique_id, 1)
+            self.model.schedule.remove_later(self)
+
+    def trigger_exit(self):
+        """Marks the agent as leaving the system, see exit.
+
+        """
+        if not self.exit_triggered:
+            self.exit_triggered = True
+            self.model.events.log('exit_triggered', self.unique_id, 1)
 
     def reset_parameters(self):
-        """Resets temporary parameters at the beginning of a new tick.
+        """Resets temporary parameters of this agent.
 
-        """       
-        self.deposit_intent = 0
-        self.contribution_intent = 0
-        self.sponsor_intent = 0
-        self.teo_exchange_intent = 0
-        self.euro_exchange_intent = 0
-        self.withdraw_intent = 0
-        
-        self.hour_wallet = self.monthly_hours
-        self.staged_euro = 0
-        self.staged_teo = 0
-        self.contributed_hours = 0
-        self.exchanged_euros = 0
-        self.exchanged_teos = 0
-        self.withdrawn_euros = 0
+        The scheduler resets all agents at once at the beginning of a new tick,
+        see ActivationByType.step.
 
+        """       
+        self.state.reset_row(self.row)
 
     def step(self):
         """Step method defining the ordered action to be taken each step.
 
         """      
-        self.reset_parameters()
-
-        if np.random.uniform(0, 1) < self.model.churn_prob: self.exit_triggered = True       
+        if self.churn_draw < self.model.churn_prob: self.trigger_exit()       
         if self.exit_triggered:
             self.exit()
         else:
@@ -416,19 +449,16 @@ class VerificationSponsor(Customer):
         - withdraws everything from euro-wallet
     """
 
-    def __init__(self, unique_id, model, teo):
-        print(model)
-        super().__init__(unique_id, model, teo)
+    def __init__(self, unique_id, model, teo, row):
+        super().__init__(unique_id, model, teo, row)
         # self.model = model
         self.monthly_deposit = 100
         self.monthly_hours = 2
             
     
     def step(self):
-        self.reset_parameters()
-
         # exit randomly
-        if np.random.uniform(0, 1) < self.model.churn_prob: self.exit_triggered = True       
+        if self.churn_draw < self.model.churn_prob: self.trigger_exit()       
         if self.exit_triggered:
             self.exit()
         else:
@@ -440,7 +470,7 @@ class VerificationSponsor(Customer):
             if self.model.schedule.steps == 0:
                 self.deposit_intent = self.monthly_hours
                 self.register_deposit(self.deposit_intent)
-            if np.random.uniform(0, 1) < 1/3:
+            if self.action_draw < 1/3:
                 self.contribution_intent = self.monthly_hours
                 self.register_contribution(self.contribution_intent)
             
@@ -461,16 +491,14 @@ class CharitableSponsor(Customer):
         - does not exchange teo->euro and does not withdraw
     """
 
-    def __init__(self, unique_id, model, teo):
-        super().__init__(unique_id, model, teo)
+    def __init__(self, unique_id, model, teo, row):
+        super().__init__(unique_id, model, teo, row)
         self.monthly_deposit = 50
         self.monthly_hours = 0
 
     def step(self):
-        self.reset_parameters()
-
         # exit randomly
-        if np.random.uniform(0, 1) < self.model.churn_prob: self.exit_triggered = True       
+        if self.churn_draw < self.model.churn_prob: self.trigger_exit()       
         if self.exit_triggered:
             self.exit()
         else:
@@ -497,18 +525,15 @@ class Contributor(Customer):
 
     """
     
-    def __init__(self, unique_id, model, teo):
-        super().__init__(unique_id, model, teo)
+    def __init__(self, unique_id, model, teo, row):
+        super().__init__(unique_id, model, teo, row)
         self.monthly_deposit = 10
         self.monthly_hours = 80
     
     def step(self):
-        self.reset_parameters()
-
         # exit randomly
-        if np.random.uniform(0, 1) < self.model.churn_prob: self.exit_triggered = True       
+        if self.churn_draw < self.model.churn_prob: self.trigger_exit()       
         if self.exit_triggered:
-            print('Agent wants to exit: ', self.__class__.__name__)
             self.exit()
         else:
             self.deposit_intent = self.monthly_deposit
@@ -535,22 +560,20 @@ class Investor(Customer):
     - The withdraw amount is random between 20-80% (uniform)
     """
 
-    def __init__(self, unique_id, model, teo):
-        super().__init__(unique_id, model, teo)
+    def __init__(self, unique_id, model, teo, row):
+        super().__init__(unique_id, model, teo, row)
         self.monthly_deposit = 400
         self.monthly_hours = 0
     
     def step(self):
-        self.reset_parameters()
-
         # exit randomly, stay in Teo until all funds are withdrawn
-        if np.random.uniform(0, 1) <  self.model.churn_prob: self.exit_triggered = True       
+        if self.churn_draw < self.model.churn_prob: self.trigger_exit()       
         if self.exit_triggered:
             self.exit()
             return   
         # withdraw randomly once in 24 months and exchange before if euro-wallet < withdraw_intent      
-        if np.random.uniform(0, 1) < 1/24:
-            self.withdraw_intent = np.random.uniform(0.2, 0.8) * self.euro_wallet
+        if self.action_draw < 1/24:
+            self.withdraw_intent = (0.2 + 0.6 * self.amount_draw) * self.euro_wallet
             if self.euro_wallet < self.withdraw_intent:
                 self.teo_exchange_intent = self.withdraw_intent - self.euro_wallet
                 self.register_teo_exchange(self.teo_exchange_intent)
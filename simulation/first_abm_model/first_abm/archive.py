@@ -0,0 +1,242 @@
+"""
+Run Archive
+===========
+Archives the data of a DataCollector in columnar mode to a directory of
+numpy files that can be memory-mapped, and reads it back without loading the
+whole agent panel.
+
+Layout of an archive directory:
+    * meta.json: names of the model and agent variables and the chunk size.
+    * model/var_<i>.npy: one array per model variable.
+    * chunk_<j>/var_<i>.npy: fixed-width agent-level values of
+      ticks_per_chunk consecutive steps, rows are ordered by step (tick-major).
+    * chunk_offsets.npy: first global row of each chunk.
+    * step_offsets.npy: first global row of each step.
+    * agent_ids.npy: dictionary of all agent ids; agent_code.npy holds the
+      index into the dictionary for every row.
+    * agent_order.npy, agent_offsets.npy: global rows sorted by agent, the
+      rows of agent k are agent_order[agent_offsets[k]:agent_offsets[k+1]].
+"""
+import json
+import os
+import numpy as np
+
+
+def _column_file(directory, i):
+    return os.path.join(directory, 'var_%d.npy' % i)
+
+
+def _as_fixed_width(values):
+    """ Convert an object array to a fixed-width dtype that can be mapped. """
+    values = np.asarray(values)
+    if values.dtype == object:
+        return values.astype(str)
+    return values
+
+
+def _write_chunk(path, j, names, parts):
+    """ Write the agent-level values of archive chunk j.
+    Args:
+        path: Directory of the archive.
+        j: Index of the chunk.
+        names: Names of the agent-level variables.
+        parts: List of dictionaries mapping the variables to consecutive rows.
+    """
+    directory = os.path.join(path, 'chunk_%d' % j)
+    os.makedirs(directory, exist_ok=True)
+    for i, name in enumerate(names):
+        values = np.concatenate([part[name] for part in parts]) if parts else np.zeros(0)
+        np.save(_column_file(directory, i), _as_fixed_width(values))
+
+
+def write_archive(datacollector, path, ticks_per_chunk=12):
+    """ Write the collected data of a DataCollector to an archive directory.
+    The agent panel is written part by part (one chunk of a CompactAgentPanel
+    at a time), so spilled chunks are never all read back at once.
+    Args:
+        datacollector: DataCollector in columnar mode.
+        path: Directory of the archive, it is created if it does not exist.
+        ticks_per_chunk: Number of steps stored in each chunk.
+    """
+    if not datacollector.columnar:
+        raise Exception("Only a DataCollector in columnar mode can be archived.")
+    panel = datacollector.agent_panel
+    os.makedirs(os.path.join(path, 'model'), exist_ok=True)
+
+    model_names = list(datacollector.model_vars.keys())
+    for i, name in enumerate(model_names):
+        np.save(_column_file(os.path.join(path, 'model'), i), np.asarray(datacollector.model_vars[name]))
+
+    # the panel is read and written one part at a time, only the agent ids of
+    # all rows are held in memory to build the agent index
+    n_chunks = -(-panel.n_steps // ticks_per_chunk)
+    step_counts = np.zeros(panel.n_steps, dtype=np.int64)
+    id_parts = []
+    pending = []
+    j = 0
+    for steps, part_agent_ids, values in panel.parts():
+        step_counts += np.bincount(steps, minlength=panel.n_steps)
+        id_parts.append(_as_fixed_width(part_agent_ids))
+        chunks = steps // ticks_per_chunk
+        for chunk in np.unique(chunks).tolist():
+            start, stop = np.searchsorted(chunks, [chunk, chunk + 1])
+            while j < chunk:
+                _write_chunk(path, j, panel.names, pending)
+                pending = []
+                j += 1
+            pending.append({name: values[name][start:stop] for name in panel.names})
+    while j < n_chunks:
+        _write_chunk(path, j, panel.names, pending)
+        pending = []
+        j += 1
+    step_offsets = np.concatenate([[0], np.cumsum(step_counts)])
+    chunk_offsets = np.append(step_offsets[:panel.n_steps:ticks_per_chunk], step_offsets[-1])
+    panel_agent_ids = np.concatenate(id_parts) if id_parts else np.zeros(0, dtype=np.int64)
+
+    agent_ids, agent_code = np.unique(_as_fixed_width(panel_agent_ids), return_inverse=True)
+    agent_order = np.argsort(agent_code, kind='stable')
+    agent_offsets = np.searchsorted(agent_code[agent_order], np.arange(len(agent_ids) + 1))
+    np.save(os.path.join(path, 'step_offsets.npy'), step_offsets)
+    np.save(os.path.join(path, 'chunk_offsets.npy'), chunk_offsets)
+    np.save(os.path.join(path, 'agent_ids.npy'), agent_ids)
+    np.save(os.path.join(path, 'agent_code.npy'), agent_code.astype(np.int64))
+    np.save(os.path.join(path, 'agent_order.npy'), agent_order)
+    np.save(os.path.join(path, 'agent_offsets.npy'), agent_offsets)
+    with open(os.path.join(path, 'meta.json'), 'w') as meta_file:
+        json.dump({
+            'model_vars': model_names,
+            'agent_vars': panel.names,
+            'ticks_per_chunk': ticks_per_chunk,
+        }, meta_file)
+
+
+class RunArchive:
+    """ Reader for an archive written by write_archive.
+    The agent-level columns are memory-mapped, every read only touches the
+    rows it returns.
+    """
+
+    def __init__(self, path):
+        """ Open an archive.
+        Args:
+            path: Directory of the archive.
+        """
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+        self.model_var_names = meta['model_vars']
+        self.agent_var_names = meta['agent_vars']
+        self.step_offsets = np.load(os.path.join(path, 'step_offsets.npy'))
+        self.chunk_offsets = np.load(os.path.join(path, 'chunk_offsets.npy'))
+        self.agent_ids = np.load(os.path.join(path, 'agent_ids.npy'))
+        self.agent_offsets = np.load(os.path.join(path, 'agent_offsets.npy'))
+        self.agent_code = np.load(os.path.join(path, 'agent_code.npy'), mmap_mode='r')
+        self.agent_order = np.load(os.path.join(path, 'agent_order.npy'), mmap_mode='r')
+        self._agent_index = {agent_id: code for code, agent_id in enumerate(self.agent_ids.tolist())}
+        self._chunks = {}
+
+    @property
+    def n_steps(self):
+        return len(self.step_offsets) - 1
+
+    def _chunk(self, j, i):
+        """ Return the memory-mapped column i of chunk j. """
+        if (j, i) not in self._chunks:
+            directory = os.path.join(self.path, 'chunk_%d' % j)
+            self._chunks[(j, i)] = np.load(_column_file(directory, i), mmap_mode='r')
+        return self._chunks[(j, i)]
+
+    def _variables(self, variables):
+        if variables is None:
+            return list(self.agent_var_names)
+        return list(variables)
+
+    def _take(self, rows, variables):
+        """ Read the given sorted global rows of the variables. """
+        chunk = np.searchsorted(self.chunk_offsets, rows, side='right') - 1
+        data = {}
+        for name in variables:
+            i = self.agent_var_names.index(name)
+            parts = []
+            for j in np.unique(chunk):
+                local_rows = rows[chunk == j] - self.chunk_offsets[j]
+                parts.append(self._chunk(j, i)[local_rows])
+            data[name] = np.concatenate(parts) if parts else np.empty(0)
+        return data
+
+    def _slice(self, start, stop, variables):
+        """ Read the contiguous global rows start:stop of the variables. """
+        first = np.searchsorted(self.chunk_offsets, start, side='right') - 1
+        last = np.searchsorted(self.chunk_offsets, stop, side='left')
+        data = {}
+        for name in variables:
+            i = self.agent_var_names.index(name)
+            parts = []
+            for j in range(max(first, 0), min(last, len(self.chunk_offsets) - 1)):
+                offset = self.chunk_offsets[j]
+                lo = max(start, offset) - offset
+                hi = min(stop, self.chunk_offsets[j + 1]) - offset
+                parts.append(self._chunk(j, i)[lo:hi])
+            data[name] = np.concatenate(parts) if parts else np.empty(0)
+        return data
+
+    def _steps_of(self, rows):
+        return np.searchsorted(self.step_offsets, rows, side='right') - 1
+
+    def get_model_vars_dataframe(self):
+        """ Return the model variables as a DataFrame indexed by step. """
+        import pandas as pd
+        directory = os.path.join(self.path, 'model')
+        return pd.DataFrame({
+            name: np.load(_column_file(directory, i))
+            for i, name in enumerate(self.model_var_names)
+        })
+
+    def agent(self, agent_id, variables=None):
+        """ Return the trajectory of one agent as a DataFrame indexed by step.
+        Args:
+            agent_id: Id of the agent.
+            variables: Agent-level variables to read, all if None.
+        """
+        import pandas as pd
+        code = self._agent_index[agent_id]
+        rows = np.asarray(self.agent_order[self.agent_offsets[code]:self.agent_offsets[code + 1]])
+        data = self._take(rows, self._variables(variables))
+        df = pd.DataFrame(data)
+        df.index = pd.Index(self._steps_of(rows), name='Step')
+        return df
+
+    def tick(self, step, variables=None):
+        """ Return the cross-section of one step as a DataFrame indexed by agent id.
+        Args:
+            step: Step to read.
+            variables: Agent-level variables to read, all if None.
+        """
+        df = self.ticks(step, step + 1, variables)
+        df.index = df.index.droplevel('Step')
+        return df
+
+    def ticks(self, start, stop, variables=None, agent_ids=None):
+        """ Return the steps start:stop as a DataFrame indexed by step and agent id.
+        Args:
+            start: First step to read.
+            stop: Step after the last step to read.
+            variables: Agent-level variables to read, all if None.
+            agent_ids: Ids of the agents to read, all if None.
+        """
+        import pandas as pd
+        row_start, row_stop = self.step_offsets[start], self.step_offsets[min(stop, self.n_steps)]
+        codes = np.asarray(self.agent_code[row_start:row_stop])
+        variables = self._variables(variables)
+        if agent_ids is None:
+            rows = np.arange(row_start, row_stop)
+            data = self._slice(row_start, row_stop, variables)
+        else:
+            selected = np.array([self._agent_index[agent_id] for agent_id in agent_ids if agent_id in self._agent_index])
+            mask = np.isin(codes, selected)
+            rows = np.flatnonzero(mask) + row_start
+            codes = codes[mask]
+            data = self._take(rows, variables)
+        df = pd.DataFrame(data)
+        df.index = pd.MultiIndex.from_arrays([self._steps_of(rows), self.agent_ids[codes]], names=['Step', 'AgentID'])
+        return df
@@ -0,0 +1,282 @@
+"""
+Batch Runner
+============
+Runs TeoModel for many parameter combinations and seeds on a process pool.
+
+Each worker runs one model without storing data or collecting agent-level
+variables and returns the model variables as a dictionary of numpy arrays.
+If a results directory is given, every finished run is saved there as an .npz
+file, so an interrupted sweep continues where it stopped when it is started
+again.
+
+With fork_at, the swept parameters take effect at tick fork_at instead of at
+the start: the first fork_at ticks of a seed are the same for every parameter
+combination, so they are simulated once with the fixed parameters and the model
+is then forked into one copy per combination (see TeoModel.fork). The forks
+continue the random stream of the prefix, so every run is identical to a run
+with the fixed parameters that switches to the values of its combination at
+fork_at. The fixed parameters must therefore hold the value of every swept
+parameter before the fork, and the initial population cannot be swept. The
+forks of a seed are split into several jobs that restore the same prefix
+snapshot, so they run in parallel even for a single seed.
+"""
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+import numpy as np
+from .checkpoint import snapshot, restore
+from .model import TeoModel
+
+POPULATION_PARAMETERS = ['n_contributors', 'n_char_sponsors', 'n_ver_sponsors', 'n_investors']
+
+
+def model_parameters(parameters, seed):
+    """ Return the TeoModel parameters of a worker run.
+    Workers never store data or collect agent-level variables and run with the
+    seed of the task, these keys replace the ones given in the parameters.
+    """
+    return dict(parameters, store_data=False, collect_agents=False, seed=seed)
+
+
+def run_model(task):
+    """ Run a single model and return its model variables.
+    Args:
+        task: Tuple of the parameter dictionary, the seed and the number of ticks.
+    Returns:
+        Tuple of the task and a dictionary mapping model variables to arrays.
+    """
+    parameters, seed, n_ticks = task
+    model = TeoModel(**model_parameters(parameters, seed))
+    for _ in range(n_ticks):
+        model.step()
+    model_vars = {name: np.asarray(values) for name, values in model.datacollector.model_vars.items()}
+    return task, model_vars
+
+
+def run_prefix(task):
+    """ Run the shared prefix of a seed once.
+    Args:
+        task: Tuple of the prefix parameters, the seed and the tick to fork at.
+    Returns:
+        Tuple of the seed and the snapshot (meta, arrays) of the prefix.
+    """
+    parameters, seed, fork_at = task
+    model = TeoModel(**model_parameters(parameters, seed))
+    for _ in range(fork_at):
+        model.step()
+    meta, arrays = snapshot(model)
+    return seed, (meta, {name: np.array(values) for name, values in arrays.items()})
+
+
+def run_forked(task):
+    """ Fork the prefix of a seed for some of the parameter points.
+    Args:
+        task: Tuple of the prefix snapshot, the fixed parameters, the list of
+              (index, point) pairs to run, the seed and the total number of
+              ticks.
+    Returns:
+        List of (task, model variables) tuples like run_model, one per point.
+    """
+    prefix, fixed_parameters, points, seed, n_ticks = task
+    meta, arrays = prefix
+    results = []
+    for _, point in points:
+        # the fork continues the random stream of the prefix, like a run that
+        # switches its parameters at the fork
+        fork = restore(TeoModel, meta, arrays, point)
+        for _ in range(n_ticks - meta['steps']):
+            fork.step()
+        model_vars = {name: np.asarray(values) for name, values in fork.datacollector.model_vars.items()}
+        results.append(((dict(fixed_parameters, **point), seed, n_ticks), model_vars))
+    return results
+
+
+def run_key(parameters, seed, fork_at=None, prefix_parameters=None):
+    """ Return a stable file name for a run.
+    Args:
+        parameters: Parameter dictionary of the run.
+        seed: Seed of the run.
+        fork_at: Tick the run was forked at, None for an independent run.
+        prefix_parameters: Parameters the prefix of a forked run was run with.
+    """
+    run = {'parameters': parameters, 'seed': seed}
+    if fork_at is not None:
+        run['fork_at'] = fork_at
+        run['prefix_parameters'] = prefix_parameters
+    key = json.dumps(run, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+class BatchRunner:
+    """ Runs a parameter sweep over TeoModel on a process pool. """
+
+    def __init__(self, fixed_parameters, variable_parameters, seeds=(0,), n_ticks=120,
+                 processes=None, results_dir=None, fork_at=None):
+        """ Create a new batch runner.
+        Args:
+            fixed_parameters: Dictionary of TeoModel parameters that are the
+                              same for all runs.
+            variable_parameters: Either a dictionary mapping parameter names to
+                                 lists of values, whose full grid is run, or a
+                                 list of parameter dictionaries.
+            seeds: Seeds each parameter combination is run with.
+            n_ticks: Number of ticks per run.
+            processes: Number of worker processes, None uses all cores and 1
+                       runs all models in the current process.
+            results_dir: Directory to save finished runs to, makes the sweep
+                         resumable.
+            fork_at: If set, the variable parameters take effect at this
+                     tick. The ticks before it are simulated once per seed
+                     with the fixed parameters, which must contain the value
+                     of every variable parameter before the fork.
+        """
+        self.fixed_parameters = fixed_parameters
+        self.seeds = list(seeds)
+        self.n_ticks = n_ticks
+        self.processes = processes
+        self.results_dir = results_dir
+        self.fork_at = fork_at
+        if isinstance(variable_parameters, dict):
+            names = list(variable_parameters.keys())
+            self.parameter_points = [dict(zip(names, values))
+                                     for values in itertools.product(*variable_parameters.values())]
+        else:
+            self.parameter_points = [dict(point) for point in variable_parameters]
+        # runs are keyed by their parameters, so repeated points are only run once
+        unique_points = {json.dumps(point, sort_keys=True): point for point in reversed(self.parameter_points)}
+        self.parameter_points = [point for point in self.parameter_points
+                                 if unique_points[json.dumps(point, sort_keys=True)] is point]
+        self.results = {}
+        if fork_at is not None:
+            if not 0 <= fork_at <= n_ticks:
+                raise Exception("fork_at must be between 0 and n_ticks.")
+            for point in self.parameter_points:
+                if any(name in point for name in POPULATION_PARAMETERS):
+                    raise Exception("The initial population cannot vary when forking: " + str(point))
+                missing = [name for name in point if name not in fixed_parameters]
+                if missing:
+                    raise Exception("The fixed parameters must contain the values before the fork of: "
+                                    + ', '.join(missing))
+
+    def _tasks(self):
+        """ Yield the index of the parameter point and the task of every run. """
+        for index, point in enumerate(self.parameter_points):
+            parameters = dict(self.fixed_parameters, **point)
+            for seed in self.seeds:
+                yield index, (parameters, seed, self.n_ticks)
+
+    def _prefix_parameters(self):
+        """ Return the parameters the shared prefixes are run with. """
+        return dict(self.fixed_parameters)
+
+    def _key(self, parameters, seed):
+        if self.fork_at is None:
+            return run_key(parameters, seed)
+        return run_key(parameters, seed, self.fork_at, self._prefix_parameters())
+
+    def _result_path(self, parameters, seed):
+        return os.path.join(self.results_dir, self._key(parameters, seed) + '.npz')
+
+    def _save(self, task, model_vars):
+        parameters, seed, _ = task
+        names = list(model_vars.keys())
+        np.savez(self._result_path(parameters, seed),
+                 meta=json.dumps({'parameters': parameters, 'seed': seed, 'names': names}),
+                 **{'var_%d' % i: model_vars[name] for i, name in enumerate(names)})
+
+    def _load(self, parameters, seed):
+        with np.load(self._result_path(parameters, seed)) as data:
+            names = json.loads(str(data['meta']))['names']
+            return {name: data['var_%d' % i] for i, name in enumerate(names)}
+
+    def run_all(self):
+        """ Run all parameter combinations and seeds that have no result yet.
+        Returns:
+            The tidy DataFrame of get_results().
+        """
+        tasks = list(self._tasks())
+        pending = []
+        if self.results_dir is not None:
+            os.makedirs(self.results_dir, exist_ok=True)
+        for index, task in tasks:
+            parameters, seed, _ = task
+            key = self._key(parameters, seed)
+            if key in self.results:
+                continue
+            if self.results_dir is not None and os.path.exists(self._result_path(parameters, seed)):
+                self.results[key] = (parameters, seed, self._load(parameters, seed))
+                continue
+            pending.append((index, task))
+
+        n_done = len(tasks) - len(pending)
+        start = time.time()
+        pool = None
+        if self.processes == 1:
+            run_jobs = map
+        else:
+            pool = Pool(self.processes)
+            run_jobs = pool.imap_unordered
+        try:
+            if self.fork_at is None:
+                finished = run_jobs(run_model, [task for _, task in pending])
+            else:
+                finished = itertools.chain.from_iterable(run_jobs(run_forked, self._forked_jobs(pending, run_jobs)))
+            for task, model_vars in finished:
+                parameters, seed, _ = task
+                self.results[self._key(parameters, seed)] = (parameters, seed, model_vars)
+                if self.results_dir is not None:
+                    self._save(task, model_vars)
+                n_done += 1
+                sys.stderr.write('\rFinished %d/%d runs (%.1fs)' % (n_done, len(tasks), time.time() - start))
+            sys.stderr.write('\n')
+        finally:
+            if pool is not None:
+                pool.terminate()
+        return self.get_results()
+
+    def _forked_jobs(self, pending, run_jobs):
+        """ Run the prefix of every seed with pending runs and split the pending
+        points of each seed into run_forked jobs.
+        Args:
+            pending: List of (index, task) pairs of the pending runs.
+            run_jobs: Function mapping a worker over a list of jobs.
+        """
+        points = {}
+        for index, (_, seed, _) in pending:
+            points.setdefault(seed, []).append((index, self.parameter_points[index]))
+        prefix_parameters = self._prefix_parameters()
+        prefixes = dict(run_jobs(run_prefix, [(prefix_parameters, seed, self.fork_at)
+                                              for seed in self.seeds if seed in points]))
+        n_workers = self.processes or os.cpu_count() or 1
+        n_jobs = -(-n_workers // len(points)) if points else 1
+        jobs = []
+        for seed in self.seeds:
+            if seed not in points:
+                continue
+            for chunk in np.array_split(np.arange(len(points[seed])), min(n_jobs, len(points[seed]))):
+                jobs.append((prefixes[seed], self.fixed_parameters, [points[seed][i] for i in chunk.tolist()],
+                             seed, self.n_ticks))
+        return jobs
+
+    def get_results(self):
+        """ Merge the finished runs into one DataFrame with one row per run and
+        step, keyed by the variable parameters and the seed.
+        """
+        import pandas as pd
+        keys = list(self.parameter_points[0].keys()) if self.parameter_points else []
+        frames = []
+        for parameters, seed, model_vars in self.results.values():
+            df = pd.DataFrame(model_vars)
+            df.insert(0, 'Step', np.arange(len(df)))
+            df.insert(0, 'seed', seed)
+            for name in reversed(keys):
+                df.insert(0, name, parameters[name])
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame()
+        results = pd.concat(frames, ignore_index=True)
+        return results.sort_values(keys + ['seed', 'Step']).reset_index(drop=True)
@@ -0,0 +1,200 @@
+"""
+Benchmarks
+==========
+Times TeoModel at increasing population sizes and for several agent mixes.
+
+Every case is a population size, an agent mix and an engine ('object',
+'vector' or 'cohort'). The benchmark reports the time of TeoModel.__init__,
+the mean time of TeoModel.step, ticks per second, the time of
+get_agent_vars_dataframe at the end of the run and the peak memory of the
+process, all measured with the PhaseTimer switched off. The time spent in each
+phase of the tick (growth, customer activation and the step cost of each
+customer type, every Teo phase and collect) is recorded by the PhaseTimer in a
+second run with the same seed, so its overhead does not distort the step
+times. Each case runs in a fresh worker process, so the peak memory of one
+case does not carry over to the next.
+
+Run it from the directory of the package:
+    python3 -m first_abm.benchmark --sizes 1000 10000 --engines vector cohort --ticks 12 --out bench.json
+and compare two result files with
+    python3 -m first_abm.benchmark --compare old.json new.json
+"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+import numpy as np
+from .model import TeoModel
+
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+ENGINES = ['object', 'vector', 'cohort']
+
+# share of contributors, charitable sponsors, verification sponsors and investors
+MIXES = {
+    'default': (0.6, 0.2, 0.1, 0.1),
+    'contributors': (1.0, 0.0, 0.0, 0.0),
+    'sponsors': (0.2, 0.4, 0.4, 0.0),
+    'investors': (0.25, 0.0, 0.0, 0.75),
+}
+
+PARAMETERS = {
+    'buffer_share': 20,
+    'exchange_reward_share': 20,
+    'new_user_growth': 5,
+    'churn_prob': 5,
+    'months_with_growth': 96,
+    'store_data': False,
+}
+
+
+def peak_rss_mb():
+    """ Return the peak resident memory of the process in megabytes.
+    ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak_rss / (1024 * 1024)
+    return peak_rss / 1024
+
+
+def run_case(case):
+    """ Run one benchmark case.
+    Args:
+        case: Tuple of the number of customers, the name of the agent mix, the
+              engine, the number of ticks and the seed.
+    Returns:
+        Dictionary with the timings of the case.
+    """
+    n_customers, mix, engine, n_ticks, seed = case
+    shares = MIXES[mix]
+    counts = [int(round(share * n_customers)) for share in shares]
+    start = time.perf_counter()
+    model = TeoModel(counts[0], counts[1], counts[2], counts[3], seed=seed, engine=engine, **PARAMETERS)
+    init_time = time.perf_counter() - start
+
+    step_times = []
+    for _ in range(n_ticks):
+        start = time.perf_counter()
+        model.step()
+        step_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    model.datacollector.get_agent_vars_dataframe()
+    dataframe_time = time.perf_counter() - start
+    final_customers = model.schedule.get_customer_count()
+    peak_rss = peak_rss_mb()
+    del model
+
+    # the phase breakdown comes from a second run, the timer slows down the tick
+    timed_model = TeoModel(counts[0], counts[1], counts[2], counts[3], seed=seed, engine=engine,
+                           timing=True, **PARAMETERS)
+    for _ in range(n_ticks):
+        timed_model.step()
+    timings = timed_model.get_timings_dataframe()
+    phases = timings.groupby('Phase')['Seconds'].sum() / n_ticks
+
+    step_times = np.array(step_times)
+    return {
+        'customers': n_customers,
+        'mix': mix,
+        'engine': engine,
+        'ticks': n_ticks,
+        'final_customers': final_customers,
+        'init_s': init_time,
+        'step_mean_s': float(step_times.mean()),
+        'step_max_s': float(step_times.max()),
+        'ticks_per_s': float(n_ticks / step_times.sum()),
+        'phases_s': {name: float(value) for name, value in phases.items()},
+        'agent_dataframe_s': dataframe_time,
+        'peak_rss_mb': peak_rss,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=SIZES, mixes=None, n_ticks=12, seed=0, engines=ENGINES):
+    """ Run all combinations of sizes, mixes and engines, each in a fresh process.
+    Returns:
+        Dictionary with the environment and a list with one result per case.
+    """
+    mixes = list(MIXES) if mixes is None else list(mixes)
+    results = []
+    for n_customers in sizes:
+        for mix in mixes:
+            for engine in engines:
+                with Pool(1) as pool:
+                    result = pool.apply(run_case, ((n_customers, mix, engine, n_ticks, seed),))
+                results.append(result)
+                sys.stderr.write('%9d %-12s %-6s init %8.3fs  step %8.3fs  %8.2f ticks/s  %8.1f MB\n' % (
+                    n_customers, mix, engine, result['init_s'], result['step_mean_s'], result['ticks_per_s'],
+                    result['peak_rss_mb']))
+    return {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results,
+    }
+
+
+def compare(old_path, new_path, out=None):
+    """ Write the change of the step time and the phase times between two result files.
+    Args:
+        old_path: Result file of the baseline.
+        new_path: Result file to compare with the baseline.
+        out: Stream the table is written to, sys.stdout if None.
+    """
+    if out is None:
+        out = sys.stdout
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old = json.load(old_file)
+        new = json.load(new_file)
+    # result files without an engine were written by the object engine
+    old_results = {(result['customers'], result['mix'], result.get('engine', 'object')): result
+                   for result in old['results']}
+    out.write('%9s %-12s %-6s %10s %10s %8s\n' % ('customers', 'mix', 'engine', 'old step', 'new step', 'ratio'))
+    for result in new['results']:
+        key = (result['customers'], result['mix'], result.get('engine', 'object'))
+        if key not in old_results:
+            continue
+        before = old_results[key]
+        out.write('%9d %-12s %-6s %9.4fs %9.4fs %7.2fx\n' % (key[0], key[1], key[2], before['step_mean_s'],
+                                                          result['step_mean_s'],
+                                                          result['step_mean_s'] / before['step_mean_s']))
+        for phase, value in result['phases_s'].items():
+            if phase in before['phases_s'] and before['phases_s'][phase] > 0:
+                out.write('%29s %-20s %7.2fx\n' % ('', phase, value / before['phases_s'][phase]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark TeoModel at increasing population sizes.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--mixes', nargs='+', choices=list(MIXES), default=list(MIXES))
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+    parser.add_argument('--ticks', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmark.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = run_benchmarks(args.sizes, args.mixes, args.ticks, args.seed, args.engines)
+    with open(args.out, 'w') as out_file:
+        json.dump(report, out_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import numpy as np
+
+
+class GrowableArray:
+    """Preallocated one-dimensional array that grows geometrically on append.
+
+    """
+
+    def __init__(self, dtype, capacity=64):
+        """Initializes an empty array.
+
+        Args:
+            dtype: Numpy dtype of the elements.
+            capacity (int): Number of elements to preallocate.
+
+        """
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, min_capacity):
+        """Grows the underlying array until min_capacity elements fit.
+
+        Args:
+            min_capacity (int): Number of elements that must fit.
+
+        """
+        capacity = max(len(self.data), 1)
+        if capacity >= min_capacity:
+            return
+        while capacity < min_capacity:
+            capacity *= 2
+        data = np.empty(capacity, dtype=self.data.dtype)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
+    def append(self, value):
+        """Appends a single element.
+
+        Args:
+            value: Element to append.
+
+        """
+        if self.size == len(self.data):
+            self._reserve(self.size + 1)
+        self.data[self.size] = value
+        self.size += 1
+
+    def extend(self, values):
+        """Appends all elements of an array.
+
+        Args:
+            values (ndarray): Elements to append.
+
+        """
+        n = len(values)
+        self._reserve(self.size + n)
+        self.data[self.size:self.size + n] = values
+        self.size += n
+
+    def view(self):
+        """Returns a view on the filled part of the array.
+
+        """
+        return self.data[:self.size]
+
+    def clear(self):
+        """Resets the length to zero without releasing memory.
+
+        """
+        self.size = 0
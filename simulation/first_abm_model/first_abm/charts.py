@@ -0,0 +1,76 @@
+from mesa.visualization.UserParam import UserSettableParameter
+
+# Series of the charts shown by the web interfaces, see server.py and streaming.py
+TOTALS_SERIES = [
+    {"Label": "Total Euros", "Color": "#3498DB"},
+    {"Label": "Total Teos", "Color": "#E74C3C"},
+    {"Label": "Contributed Hours", "Color": "#2ECC71"}]
+
+REWARDS_SERIES = [
+    {"Label": "Reward per Contrib Hour", "Color": "#3498DB"},
+    {"Label": "Reward per Exchanged Euro", "Color": "#E74C3C"}]
+
+AGENTS_SERIES = [
+    {"Label": "Number of Agents", "Color": "#3498DB"},
+    {"Label": "Number of Contributors", "Color": "#E74C3C"},
+    {"Label": "Number of Investors", "Color": "#2ECC71"},
+    {"Label": "Number of Charitable Sponsors", "Color": "#ffff00"},
+    {"Label": "Number of Verification Sponsors", "Color": "#ff00ff"}]
+
+# quantiles of the per-type distributions, only charted if the model collects them
+WALLET_QUANTILE_SERIES = [
+    {"Label": "Contributor Euro Wallet P10", "Color": "#85C1E9"},
+    {"Label": "Contributor Euro Wallet P50", "Color": "#3498DB"},
+    {"Label": "Contributor Euro Wallet P90", "Color": "#1B4F72"},
+    {"Label": "Investor Euro Wallet P50", "Color": "#E74C3C"},
+    {"Label": "CharitableSponsor Euro Wallet P50", "Color": "#2ECC71"},
+    {"Label": "VerificationSponsor Euro Wallet P50", "Color": "#ff00ff"}]
+
+SURPLUS_SERIES = [
+    {"Label": "Contributor Contribution Surplus Mean", "Color": "#3498DB"},
+    {"Label": "Contributor Contribution Surplus P90", "Color": "#1B4F72"},
+    {"Label": "Investor Exchange Surplus Mean", "Color": "#E74C3C"},
+    {"Label": "Investor Exchange Surplus P90", "Color": "#78281F"}]
+
+CHARTS = [TOTALS_SERIES, REWARDS_SERIES, AGENTS_SERIES]
+
+DISTRIBUTION_CHARTS = [WALLET_QUANTILE_SERIES, SURPLUS_SERIES]
+
+
+model_params = {
+    "store_data": UserSettableParameter('checkbox', 'Store Data', value=True),
+    "n_contributors": UserSettableParameter('slider', "Number of contributors", 60, 0, 100, 1,
+                               description="Choose how many contributors to include in the model"),
+    "n_investors": UserSettableParameter('slider', "Number of investors", 10, 0, 100, 1,
+                               description="Choose how many investors to include in the model"),
+    "n_ver_sponsors": UserSettableParameter('slider', "Number of verification sponsors", 10, 0, 100, 1,
+                               description="Choose how many verification sponsors to include in the model"),
+    "n_char_sponsors": UserSettableParameter('slider', "Number of charitable sponsors", 20, 0, 100, 1,
+                               description="Choose how many charitable sponsors to include in the model"),
+    "buffer_share": UserSettableParameter('slider', "Buffer Share in %", 20, 0, 100, 1,
+                               description="Choose how much buffer should be hold back in % of Euro Pool"),
+    "exchange_reward_share": UserSettableParameter('slider', "Exchange Reward Share of Buffer", 20, 0, 100, 1,
+                               description="Choose how much % of the buffer should be used for exchange rewards"),
+    "new_user_growth": UserSettableParameter('slider', "New user growth", 10, 0, 100, 1,
+                               description="Choose % of new users relative to existing"),
+    "churn_prob": UserSettableParameter('slider', "Churn probability", 5, 0, 100, 1,
+                               description="Choose how many % churn each tick."),
+    "months_with_growth": UserSettableParameter('slider', "Months with growth", 96, 0, 100, 1,
+                               description="Choose how many months the system grows until churn = new users"),
+}
+
+
+def page_charts(collect_distributions=False):
+    """ Return the charts of a web interface, with the distribution charts only
+    if the model collects the distributions.
+    """
+    if collect_distributions:
+        return CHARTS + DISTRIBUTION_CHARTS
+    return list(CHARTS)
+
+
+def page_params(collect_distributions=False):
+    """ Return the model parameters of a web interface. Whether distributions are
+    collected is fixed when the page is built, since its charts depend on it.
+    """
+    return dict(model_params, collect_distributions=collect_distributions)
@@ -0,0 +1,245 @@
+"""
+Checkpoints
+===========
+Saves a TeoModel between two ticks to a single .npz file and restores it, so
+that long runs can be resumed instead of being rerun from tick 0.
+
+A checkpoint only contains arrays and a JSON header, no pickled objects:
+    * meta: JSON with the model parameters, the scheduler counters, the ledger
+      totals, the state of the random number generator and the names of the
+      collected variables.
+    * state_<column>: the used rows of every AgentState column.
+    * state_free_rows, state_id_rows, state_id_types, state_id_ordinals: the
+      free list and the row, type and ordinal of every id.
+    * register_<action>_rows / register_<action>_values: the action-register.
+    * model_var_<i>: the collected model variables.
+    * panel_tick, panel_agent_id, panel_var_<i>: the AgentPanel.
+    * table_<i>_<j>: column j of table i of the DataCollector.
+
+Customer objects are recreated from the AgentState in row order, which is the
+order they are activated in, so a resumed run is bit-identical to an
+uninterrupted one. Stored output of a resumed run is written to new files.
+
+The same snapshot is used in memory to fork a model into copies with other
+parameters (see fork_model), which costs one bulk copy of the arrays instead
+of a deep copy of the agent objects.
+"""
+import json
+import os
+import numpy as np
+from .buffers import GrowableArray
+from .register import ACTIONS
+from .state import AGENT_TYPES, COLUMNS
+
+
+STATE_COLUMNS = list(COLUMNS) + ['agent_type', 'active', 'ordinal', 'weight', 'agent_id']
+
+ID_COLUMNS = ['free_rows', 'id_rows', 'id_types', 'id_ordinals']
+
+COUNT_NAMES = ['n_contributors', 'n_char_sponsors', 'n_ver_sponsors', 'n_investors']
+
+
+def _as_array(values):
+    """ Convert a list of values to an array that can be saved without pickling. """
+    values = np.asarray(values)
+    if values.dtype == object:
+        return values.astype(str)
+    return values
+
+
+def snapshot(model):
+    """ Capture the state of a model between two ticks.
+    Args:
+        model: TeoModel between two ticks.
+    Returns:
+        Tuple of a JSON-serialisable header and a dictionary of arrays. The
+        arrays are views on the model and are only valid until its next tick.
+    """
+    collector = model.datacollector
+    if collector.agent_reporters and not collector.columnar:
+        raise Exception("Only a DataCollector in columnar mode can be checkpointed.")
+    schedule = model.schedule
+    state = schedule.state
+    ledger = schedule.ledger
+    panel = collector.agent_panel
+    arrays = {}
+    for name in STATE_COLUMNS:
+        arrays['state_' + name] = getattr(state, name)[:state.size]
+    arrays['state_type_counts'] = state.type_counts
+    for name in ID_COLUMNS:
+        arrays['state_' + name] = getattr(state, name).view()
+    for action in ACTIONS:
+        arrays['register_' + action + '_rows'] = model.teo.action_register[action].rows
+        arrays['register_' + action + '_values'] = model.teo.action_register[action].values
+    model_var_names = list(collector.model_vars.keys())
+    for i, name in enumerate(model_var_names):
+        arrays['model_var_%d' % i] = _as_array(collector.model_vars[name])
+    panel_names = []
+    if panel is not None and panel.n_steps and panel.names:
+        panel_names = panel.names
+        tick, agent_ids, values = panel.arrays()
+        arrays['panel_tick'] = tick
+        arrays['panel_agent_id'] = agent_ids
+        for i, name in enumerate(panel_names):
+            arrays['panel_var_%d' % i] = values[name]
+    table_names = list(collector.tables.keys())
+    table_columns = [list(collector.tables[name].keys()) for name in table_names]
+    for i, name in enumerate(table_names):
+        for j, column in enumerate(table_columns[i]):
+            values = collector.tables[name][column]
+            if isinstance(values, GrowableArray):
+                values = values.view()
+            arrays['table_%d_%d' % (i, j)] = _as_array(values)
+    seed_seq = model.rng.bit_generator.seed_seq
+    meta = {
+        'parameters': model.parameters,
+        'counts': [getattr(model, name) for name in COUNT_NAMES],
+        'step_id': model.step_id,
+        'steps': schedule.steps,
+        'next_id': state.next_id,
+        'time': schedule.time,
+        'ledger': [ledger.euros, ledger.teos, ledger.hours, ledger.exchanged_euros],
+        'rng': model.rng.bit_generator.state,
+        'seed_seq': [seed_seq.entropy, list(seed_seq.spawn_key), seed_seq.n_children_spawned],
+        'model_vars': model_var_names,
+        'panel_vars': panel_names,
+        'panel_steps': panel.n_steps if panel is not None else 0,
+        'tables': table_names,
+        'table_columns': table_columns,
+    }
+    return meta, arrays
+
+
+def restore(model_class, meta, data, overrides=None, seed_seq=None):
+    """ Create a model from a snapshot.
+    Args:
+        model_class: TeoModel or a subclass of it.
+        meta: Header of the snapshot.
+        data: Mapping of the snapshot arrays, they are copied into the model.
+        overrides: Dictionary of TeoModel parameters that replace the ones of
+                   the snapshot.
+        seed_seq: If given, the restored model draws from a new generator
+                  seeded with this SeedSequence instead of continuing the
+                  generator of the snapshot.
+    Returns:
+        The restored model, ready for the next tick.
+    """
+    parameters = dict(meta['parameters'], **(overrides or {}))
+    model = model_class(**dict(parameters, n_contributors=0, n_char_sponsors=0,
+                               n_ver_sponsors=0, n_investors=0))
+    for name, count in zip(COUNT_NAMES, meta['counts']):
+        setattr(model, name, count)
+    model.parameters = parameters
+    model.step_id = meta['step_id']
+    if seed_seq is None:
+        entropy, spawn_key, n_children_spawned = meta['seed_seq']
+        seed_seq = np.random.SeedSequence(entropy, spawn_key=spawn_key, n_children_spawned=n_children_spawned)
+        model.rng = np.random.Generator(np.random.PCG64(seed_seq))
+        model.rng.bit_generator.state = meta['rng']
+    else:
+        model.rng = np.random.Generator(np.random.PCG64(seed_seq))
+
+    schedule = model.schedule
+    schedule.steps = meta['steps']
+    schedule.time = meta['time']
+    ledger = schedule.ledger
+    ledger.euros, ledger.teos, ledger.hours, ledger.exchanged_euros = meta['ledger']
+
+    # recreate the customers in row order, then overwrite the rows they initialised
+    state = schedule.state
+    agent_type = data['state_agent_type']
+    agent_id = data['state_agent_id']
+    active = data['state_active']
+    state.allocate(AGENT_TYPES[0], len(agent_type))
+    for row in np.flatnonzero(active).tolist():
+        agent_class = model.customer_classes[AGENT_TYPES[agent_type[row]]]
+        schedule.add(agent_class(int(agent_id[row]), model, model.teo, row))
+    for name in STATE_COLUMNS:
+        getattr(state, name)[:state.size] = data['state_' + name]
+    state.type_counts[:] = data['state_type_counts']
+    state.next_id = meta['next_id']
+    for name in ID_COLUMNS:
+        getattr(state, name).clear()
+        getattr(state, name).extend(data['state_' + name])
+
+    for action in ACTIONS:
+        buffer = model.teo.action_register[action]
+        for row, value in zip(data['register_' + action + '_rows'].tolist(),
+                              data['register_' + action + '_values'].tolist()):
+            buffer.append(row, value)
+
+    collector = model.datacollector
+    for i, name in enumerate(meta['model_vars']):
+        collector.model_vars[name] = data['model_var_%d' % i].tolist()
+    panel = collector.agent_panel
+    if panel is not None:
+        if meta['panel_vars']:
+            values = {name: data['panel_var_%d' % i] for i, name in enumerate(meta['panel_vars'])}
+            panel.load(data['panel_tick'], data['panel_agent_id'], values, meta['panel_steps'])
+        else:
+            panel.n_steps = meta['panel_steps']
+    for i, name in enumerate(meta['tables']):
+        for j, column in enumerate(meta['table_columns'][i]):
+            values = data['table_%d_%d' % (i, j)]
+            if isinstance(collector.tables[name][column], GrowableArray):
+                collector.tables[name][column].extend(values)
+            else:
+                collector.tables[name][column] = values.tolist()
+    return model
+
+
+def save_checkpoint(model, path):
+    """ Save a model to a checkpoint file.
+    Args:
+        model: TeoModel between two ticks.
+        path: File name of the checkpoint.
+    """
+    model.datacollector.flush()
+    meta, arrays = snapshot(model)
+    with open(path, 'wb') as checkpoint_file:
+        np.savez(checkpoint_file, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_checkpoint(model_class, path):
+    """ Restore a model from a checkpoint file.
+    Args:
+        model_class: TeoModel or a subclass of it.
+        path: File name of the checkpoint.
+    Returns:
+        The restored model, ready for the next tick.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        return restore(model_class, meta, data)
+
+
+def fork_model(model, k=1, **overrides):
+    """ Fork a model into k independent copies.
+    The copies start from the current state of the model and continue with the
+    overridden parameters. Every copy draws from its own random stream spawned
+    from the generator of the model, the model itself is not changed. Unless
+    overridden, copies neither store data nor save automatic checkpoints.
+    Args:
+        model: TeoModel between two ticks.
+        k: Number of copies.
+        overrides: TeoModel parameters that replace the ones of the model.
+    Returns:
+        List of the k copies.
+    """
+    meta, arrays = snapshot(model)
+    overrides = dict({'store_data': False, 'checkpoint_every': None}, **overrides)
+    children = model.rng.bit_generator.seed_seq.spawn(k)
+    return [restore(type(model), meta, arrays, overrides, seed_seq) for seed_seq in children]
+
+
+def checkpoint_path(directory, step):
+    """ Return the file name of the automatic checkpoint of a step. """
+    return os.path.join(directory, 'checkpoint_%08d.npz' % step)
+
+
+def prune_checkpoints(directory, keep):
+    """ Delete all but the newest `keep` automatic checkpoints in a directory. """
+    names = sorted(name for name in os.listdir(directory)
+                   if name.startswith('checkpoint_') and name.endswith('.npz'))
+    for name in names[:max(len(names) - keep, 0)]:
+        os.remove(os.path.join(directory, name))
@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def order_volume(values):
+    """Returns the total value of a list of orders.
+
+    The values are accumulated sequentially in register order, so the volume is
+    identical to summing the orders one by one.
+
+    Args:
+        values (ndarray): Order values in register order.
+
+    """
+    if len(values) == 0:
+        return 0
+    return np.cumsum(values)[-1]
+
+
+def fill_orders(values, volume, priority):
+    """Fills orders in priority order until the volume is reached.
+
+    Orders are filled completely as long as the cumulative filled value does not
+    exceed the volume. The first order that would exceed the volume is filled
+    partially with the remaining volume and all later orders stay unfilled.
+
+    Args:
+        values (ndarray): Order values in register order.
+        volume (float): Total value that can be filled.
+        priority (ndarray): Permutation of the order indices, first order is
+            filled first.
+
+    Returns:
+        ndarray: Filled value per order in register order.
+
+    """
+    ranked = values[priority]
+    cumulative = np.cumsum(ranked)
+    n_filled = np.searchsorted(cumulative, volume, side='right')
+    filled_ranked = np.zeros_like(ranked)
+    filled_ranked[:n_filled] = ranked[:n_filled]
+    if n_filled < len(ranked):
+        filled_ranked[n_filled] = volume - (cumulative[n_filled - 1] if n_filled > 0 else 0)
+    filled = np.empty_like(values)
+    filled[priority] = filled_ranked
+    return filled
+
+
+def clear_exchanges(euro_values, teo_values, priority):
+    """Matches euro->teo against teo->euro exchange orders.
+
+    The side with the smaller volume is filled completely. The orders of the
+    larger side are filled in random priority order until the volume of the
+    smaller side is reached, see fill_orders.
+
+    Args:
+        euro_values (ndarray): Values of the euro->teo orders.
+        teo_values (ndarray): Values of the teo->euro orders.
+        priority (callable): Returns a random permutation for a number of orders.
+
+    Returns:
+        tuple: Filled value per euro->teo order and per teo->euro order.
+
+    """
+    euro_exchange_volume = order_volume(euro_values)
+    teo_exchange_volume = order_volume(teo_values)
+    if euro_exchange_volume >= teo_exchange_volume:
+        euro_filled = fill_orders(euro_values, teo_exchange_volume, priority(len(euro_values)))
+        return euro_filled, teo_values
+    teo_filled = fill_orders(teo_values, euro_exchange_volume, priority(len(teo_values)))
+    return euro_values, teo_filled
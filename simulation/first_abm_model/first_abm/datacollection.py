@@ -22,7 +22,28 @@ The DataCollector then stores the data it collects in dictionaries:
       stores (agent_id, value) pairs.
     * tables maps each table to a dictionary, with each column as a key with a
       list as its value.
+In columnar mode the agent-level data is stored in an AgentPanel instead of
+agent_vars: one preallocated numpy column for the step, the agent id and each
+agent reporter. Agent reporters given as the name of an AgentState field are
+then collected with a single array operation. With compact=True the panel is a
+CompactAgentPanel, which stores completed chunks of ticks with compact dtypes,
+sparse columns and dictionary-encoded agent ids and spills them to disk once
+a memory budget is exceeded.
 Finally, DataCollector can create a pandas DataFrame from each collection.
+If data should be stored, every collected tick is also passed to an output
+sink (see sinks.py) that is opened once and closed with DataCollector.close().
+Agent ids are the integer unique ids in the `agent_id` column of the
+AgentState, which stay distinct when rows are reused; with agent_labels the sink
+additionally writes a human-readable label like 'Contributor_17' per row and
+the agent DataFrame gets an AgentLabel column.
+With a sample (see sampling.py) the agent-level variables are only collected
+for a deterministic subset of the customers, model-level variables are still
+computed over the whole population.
+Distribution reporters (see distributions.py) summarise an AgentState field per
+customer type every tick; their counts, means, variances and quantiles are
+collected like model variables and their histograms are written to the
+HISTOGRAM_TABLE, so the distributions over time are available without
+storing the agent panel.
 The default DataCollector here makes several assumptions:
     * The model has a schedule object called 'schedule'
     * The schedule has an agent list called agents
@@ -30,8 +51,280 @@ The default DataCollector here makes several assumptions:
 
 """
 from collections import defaultdict
-import pandas as pd
-import csv
+import os
+import shutil
+import tempfile
+import weakref
+import numpy as np
+from .buffers import GrowableArray
+from .distributions import DistributionReporter
+from .sampling import AgentSample
+from .sinks import make_sink
+from .state import AGENT_TYPES, FIELDS
+
+
+HISTOGRAM_TABLE = 'Histograms'
+
+HISTOGRAM_COLUMNS = {
+    'Step': np.int64,
+    'Variable': np.int16,
+    'AgentType': np.int8,
+    'Bin': np.int16,
+    'Count': np.int64,
+}
+
+
+class AgentPanel:
+    """ Columnar storage of the agent-level variables.
+    Every collected agent row appends the step, the agent id and one value per
+    agent reporter to preallocated, geometrically grown numpy columns. Like
+    the agent_vars records, the step is the index of the collect call.
+    """
+
+    def __init__(self, names):
+        """ Create an empty panel.
+        Args:
+            names: Names of the agent-level variables.
+        """
+        self.names = list(names)
+        self.n_steps = 0
+        self.tick = GrowableArray(np.int64)
+        self.agent_id = GrowableArray(np.int64)
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.tick)
+
+    def append(self, agent_ids, values):
+        """ Append the agent-level variables of one step.
+        Args:
+            agent_ids: Array of agent ids.
+            values: Dictionary mapping variable names to arrays of values
+                    aligned with agent_ids.
+        """
+        if not self.columns:
+            for name in self.names:
+                self.columns[name] = GrowableArray(np.asarray(values[name]).dtype)
+        self.tick.extend(np.full(len(agent_ids), self.n_steps, dtype=np.int64))
+        self.agent_id.extend(agent_ids)
+        for name in self.names:
+            self.columns[name].extend(values[name])
+        self.n_steps += 1
+
+    def arrays(self):
+        """ Return the steps, the agent ids and a dictionary mapping each
+        variable to its values, as views on the columns.
+        """
+        return (self.tick.view(), self.agent_id.view(),
+                {name: self.columns[name].view() for name in self.columns})
+
+    def parts(self):
+        """ Yield the panel as (steps, agent ids, values) parts in step order,
+        a single part of views on the columns here.
+        """
+        if len(self):
+            yield self.arrays()
+
+    def load(self, tick, agent_ids, values, n_steps):
+        """ Fill an empty panel with the arrays returned by arrays().
+        Args:
+            tick: Array with the step of every row.
+            agent_ids: Array with the agent id of every row.
+            values: Dictionary mapping variable names to arrays of values.
+            n_steps: Number of collected steps.
+        """
+        self.tick.extend(tick)
+        self.agent_id.extend(agent_ids)
+        for name in self.names:
+            self.columns[name] = GrowableArray(values[name].dtype)
+            self.columns[name].extend(values[name])
+        self.n_steps = n_steps
+
+    def to_dataframe(self):
+        """ Create a pandas DataFrame indexed by step and agent id.
+        The value columns are handed to pandas as views on the panel, without
+        set_index, so with copy-on-write (pandas 3) they are not copied. Older
+        pandas may still consolidate columns of the same dtype into one copied
+        block, and building the index always creates new arrays of codes.
+        """
+        import pandas as pd
+        tick, agent_ids, values = self.arrays()
+        index = pd.MultiIndex.from_arrays([tick, agent_ids], names=["Step", "AgentID"])
+        data = {name: values[name] if values else np.empty(0) for name in self.names}
+        return pd.DataFrame(data, index=index, copy=False)
+
+
+def _compact_dtype(dtype):
+    """ Return the smallest dtype the panel stores values of a dtype with. """
+    if dtype == np.float64:
+        return np.dtype(np.float32)
+    if dtype == np.int64:
+        return np.dtype(np.int32)
+    return dtype
+
+
+class CompactAgentPanel(AgentPanel):
+    """ Memory-bounded columnar storage of the agent-level variables.
+    Steps are buffered until a chunk of chunk_ticks steps is complete. The
+    chunk is then encoded into a dictionary of arrays:
+        * steps, counts: the steps of the chunk and their number of rows.
+        * ids, codes: the distinct agent ids of the chunk and, for every row,
+          the index into ids in the smallest unsigned dtype.
+        * var_<i>: the values of variable i as float32, int32 or bool, or
+          var_<i>_index and var_<i>_values with the positions and values of
+          the non-zero entries if at most sparse_share of them are non-zero.
+    If the encoded chunks held in memory exceed memory_budget bytes, the
+    oldest ones are written to spill_dir and read back when the panel is
+    converted to a DataFrame. Float values are rounded to float32.
+    """
+
+    def __init__(self, names, chunk_ticks=12, memory_budget=None, spill_dir=None, sparse_share=0.25):
+        """ Create an empty panel.
+        Args:
+            names: Names of the agent-level variables.
+            chunk_ticks: Number of steps encoded together.
+            memory_budget: Bytes of encoded chunks kept in memory, None keeps
+                           all of them.
+            spill_dir: Directory of spilled chunks, a temporary directory that
+                       is removed with the panel if None.
+            sparse_share: Largest share of non-zero values of a sparse column.
+        """
+        super().__init__(names)
+        self.chunk_ticks = chunk_ticks
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.sparse_share = sparse_share
+        self.chunks = []
+        self.memory = 0
+        self.n_rows = 0
+        self._pending = []
+
+    def __len__(self):
+        return self.n_rows
+
+    def append(self, agent_ids, values):
+        """ Append the agent-level variables of one step, see AgentPanel.append. """
+        agent_ids = np.asarray(agent_ids, dtype=np.int64)
+        self._pending.append((self.n_steps, agent_ids,
+                              {name: np.asarray(values[name]) for name in self.names}))
+        self.n_rows += len(agent_ids)
+        self.n_steps += 1
+        if len(self._pending) == self.chunk_ticks:
+            self._seal()
+
+    def _seal(self):
+        """ Encode the buffered steps into a chunk. """
+        steps = np.array([step for step, _, _ in self._pending], dtype=np.int64)
+        counts = np.array([len(ids) for _, ids, _ in self._pending], dtype=np.int64)
+        agent_ids = np.concatenate([ids for _, ids, _ in self._pending])
+        ids, codes = np.unique(agent_ids, return_inverse=True)
+        chunk = {
+            'steps': steps,
+            'counts': counts,
+            'ids': ids,
+            'codes': codes.astype(np.min_scalar_type(max(len(ids) - 1, 0))),
+        }
+        for i, name in enumerate(self.names):
+            values = np.concatenate([data[name] for _, _, data in self._pending])
+            values = values.astype(_compact_dtype(values.dtype))
+            if values.dtype == object:
+                values = values.astype(str)
+            nonzero = np.flatnonzero(values) if values.dtype.kind in 'biuf' else None
+            if nonzero is not None and len(nonzero) <= self.sparse_share * len(values):
+                chunk['var_%d_index' % i] = nonzero.astype(np.int32)
+                chunk['var_%d_values' % i] = values[nonzero]
+                chunk['var_%d_dtype' % i] = np.array(values.dtype.str)
+                chunk['var_%d_size' % i] = np.array(len(values))
+            else:
+                chunk['var_%d' % i] = values
+        self._pending = []
+        self.chunks.append(chunk)
+        self.memory += sum(array.nbytes for array in chunk.values())
+        self._spill()
+
+    def _spill(self):
+        """ Write the oldest chunks held in memory to disk until the budget is met. """
+        if self.memory_budget is None:
+            return
+        for j, chunk in enumerate(self.chunks):
+            if self.memory <= self.memory_budget:
+                break
+            if isinstance(chunk, str):
+                continue
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.mkdtemp(prefix='agent_panel_')
+                weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+            path = os.path.join(self.spill_dir, 'chunk_%06d_%d.npz' % (chunk['steps'][0], id(self)))
+            np.savez(path, **chunk)
+            self.chunks[j] = path
+            self.memory -= sum(array.nbytes for array in chunk.values())
+
+    def _decode(self, chunk):
+        """ Return the steps, agent ids and values of an encoded chunk. """
+        if isinstance(chunk, str):
+            with np.load(chunk, allow_pickle=False) as data:
+                chunk = dict(data)
+        tick = np.repeat(chunk['steps'], chunk['counts'])
+        agent_ids = chunk['ids'][chunk['codes']]
+        values = {}
+        for i, name in enumerate(self.names):
+            if 'var_%d' % i in chunk:
+                values[name] = chunk['var_%d' % i]
+            else:
+                column = np.zeros(int(chunk['var_%d_size' % i]), dtype=np.dtype(str(chunk['var_%d_dtype' % i])))
+                column[chunk['var_%d_index' % i]] = chunk['var_%d_values' % i]
+                values[name] = column
+        return tick, agent_ids, values
+
+    def parts(self):
+        """ Yield the panel as (steps, agent ids, values) parts in step order,
+        one decoded chunk at a time followed by the pending steps, so that at
+        most one chunk is read back from disk at once.
+        """
+        for chunk in self.chunks:
+            yield self._decode(chunk)
+        if self._pending:
+            yield (
+                np.concatenate([np.full(len(ids), step, dtype=np.int64) for step, ids, _ in self._pending]),
+                np.concatenate([ids for _, ids, _ in self._pending]),
+                {name: np.concatenate([data[name] for _, _, data in self._pending]).astype(
+                    _compact_dtype(self._pending[0][2][name].dtype)) for name in self.names},
+            )
+
+    def arrays(self):
+        """ Return the steps, the agent ids and a dictionary mapping each
+        variable to its values, decoded from all chunks and pending steps.
+        """
+        parts = list(self.parts())
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), {}
+        return (np.concatenate([part[0] for part in parts]),
+                np.concatenate([part[1] for part in parts]),
+                {name: np.concatenate([part[2][name] for part in parts]) for name in self.names})
+
+    def load(self, tick, agent_ids, values, n_steps):
+        """ Fill an empty panel with the arrays returned by arrays(). """
+        offsets = np.searchsorted(tick, np.arange(n_steps + 1))
+        for step in range(n_steps):
+            start, stop = offsets[step], offsets[step + 1]
+            self.append(agent_ids[start:stop], {name: values[name][start:stop] for name in self.names})
+
+
+class ColumnTable(dict):
+    """ Table whose columns are preallocated, geometrically grown numpy
+    columns instead of lists. Maps column names to GrowableArrays.
+    """
+
+    def __init__(self, columns):
+        """ Create an empty table.
+        Args:
+            columns: Dictionary mapping column names to numpy dtypes.
+        """
+        super().__init__((name, GrowableArray(dtype)) for name, dtype in columns.items())
+
+    def to_dict(self):
+        """ Return views on the filled part of the columns. """
+        return {name: column.view() for name, column in self.items()}
 
 
 class DataCollector:
@@ -45,7 +338,10 @@ class DataCollector:
 
     model = None
 
-    def __init__(self, model_reporters=None, agent_reporters=None, tables=None):
+    def __init__(self, model_reporters=None, agent_reporters=None, tables=None,
+                 columnar=False, output_format='csv', flush_every=12, agent_labels=False,
+                 sample=None, sample_salt=0, compact=False, memory_budget=None, spill_dir=None,
+                 distribution_reporters=None):
         """ Instantiate a DataCollector with lists of model and agent reporters.
         Both model_reporters and agent_reporters accept a dictionary mapping a
         variable name to either an attribute name, or a method.
@@ -62,22 +358,55 @@ class DataCollector:
         when they are destroyed (to keep track of lifespans), it might look
         like:
             {"Lifespan": ["unique_id", "age"]}
+        Mapping a table name to a dictionary of column names and numpy dtypes
+        instead creates a ColumnTable with preallocated numpy columns.
         Args:
             model_reporters: Dictionary of reporter names and attributes/funcs
             agent_reporters: Dictionary of reporter names and attributes/funcs.
             tables: Dictionary of table names to lists of column names.
+            columnar: If True, agent-level data is stored in an AgentPanel.
+            output_format: Format of the stored data, 'csv' or 'parquet'.
+            flush_every: Number of ticks the sink buffers before writing.
+            agent_labels: Function returning human-readable labels for an
+                          array of agent ids. If set, the stored agent data and
+                          the agent DataFrame contain the label of every row.
+            sample: Share of the customers whose agent-level variables are
+                    collected, or a dictionary mapping customer types to their
+                    share for a stratified sample. None collects every customer.
+            sample_salt: Selects another sample of the same size.
+            compact: If True, the agent-level data is stored in a
+                     CompactAgentPanel (requires columnar=True).
+            memory_budget: Bytes of agent-level data a CompactAgentPanel keeps
+                           in memory before spilling chunks to disk.
+            spill_dir: Directory of spilled chunks, a temporary directory if
+                       None.
+            distribution_reporters: Dictionary of variable names and AgentState
+                                    fields or DistributionReporters whose per-type
+                                    distribution is summarised every tick.
         """
         self.model_reporters = {}
         self.agent_reporters = {}
+        self.agent_fields = {}
+        self.columnar = columnar
+        self.output_format = output_format
+        self.flush_every = flush_every
+        self.agent_labels = agent_labels
+        self.sample = AgentSample(sample, sample_salt) if sample is not None else None
+        self.sink = None
 
         self.model_vars = {}
         self.agent_vars = {}
         self.tables = {}
+        self.distribution_reporters = []
 
         if model_reporters is not None:
             for name, reporter in model_reporters.items():
                 self._new_model_reporter(name, reporter)
 
+        if distribution_reporters is not None:
+            for name, reporter in distribution_reporters.items():
+                self._new_distribution_reporter(name, reporter)
+
         if agent_reporters is not None:
             for name, reporter in agent_reporters.items():
                 self._new_agent_reporter(name, reporter)
@@ -86,6 +415,14 @@ class DataCollector:
             for name, columns in tables.items():
                 self._new_table(name, columns)
 
+        if columnar and compact:
+            self.agent_panel = CompactAgentPanel(self.agent_reporters, chunk_ticks=flush_every,
+                                                 memory_budget=memory_budget, spill_dir=spill_dir)
+        elif columnar:
+            self.agent_panel = AgentPanel(self.agent_reporters)
+        else:
+            self.agent_panel = None
+
     def _new_model_reporter(self, name, reporter):
         """ Add a new model-level reporter to collect.
         Args:
@@ -106,62 +443,123 @@ class DataCollector:
                       variable when given a model instance.
         """
         if type(reporter) is str:
+            if reporter in FIELDS:
+                self.agent_fields[name] = reporter
             reporter = self._make_attribute_collector(reporter)
         self.agent_reporters[name] = reporter
         self.agent_vars[name] = []
 
+    def _new_distribution_reporter(self, name, reporter):
+        """ Add a new per-type distribution summary to collect.
+        Args:
+            name: Name of the summarised variable.
+            reporter: Name of an AgentState field, or a DistributionReporter.
+        """
+        if type(reporter) is str:
+            reporter = DistributionReporter(name, reporter)
+        self.distribution_reporters.append(reporter)
+        for var in reporter.names():
+            self.model_vars[var] = []
+        if HISTOGRAM_TABLE not in self.tables:
+            self._new_table(HISTOGRAM_TABLE, HISTOGRAM_COLUMNS)
+
     def _new_table(self, table_name, table_columns):
         """ Add a new table that objects can write to.
         Args:
             table_name: Name of the new table.
-            table_columns: List of columns to add to the table.
+            table_columns: List of columns to add to the table, or dictionary
+                           mapping columns to numpy dtypes for a ColumnTable.
         """
-        new_table = {column: [] for column in table_columns}
+        if isinstance(table_columns, dict):
+            new_table = ColumnTable(table_columns)
+        else:
+            new_table = {column: [] for column in table_columns}
         self.tables[table_name] = new_table
 
     def collect(self, model, store_data=False):
-        """ Collect all the data for the given model object. """
-        model_data = defaultdict(dict)
+        """ Collect all the data for the given model object.
+        Every reporter is evaluated exactly once per call.
+        """
+        model_data = {}
         if self.model_reporters:
             for var, reporter in self.model_reporters.items():
-                self.model_vars[var].append(reporter(model))
                 model_data[var] = reporter(model)
-        
-        agents_data = defaultdict(dict)
+                self.model_vars[var].append(model_data[var])
+        if self.distribution_reporters:
+            self._collect_distributions(model, model_data)
+
+        agent_ids = []
+        agents_data = {}
         if self.agent_reporters:
-            for var, reporter in self.agent_reporters.items():
-                agents_records = []
-                for id, agent in model.schedule.agents_by_type['Customer'].items():
-                    agents_records.append((id, reporter(agent)))
-                    agents_data[id][var] = reporter(agent)
-                self.agent_vars[var].append(agents_records)
+            agent_ids, agents_data = self._collect_agents(model)
+            if self.columnar:
+                self.agent_panel.append(agent_ids, agents_data)
+            else:
+                for var, values in agents_data.items():
+                    self.agent_vars[var].append(list(zip(agent_ids, values)))
         
         if store_data:
-            model_datetime = str(model.init_datetime)
-            with open('agentdata_'+model_datetime[0:10]+'_'+model_datetime[11:19]+'.csv','a') as csv_file:
-                writer = csv.DictWriter(csv_file, fieldnames = ['agent_id', 'tick'] + list(self.agent_reporters.keys()))
-                if model.schedule.steps == 1: 
-                    writer.writeheader()
-                for agent_id, agent_data in agents_data.items():
-                    data = defaultdict(dict)
-                    data['agent_id'] = agent_id
-                    data['tick'] = model.schedule.steps
-                    for var, value in agent_data.items(): 
-                        data[var] = value
-                    writer.writerow(data)
-
-            with open('modeldata_'+model_datetime[0:10]+'_'+model_datetime[11:19]+'.csv','a') as csv_file:
-                writer = csv.DictWriter(csv_file, fieldnames = ['tick'] + list(self.model_reporters.keys()))
-                if model.schedule.steps == 1: 
-                    writer.writeheader()
-                data = defaultdict(dict)
-                data['tick'] = model.schedule.steps
-                for var, value in model_data.items(): 
-                    data[var] = value
-                writer.writerow(data)
-            
-        
+            if self.sink is None:
+                model_datetime = str(model.init_datetime)
+                self.sink = make_sink(self.output_format, model_datetime[0:10]+'_'+model_datetime[11:19], self.flush_every)
+            agent_labels = self.agent_labels(agent_ids) if self.agent_labels else None
+            self.sink.write(model.schedule.steps, model_data, agent_ids, agents_data, agent_labels)
 
+    def flush(self):
+        """ Write all ticks buffered in the output sink to disk. """
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self):
+        """ Flush and close the output sink. """
+        if self.sink is not None:
+            self.sink.close()
+
+    def _collect_distributions(self, model, model_data):
+        """ Summarise every distribution reporter over all customers.
+        The scalar summaries are added to model_data and model_vars, the
+        histograms to the HISTOGRAM_TABLE.
+        """
+        state = model.schedule.state
+        rows = np.flatnonzero(state.active[:state.size])
+        for i, reporter in enumerate(self.distribution_reporters):
+            summaries, histograms = reporter.collect(state, rows)
+            for var, value in summaries.items():
+                model_data[var] = value
+                self.model_vars[var].append(value)
+            n_types, n_bins = histograms.shape
+            self.add_table_rows(HISTOGRAM_TABLE, {
+                'Step': np.full(n_types * n_bins, model.schedule.steps),
+                'Variable': np.full(n_types * n_bins, i),
+                'AgentType': np.repeat(np.arange(n_types), n_bins),
+                'Bin': np.tile(np.arange(n_bins), n_types),
+                'Count': histograms.ravel(),
+            })
+
+    def _collect_agents(self, model):
+        """ Evaluate every agent reporter once for each (sampled) customer.
+        Reporters that name an AgentState field are read from the state columns
+        in one array operation, all other reporters are called per agent.
+        Returns:
+            Array of agent ids and a dictionary mapping each agent-level variable
+            to the values aligned with the ids.
+        """
+        state = model.schedule.state
+        rows = np.flatnonzero(state.active[:state.size])
+        if self.sample is not None:
+            rows = self.sample.select(rows, state)
+        agent_ids = state.agent_id[rows]
+        agents = None
+        agents_data = {}
+        for var, reporter in self.agent_reporters.items():
+            if var in self.agent_fields:
+                agents_data[var] = getattr(state, self.agent_fields[var])[rows]
+                continue
+            if agents is None:
+                customers = model.schedule.customers_by_row
+                agents = [customers[row] for row in rows.tolist()]
+            agents_data[var] = np.array([reporter(agent) for agent in agents])
+        return agent_ids, agents_data
 
     def add_table_row(self, table_name, row, ignore_missing=False):
         """ Add a row dictionary to a specific table.
@@ -182,6 +580,21 @@ class DataCollector:
             else:
                 raise Exception("Could not insert row with missing column")
 
+    def add_table_rows(self, table_name, columns):
+        """ Add several rows to a ColumnTable at once.
+        Args:
+            table_name: Name of the table to append the rows to.
+            columns: A dictionary of the form {column_name: array of values}
+                     with an array of the same length for every column.
+        """
+        if table_name not in self.tables:
+            raise Exception("Table does not exist.")
+        table = self.tables[table_name]
+        if set(columns) != set(table):
+            raise Exception("Could not insert rows with missing columns")
+        for column, values in columns.items():
+            table[column].extend(values)
+
     @staticmethod
     def _make_attribute_collector(attr):
         '''
@@ -198,13 +611,18 @@ class DataCollector:
         The DataFrame has one column for each model variable, and the index is
         (implicitly) the model tick.
         """
+        import pandas as pd
         return pd.DataFrame(self.model_vars)
 
     def get_agent_vars_dataframe(self):
         """ Create a pandas DataFrame from the agent variables.
-        The DataFrame has one column for each variable, with two additional
-        columns for tick and agent_id.
+        The DataFrame has one column for each variable and is indexed by step
+        and agent id. With agent_labels, the categorical AgentLabel column holds
+        the human-readable label of every row.
         """
+        if self.columnar:
+            return self._label(self.agent_panel.to_dataframe())
+        import pandas as pd
         data = defaultdict(dict)
         for var, records in self.agent_vars.items():
             for step, entries in enumerate(records):
@@ -214,13 +632,49 @@ class DataCollector:
                     data[(step, agent_id)][var] = val
         df = pd.DataFrame.from_dict(data, orient="index")
         df.index.names = ["Step", "AgentID"]
+        return self._label(df)
+
+    def _label(self, df):
+        """ Insert the AgentLabel column into an agent DataFrame, the labels are
+        looked up once per distinct agent id.
+        """
+        if not self.agent_labels:
+            return df
+        import pandas as pd
+        agent_ids, codes = np.unique(df.index.get_level_values("AgentID").to_numpy(dtype=np.int64),
+                                     return_inverse=True)
+        df.insert(0, "AgentLabel", pd.Categorical.from_codes(codes, self.agent_labels(agent_ids)))
         return df
 
+    def get_histogram_dataframe(self, name):
+        """ Create a pandas DataFrame with the histograms of a distribution
+        reporter, one row per step, agent type and bin. Low and High are the
+        edges of the bin, the outer bins are open.
+        Args:
+            name: Name of the distribution reporter.
+        """
+        names = [reporter.name for reporter in self.distribution_reporters]
+        if name not in names:
+            raise Exception("No such distribution reporter.")
+        index = names.index(name)
+        edges = self.distribution_reporters[index].edges
+        df = self.get_table_dataframe(HISTOGRAM_TABLE)
+        df = df[df['Variable'] == index].drop(columns='Variable').reset_index(drop=True)
+        bins = df['Bin'].to_numpy()
+        df['AgentType'] = np.array(AGENT_TYPES, dtype=object)[df['AgentType'].to_numpy()]
+        df.insert(3, 'Low', np.concatenate([[-np.inf], edges])[bins])
+        df.insert(4, 'High', np.concatenate([edges, [np.inf]])[bins])
+        return df.drop(columns='Bin')
+
     def get_table_dataframe(self, table_name):
         """ Create a pandas DataFrame from a particular table.
         Args:
             table_name: The name of the table to convert.
         """
+        import pandas as pd
         if table_name not in self.tables:
             raise Exception("No such table.")
-        return pd.DataFrame(self.tables[table_name])
\ No newline at end of file
+        table = self.tables[table_name]
+        if isinstance(table, ColumnTable):
+            return pd.DataFrame(table.to_dict())
+        return pd.DataFrame(table)
\ No newline at end of file
@@ -0,0 +1,177 @@
+import numpy as np
+from .state import AGENT_TYPES
+
+
+QUANTILES = [0.1, 0.5, 0.9]
+
+# finite bin edges of the histograms, values below the first or above the last edge
+# are counted in an underflow and an overflow bin
+EDGES = [-1e4, -1e3, -1e2, -10., -1., 0., 1., 10., 1e2, 1e3, 1e4, 1e5]
+
+
+class LogBucketSketch:
+    """Mergeable quantile sketch with logarithmically spaced buckets.
+
+    Every value x with |x| > min_value falls into the bucket ceil(log(|x|) / log(gamma))
+    of its sign, with gamma = (1 + alpha) / (1 - alpha), smaller values into a zero
+    bucket. Quantiles are returned with a relative error of at most alpha, and two
+    sketches are merged by adding the counts of their buckets, so sketches of several
+    ticks, types or runs can be combined without the underlying values.
+
+    """
+
+    def __init__(self, alpha=0.01, min_value=1e-9):
+        """Initializes an empty sketch.
+
+        Args:
+            alpha (float): Relative accuracy of the quantiles.
+            min_value (float): Values with a smaller magnitude count as zero.
+
+        """
+        self.alpha = alpha
+        self.min_value = min_value
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = np.log(self.gamma)
+        # positive buckets get keys >= 1, negative ones <= -1 and zero gets 0; the
+        # offset keeps keys of magnitudes below 1 on the right side of zero
+        self.offset = int(np.ceil(-np.log(min_value) / self.log_gamma)) + 1
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.count = 0
+
+    def _add_keys(self, keys, counts):
+        keys = np.concatenate([self.keys, keys])
+        counts = np.concatenate([self.counts, counts])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts, minlength=len(self.keys)).astype(np.int64)
+        self.count = int(self.counts.sum())
+
+    def add(self, values, weights=None):
+        """Adds an array of values to the sketch.
+
+        Args:
+            values (ndarray): Values to add.
+            weights (ndarray): Integer number of times each value is added, once if None.
+
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        magnitude = np.abs(values)
+        nonzero = magnitude > self.min_value
+        keys = np.zeros(len(values), dtype=np.int64)
+        buckets = np.ceil(np.log(magnitude[nonzero]) / self.log_gamma).astype(np.int64) + self.offset
+        keys[nonzero] = np.where(values[nonzero] > 0, buckets, -buckets)
+        if weights is None:
+            unique, counts = np.unique(keys, return_counts=True)
+        else:
+            unique, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse, weights=weights, minlength=len(unique)).astype(np.int64)
+        self._add_keys(unique, counts)
+
+    def merge(self, other):
+        """Adds the counts of another sketch with the same alpha and min_value.
+
+        Args:
+            other (LogBucketSketch): Sketch to merge into this one.
+
+        """
+        if other.alpha != self.alpha or other.min_value != self.min_value:
+            raise Exception("Only sketches with the same accuracy can be merged.")
+        self._add_keys(other.keys, other.counts)
+
+    def _value(self, keys):
+        magnitude = 2 * self.gamma ** (np.abs(keys) - self.offset) / (self.gamma + 1)
+        return np.where(keys == 0, 0., np.sign(keys) * magnitude)
+
+    def quantile(self, q):
+        """Returns the estimated quantiles of all added values.
+
+        Args:
+            q (float or ndarray): Quantiles between 0 and 1.
+
+        """
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan)
+        ranks = np.asarray(q) * (self.count - 1)
+        index = np.searchsorted(np.cumsum(self.counts), ranks, side='right')
+        return self._value(self.keys[np.minimum(index, len(self.keys) - 1)])
+
+
+class DistributionReporter:
+    """Per-type distribution of an AgentState field, summarised every tick.
+
+    For every customer type the reporter computes in one vectorized pass over the
+    field the count, mean and variance, the quantiles of a LogBucketSketch and a
+    histogram with fixed bins. The scalar summaries are named
+    '<type> <name> <statistic>', e.g. 'Contributor Euro Wallet P50', and collected
+    like model variables. The sketches of the last tick are kept in `sketches`
+    for merging. Cohort rows count once for each of their members.
+
+    """
+
+    def __init__(self, name, field, quantiles=QUANTILES, edges=EDGES, alpha=0.01):
+        """Initializes a reporter.
+
+        Args:
+            name (str): Name of the variable.
+            field (str): Name of the AgentState field.
+            quantiles (list): Quantiles between 0 and 1 to report.
+            edges (list): Increasing finite bin edges of the histogram.
+            alpha (float): Relative accuracy of the quantiles.
+
+        """
+        self.name = name
+        self.field = field
+        self.quantiles = list(quantiles)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.alpha = alpha
+        self.sketches = {}
+
+    def names(self):
+        """Returns the names of the scalar summaries in the order they are reported.
+
+        """
+        statistics = ['Count', 'Mean', 'Var'] + ['P%g' % (100 * q) for q in self.quantiles]
+        return ['%s %s %s' % (agent_type, self.name, statistic)
+                for agent_type in AGENT_TYPES for statistic in statistics]
+
+    def collect(self, state, rows):
+        """Summarises the field over a set of customers.
+
+        Args:
+            state (AgentState): State of the customers.
+            rows (ndarray): Rows of the customers.
+
+        Returns:
+            Dictionary mapping the names of the scalar summaries to their values and
+            an array with one histogram of len(edges) + 1 bins per customer type.
+
+        """
+        n_types = len(AGENT_TYPES)
+        n_bins = len(self.edges) + 1
+        values = getattr(state, self.field)[rows].astype(np.float64)
+        types = state.agent_type[rows].astype(np.int64)
+        weights = state.weight[rows]
+        counts = np.bincount(types, weights=weights, minlength=n_types)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.bincount(types, weights=weights * values, minlength=n_types) / counts
+            variances = np.bincount(types, weights=weights * (values - means[types]) ** 2, minlength=n_types) / counts
+        bins = np.searchsorted(self.edges, values, side='right')
+        histograms = np.bincount(types * n_bins + bins, weights=weights,
+                                 minlength=n_types * n_bins).astype(np.int64).reshape(n_types, n_bins)
+
+        order = np.argsort(types, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(types, minlength=n_types))])
+        summaries = {}
+        names = iter(self.names())
+        for t, agent_type in enumerate(AGENT_TYPES):
+            sketch = LogBucketSketch(self.alpha)
+            members = order[offsets[t]:offsets[t + 1]]
+            sketch.add(values[members], weights[members])
+            self.sketches[agent_type] = sketch
+            statistics = [int(counts[t]), float(means[t]), float(variances[t])]
+            statistics += [float(x) for x in sketch.quantile(self.quantiles)]
+            for statistic in statistics:
+                summaries[next(names)] = statistic
+        return summaries, histograms
@@ -0,0 +1,246 @@
+import numpy as np
+from .state import AGENT_TYPES, COLUMNS
+
+
+CONTRIBUTOR, VERIFICATION_SPONSOR, CHARITABLE_SPONSOR, INVESTOR = range(len(AGENT_TYPES))
+
+# customer types without random decisions besides churn, the cohort engine keeps all
+# customers of such a type that joined in the same tick in one row
+COHORT_TYPES = ['Contributor', 'CharitableSponsor']
+
+
+def _set_intents(state, stepping, exiting, steps):
+    """Sets the intents of the customers like their step methods do.
+
+    Args:
+        state (AgentState): State of the customers.
+        stepping (ndarray): Rows of the customers that stay in the system.
+        exiting (ndarray): Rows of the customers that exit.
+        steps (int): Current tick.
+
+    """
+    types = state.agent_type[stepping]
+
+    def policy(agent_type):
+        rows = stepping[types == agent_type]
+        return rows, state.teo_wallet[rows], state.euro_wallet[rows]
+
+    # Contributor: deposit, contribute all hours, exchange all teos, withdraw all euros
+    rows, teo_wallet, euro_wallet = policy(CONTRIBUTOR)
+    state.deposit_intent[rows] = state.monthly_deposit[rows]
+    state.contribution_intent[rows] = state.monthly_hours[rows]
+    state.teo_exchange_intent[rows] = teo_wallet
+    state.withdraw_intent[rows] = euro_wallet
+
+    # VerificationSponsor: sponsor up to the monthly deposit, exchange and withdraw the rest
+    rows, teo_wallet, euro_wallet = policy(VERIFICATION_SPONSOR)
+    monthly_deposit = state.monthly_deposit[rows]
+    sponsor_intent = np.minimum(teo_wallet, monthly_deposit)
+    state.sponsor_intent[rows] = sponsor_intent
+    state.teo_exchange_intent[rows] = np.maximum(teo_wallet - sponsor_intent, 0)
+    state.euro_exchange_intent[rows] = np.maximum(monthly_deposit - teo_wallet, 0)
+    state.withdraw_intent[rows] = np.maximum(teo_wallet + euro_wallet - monthly_deposit, 0)
+    if steps == 0:
+        state.deposit_intent[rows] = state.monthly_hours[rows]
+    contributing = rows[state.action_draw[rows] < 1/3]
+    state.contribution_intent[contributing] = state.monthly_hours[contributing]
+
+    # CharitableSponsor: deposit, exchange all euros, sponsor all teos
+    rows, teo_wallet, euro_wallet = policy(CHARITABLE_SPONSOR)
+    state.deposit_intent[rows] = state.monthly_deposit[rows]
+    state.sponsor_intent[rows] = teo_wallet
+    state.euro_exchange_intent[rows] = euro_wallet
+
+    # Investor: withdraw a random share once in 24 ticks, otherwise deposit and exchange
+    rows, teo_wallet, euro_wallet = policy(INVESTOR)
+    withdrawing = state.action_draw[rows] < 1/24
+    investing = rows[~withdrawing]
+    state.deposit_intent[investing] = state.monthly_deposit[investing]
+    state.teo_exchange_intent[investing] = teo_wallet[~withdrawing]
+    state.euro_exchange_intent[investing] = euro_wallet[~withdrawing]
+    rows, euro_wallet = rows[withdrawing], euro_wallet[withdrawing]
+    withdraw_intent = (0.2 + 0.6 * state.amount_draw[rows]) * euro_wallet
+    short = euro_wallet < withdraw_intent
+    state.teo_exchange_intent[rows[short]] = withdraw_intent[short] - euro_wallet[short]
+    state.withdraw_intent[rows] = np.minimum(euro_wallet, withdraw_intent)
+
+    # customers that exit exchange all teos and withdraw all euros
+    state.teo_exchange_intent[exiting] = state.teo_wallet[exiting]
+    state.withdraw_intent[exiting] = state.euro_wallet[exiting]
+
+
+def _register(buffer, rows, values):
+    """Appends the actions with a positive value to an action buffer.
+
+    Args:
+        buffer (ActionBuffer): Buffer of the action type.
+        rows (ndarray): Rows of the customers in row order.
+        values (ndarray): Intended values aligned with rows.
+
+    Returns:
+        ndarray: Mask of the registered actions.
+
+    """
+    positive = values > 0
+    buffer.extend(rows[positive], values[positive])
+    return positive
+
+
+def split_cohorts(model, parents, sizes):
+    """Splits members off cohort rows into new cohorts with the same per-member state.
+
+    Args:
+        model (TeoModel): Model using the cohort engine.
+        parents (ndarray): Rows of the cohorts.
+        sizes (ndarray): Number of members moving to the new cohort of each parent.
+
+    Returns:
+        ndarray: Rows of the new cohorts aligned with parents.
+
+    """
+    state = model.schedule.state
+    children = np.empty(len(parents), dtype=np.int64)
+    types = state.agent_type[parents]
+    for agent_type in COHORT_TYPES:
+        selected = types == AGENT_TYPES.index(agent_type)
+        if selected.any():
+            children[selected] = model.add_cohorts(agent_type, sizes[selected], log=False)
+    for name in COLUMNS:
+        column = getattr(state, name)
+        column[children] = column[parents]
+    state.weight[parents] -= sizes
+    return children
+
+
+def split_partial_exits(model, rows, values, filled):
+    """Splits exiting cohorts whose exchange order was filled partially.
+
+    A partially filled order would leave every member of a cohort with the same
+    remainder and an exiting cohort would never empty its wallets. Instead the
+    fill is assigned like in the agent engine: as many members as the filled value
+    covers are split off with their orders filled completely, one member is split
+    off with the rest of the filled value and the other members stay unfilled.
+
+    Args:
+        model (TeoModel): Model using the cohort engine.
+        rows (ndarray): Rows of the orders.
+        values (ndarray): Value of each order per member.
+        filled (ndarray): Filled value of each order per member.
+
+    Returns:
+        tuple: Rows and filled value per member, including the new cohorts.
+
+    """
+    state = model.schedule.state
+    weights = state.weight[rows]
+    split = state.exit_triggered[rows] & (weights > 1) & (filled > 0) & (filled < values)
+    if not split.any():
+        return rows, filled
+    parents, weights, values = rows[split], weights[split], values[split]
+    members = filled[split] * weights / values
+    completed = np.minimum(np.floor(members), weights - 1).astype(np.int64)
+    rest = (members - completed) * values
+    filled = filled.copy()
+    filled[split] = 0
+    rows, filled = [rows], [filled]
+
+    full = completed > 0
+    rows.append(split_cohorts(model, parents[full], completed[full]))
+    filled.append(values[full])
+    # the last remaining member keeps the rest on its own row
+    single = (rest > 0) & (weights - completed == 1)
+    partial = (rest > 0) & ~single
+    rows.append(split_cohorts(model, parents[partial], np.ones(partial.sum(), dtype=np.int64)))
+    filled.append(rest[partial])
+    rows.append(parents[single])
+    filled.append(rest[single])
+    return np.concatenate(rows), np.concatenate(filled)
+
+
+def thin_cohorts(model, rows):
+    """Draws the churn of cohort rows by binomial thinning.
+
+    The number of members of each cohort that decide to exit is binomial in the
+    size of the cohort. If all members exit, the whole cohort is marked, otherwise
+    the exiting members are split off into a new cohort row with the same
+    per-member state, which is marked as exiting.
+
+    Args:
+        model (TeoModel): Model using the cohort engine.
+        rows (ndarray): Rows of the active customers.
+
+    Returns:
+        ndarray: Rows of the cohorts that decided to exit in this tick.
+
+    """
+    state = model.schedule.state
+    cohort_types = [AGENT_TYPES.index(agent_type) for agent_type in COHORT_TYPES]
+    rows = rows[np.isin(state.agent_type[rows], cohort_types) & ~state.exit_triggered[rows]]
+    n_exits = model.rng.binomial(state.weight[rows], model.churn_prob)
+    split = (n_exits > 0) & (n_exits < state.weight[rows])
+    triggered = np.concatenate([rows[n_exits == state.weight[rows]],
+                                split_cohorts(model, rows[split], n_exits[split])])
+    state.exit_triggered[triggered] = True
+    model.events.log_many('exit_triggered', state.agent_id[triggered], state.weight[triggered])
+    return triggered
+
+
+def step_customers(model):
+    """Steps all customers of a model with array operations instead of agent objects.
+
+    Equivalent to calling the step method of every customer in row order, which is
+    the order the object engine activates them in: the intents of each customer type
+    are computed from the AgentState with the policies of Contributor,
+    VerificationSponsor, CharitableSponsor and Investor, and every action is
+    registered with the checks of Teo.register_* in one pass. Customers only depend
+    on their own row, so the registered actions, the state and the random stream are
+    identical to the object engine. Within a tick, the event log lists all exit
+    triggers before the completed exits.
+
+    With the cohort engine the churn of COHORT_TYPES is drawn by thin_cohorts and
+    every row acts for all members of its cohort.
+
+    Args:
+        model (TeoModel): Model whose customers are stepped.
+
+    """
+    schedule = model.schedule
+    state = schedule.state
+    register = model.teo.action_register
+    steps = schedule.steps
+
+    rows = np.flatnonzero(state.active[:state.size])
+    candidates = rows
+    if model.engine == 'cohort':
+        thin_cohorts(model, rows)
+        rows = np.flatnonzero(state.active[:state.size])
+        cohort_types = [AGENT_TYPES.index(agent_type) for agent_type in COHORT_TYPES]
+        candidates = rows[~np.isin(state.agent_type[rows], cohort_types)]
+    churned = candidates[state.churn_draw[candidates] < model.churn_prob]
+    triggered = churned[~state.exit_triggered[churned]]
+    state.exit_triggered[triggered] = True
+    model.events.log_many('exit_triggered', state.agent_id[triggered], state.weight[triggered])
+    is_exiting = state.exit_triggered[rows]
+    exiting = rows[is_exiting]
+    _set_intents(state, rows[~is_exiting], exiting, steps)
+
+    _register(register['deposit'], rows, state.deposit_intent[rows])
+    contribution = state.contribution_intent[rows]
+    allowed = contribution <= state.hour_wallet[rows]
+    _register(register['contribution'], rows[allowed], contribution[allowed])
+    for action, intent, wallet, staged in (
+            ('sponsorship', state.sponsor_intent, state.teo_wallet, state.staged_teo),
+            ('euro_exchange', state.euro_exchange_intent, state.euro_wallet, state.staged_euro),
+            ('teo_exchange', state.teo_exchange_intent, state.teo_wallet, state.staged_teo),
+            ('withdraw', state.withdraw_intent, state.euro_wallet, state.staged_euro)):
+        values = intent[rows]
+        allowed = values <= wallet[rows] - staged[rows]
+        if action == 'withdraw':
+            allowed &= steps - state.last_withdraw_tick[rows] >= 2
+        registered = rows[allowed][_register(register[action], rows[allowed], values[allowed])]
+        staged[registered] += intent[registered]
+
+    # customers without funds leave the system at the end of the tick
+    leaving = exiting[state.teo_wallet[exiting] + state.euro_wallet[exiting] == 0]
+    model.events.log_many('exit', state.agent_id[leaving], state.weight[leaving])
+    schedule.pending_removals.extend(leaving.tolist())
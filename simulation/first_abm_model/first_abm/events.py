@@ -0,0 +1,120 @@
+import numpy as np
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+
+LEVELS = {
+    'debug': DEBUG,
+    'info': INFO,
+    'warning': WARNING,
+}
+
+# lifecycle events of customers and their severity
+EVENTS = {
+    'join': INFO,
+    'exit_triggered': INFO,
+    'exit': INFO,
+    'withdraw': DEBUG,
+    'partial_fill': DEBUG,
+}
+
+EVENT_NAMES = list(EVENTS)
+
+EVENT_COLUMNS = {
+    'Step': np.int64,
+    'Event': np.int8,
+    'Severity': np.int8,
+    'AgentID': np.int64,
+    'Value': np.float64,
+}
+
+
+class EventLog:
+    """Structured log of customer lifecycle events.
+
+    Events are written to a table of the DataCollector with the columns in
+    EVENT_COLUMNS, which are preallocated numpy columns. The event type is stored
+    as the index into EVENT_NAMES. Only events whose severity is at least the level
+    of the log are recorded; with level None the log is disabled and every call
+    returns before touching the table.
+
+    """
+
+    def __init__(self, model, table_name='Events', level='info'):
+        """Initializes an event log.
+
+        Args:
+            model (Model): Instance of the model class, its datacollector owns the table.
+            table_name (str): Name of the table.
+            level (str): Minimum severity to record, 'debug', 'info', 'warning' or
+                None to disable the log.
+
+        """
+        self.model = model
+        self.table_name = table_name
+        self.set_level(level)
+
+    def set_level(self, level):
+        """Sets the minimum severity of recorded events.
+
+        Args:
+            level (str): 'debug', 'info', 'warning' or None to disable the log.
+
+        """
+        if level is not None and level not in LEVELS:
+            raise Exception("Unknown event level: " + str(level))
+        self.level = level
+        self.enabled = {event: level is not None and severity >= LEVELS[level]
+                        for event, severity in EVENTS.items()}
+
+    def log(self, event, agent_id, value=0.):
+        """Records a single event.
+
+        Args:
+            event (str): Name of the event, see EVENTS.
+            agent_id (int): Unique id of the customer.
+            value (float): Value of the event, the number of customers of join and
+                exit events, the withdrawn euros or filled value per customer.
+
+        """
+        if not self.enabled[event]:
+            return
+        self.model.datacollector.add_table_row(self.table_name, {
+            'Step': self.model.schedule.steps,
+            'Event': EVENT_NAMES.index(event),
+            'Severity': EVENTS[event],
+            'AgentID': agent_id,
+            'Value': value,
+        })
+
+    def log_many(self, event, agent_ids, values=None):
+        """Records one event for each of several customers at once.
+
+        Args:
+            event (str): Name of the event, see EVENTS.
+            agent_ids (ndarray): Unique ids of the customers.
+            values (ndarray): Values of the events, zero if None.
+
+        """
+        if not self.enabled[event] or len(agent_ids) == 0:
+            return
+        n = len(agent_ids)
+        self.model.datacollector.add_table_rows(self.table_name, {
+            'Step': np.full(n, self.model.schedule.steps),
+            'Event': np.full(n, EVENT_NAMES.index(event)),
+            'Severity': np.full(n, EVENTS[event]),
+            'AgentID': agent_ids,
+            'Value': np.zeros(n) if values is None else values,
+        })
+
+    def get_dataframe(self):
+        """Returns the recorded events with the event and severity names.
+
+        """
+        df = self.model.datacollector.get_table_dataframe(self.table_name)
+        severities = {severity: name for name, severity in LEVELS.items()}
+        df['Event'] = np.array(EVENT_NAMES, dtype=object)[df['Event'].to_numpy()]
+        df['Severity'] = df['Severity'].map(severities)
+        return df
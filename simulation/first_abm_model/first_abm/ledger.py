@@ -0,0 +1,56 @@
+import numpy as np
+
+
+class Ledger:
+    """Running system totals that are updated on every wallet mutation.
+
+    The ledger keeps the total euros and teos in the system as well as the hours
+    contributed and the euros exchanged in the current tick, so that reward pools
+    and model reporters do not have to scan the whole population.
+
+    """
+
+    def __init__(self):
+        self.euros = 0.
+        self.teos = 0.
+        self.hours = 0.
+        self.exchanged_euros = 0.
+
+    def record(self, euros=0, teos=0, hours=0, exchanged_euros=0):
+        """Records a change of the system totals.
+
+        Args:
+            euros (float): Change of euros in the system.
+            teos (float): Change of teos in the system.
+            hours (float): Hours contributed.
+            exchanged_euros (float): Euros exchanged for teos.
+
+        """
+        self.euros += euros
+        self.teos += teos
+        self.hours += hours
+        self.exchanged_euros += exchanged_euros
+
+    def reset_parameters(self):
+        """Resets the per-tick totals at the beginning of a new tick.
+
+        """
+        self.hours = 0.
+        self.exchanged_euros = 0.
+
+    def verify(self, state):
+        """Cross-checks the running totals against a full recompute from the state.
+
+        Args:
+            state (AgentState): State of all customers.
+
+        """
+        recomputed = {
+            'euros': state.total('euro_wallet'),
+            'teos': state.total('teo_wallet'),
+            'hours': state.total('contributed_hours'),
+            'exchanged_euros': state.total('exchanged_euros'),
+        }
+        for name, total in recomputed.items():
+            if not np.isclose(getattr(self, name), total, rtol=1e-9, atol=1e-6):
+                raise Exception("Ledger total '%s' is %s, recomputed total is %s" % (name, getattr(self, name), total))
@@ -2,9 +2,13 @@ import numpy as np
 from mesa import Model
 from .schedule import ActivationByType
 from .datacollection import DataCollector
-from time import time
-import itertools
+from .profiling import PhaseTimer
+from .events import EventLog, EVENT_COLUMNS
+from .engine import COHORT_TYPES
+from .checkpoint import save_checkpoint, load_checkpoint, fork_model, checkpoint_path, prune_checkpoints
 import datetime
+import inspect
+import os
 
 
 def get_exchange_reward_per_euro(model):
@@ -19,7 +23,7 @@ def get_exchange_reward_per_euro(model):
     total_teos = get_total_teos(model)
     exchange_pool = (total_euros - total_teos)*model.buffer_share*model.exchange_reward_share
     if exchanged_euros == 0 or exchange_pool <= 0:
-        return 0
+        return 0.
     exchange_reward_per_euro = exchange_pool / exchanged_euros 
     return round(float(exchange_reward_per_euro),4)
 
@@ -37,7 +41,7 @@ def get_contribution_reward_per_hour(model):
     contribution_pool = (total_euros - total_teos)*(1-model.buffer_share)
 
     if contributed_hours == 0 or contribution_pool <= 0:
-        return 0
+        return 0.
 
     contribution_reward_per_hour = contribution_pool / contributed_hours
     return round(float(contribution_reward_per_hour), 4)
@@ -49,8 +53,8 @@ def get_exchanged_euros(model):
         model (Model): Instance of the model class.
 
     """
-    exchanged_euros = np.sum([v.exchanged_euros for k, v in model.schedule.agents_by_type['Customer'].items()])
-    return round(float(np.sum(exchanged_euros)), 2)
+    exchanged_euros = model.schedule.ledger.exchanged_euros
+    return round(float(exchanged_euros), 2)
 
 def get_total_teos(model):
     """Method that returns all teos in the system at the end of the current tick.
@@ -59,8 +63,8 @@ def get_total_teos(model):
         model (Model): Instance of the model class.
 
     """
-    total_teos = [v.teo_wallet for k, v in model.schedule.agents_by_type['Customer'].items()]
-    return round(float(np.sum(total_teos)), 2)
+    total_teos = model.schedule.ledger.teos
+    return round(float(total_teos), 2)
 
 def get_total_euros(model):
     """Method that returns all euros in the system at the end of the current tick.
@@ -69,8 +73,8 @@ def get_total_euros(model):
         model (Model): Instance of the model class.
 
     """
-    total_euros = [v.euro_wallet for k, v in model.schedule.agents_by_type['Customer'].items()]
-    return round(float(np.sum(total_euros)), 2)
+    total_euros = model.schedule.ledger.euros
+    return round(float(total_euros), 2)
 
 def get_total_hours(model):
     """Method that returns all hours that were contributed in the current tick.
@@ -79,8 +83,8 @@ def get_total_hours(model):
         model (Model): Instance of the model class.
 
     """
-    total_hours = [v.contributed_hours for k, v in model.schedule.agents_by_type['Customer'].items()]
-    return round(float(np.sum(total_hours)), 2)
+    total_hours = model.schedule.ledger.hours
+    return round(float(total_hours), 2)
 
 def get_number_of_agents(model):
     """Method that returns the number of agents in the system.
@@ -90,7 +94,7 @@ def get_number_of_agents(model):
 
     """
 
-    n_agents = len(model.schedule.agents_by_type['Customer'])
+    n_agents = model.schedule.get_customer_count()
     return n_agents
 
 def get_number_of_contributors(model):
@@ -100,7 +104,7 @@ def get_number_of_contributors(model):
         model (Model): Instance of the model class.
 
     """
-    n_agents = len([k for k, v in model.schedule.agents_by_type['Customer'].items() if v.__class__.__name__ == 'Contributor'])
+    n_agents = model.schedule.get_type_count('Contributor')
     return n_agents
 
 def get_number_of_ver_sponsors(model):
@@ -110,7 +114,7 @@ def get_number_of_ver_sponsors(model):
         model (Model): Instance of the model class.
 
     """
-    n_agents = len([k for k, v in model.schedule.agents_by_type['Customer'].items() if v.__class__.__name__ == 'VerificationSponsor'])
+    n_agents = model.schedule.get_type_count('VerificationSponsor')
     return n_agents
 
 def get_number_of_char_sponsors(model):
@@ -120,7 +124,7 @@ def get_number_of_char_sponsors(model):
         model (Model): Instance of the model class.
 
     """
-    n_agents = len([k for k, v in model.schedule.agents_by_type['Customer'].items() if v.__class__.__name__ == 'CharitableSponsor'])
+    n_agents = model.schedule.get_type_count('CharitableSponsor')
     return n_agents
 
 def get_number_of_investors(model):
@@ -130,19 +134,56 @@ def get_number_of_investors(model):
         model (Model): Instance of the model class.
 
     """
-    n_agents = len([k for k, v in model.schedule.agents_by_type['Customer'].items() if v.__class__.__name__ == 'Investor'])
+    n_agents = model.schedule.get_type_count('Investor')
     return n_agents
 
 
 from .agents import Contributor, VerificationSponsor, CharitableSponsor, Investor, Teo
 
+CUSTOMER_CLASSES = {
+    'Contributor': Contributor,
+    'VerificationSponsor': VerificationSponsor,
+    'CharitableSponsor': CharitableSponsor,
+    'Investor': Investor,
+}
+
+# AgentState fields whose distribution per customer type is summarised every tick
+# with collect_distributions=True
+DISTRIBUTIONS = {
+    "Euro Wallet": "euro_wallet",
+    "Teo Wallet": "teo_wallet",
+    "Contribution Surplus": "contribution_surplus",
+    "Exchange Surplus": "exchange_surplus",
+}
+
+TIMING_TABLE = 'Phase Timings'
+EVENT_TABLE = 'Events'
+
+
+def call_arguments(function, arguments):
+    """Returns the arguments of a call in the order of the function's signature.
+
+    Args:
+        function (callable): Called function, `self` is left out.
+        arguments (dict): Local variables at the start of the call, e.g. locals().
+
+    """
+    names = [name for name in inspect.signature(function).parameters if name != 'self']
+    return {name: arguments[name] for name in names}
+
+
 class TeoModel(Model):
     """A model simulating the TEO mechanics.
     """
 
+    customer_classes = CUSTOMER_CLASSES
+
     def __init__(self, n_contributors, n_char_sponsors, n_ver_sponsors, n_investors,
         buffer_share, exchange_reward_share, new_user_growth, churn_prob, months_with_growth,
-        store_data):
+        store_data, debug=False, output_format='csv', collect_agents=True, seed=None,
+        growth_base=None, checkpoint_every=None, checkpoint_dir='checkpoints', checkpoint_keep=3,
+        timing=False, event_level='info', agent_sample=None, sample_salt=0, compact_agents=False,
+        agent_memory_mb=None, spill_dir=None, collect_distributions=False, engine='object', trace=False):
 
         """Initializes a new TEO model with a certain number of agents of each type.
                
@@ -157,9 +198,60 @@ class TeoModel(Model):
             churn_prob (float): Probability to churn.
             months_with_growth (int): Number of months until new users=churn.
             store_data (bool): True if datacollector output should be stored.
+            debug (bool): True if the ledger totals should be cross-checked against
+                a full recompute every tick.
+            output_format (str): Format of the stored data, 'csv' or 'parquet'.
+            collect_agents (bool): False if only model-level variables should be collected.
+            seed (int): Seed of the random number generator, runs with the same seed
+                are identical.
+            growth_base (dict): Maps each customer type to the type whose number of
+                agents is the base population for its new users. By default the
+                number of contributors is the base population of every type.
+            checkpoint_every (int): If set, a checkpoint is saved every
+                checkpoint_every ticks.
+            checkpoint_dir (str): Directory of the automatic checkpoints.
+            checkpoint_keep (int): Number of automatic checkpoints to keep, older
+                ones are deleted.
+            timing (bool): True if the phases of every tick are timed, see
+                PhaseTimer. Timing can be switched at runtime with
+                `model.timer.enabled`.
+            trace (bool): True if the most recent timed phase calls are kept for
+                export_chrome_trace.
+            event_level (str): Minimum severity of the customer lifecycle events
+                recorded in the event log, 'debug', 'info', 'warning' or None to
+                disable the log, see EventLog.
+            agent_sample (float or dict): Share of the customers whose agent-level
+                variables are collected, or a dict mapping customer types to their
+                share for a sample stratified by type, see AgentSample. The sample
+                is stable over the run and includes new customers at the same rate.
+                None collects every customer.
+            sample_salt (int): Selects another sample of the same size.
+            compact_agents (bool): True if the agent-level variables are stored in
+                compact, sparse chunks (float values are rounded to float32), see
+                CompactAgentPanel.
+            agent_memory_mb (float): Megabytes of compact agent-level data kept in
+                memory, older chunks are spilled to disk. None keeps all of them.
+            spill_dir (str): Directory of spilled chunks, a temporary directory if None.
+            collect_distributions (bool): True if the count, mean, variance,
+                quantiles and histogram of the fields in DISTRIBUTIONS are
+                collected per customer type every tick, e.g. as the model variable
+                'Contributor Euro Wallet P50', see DistributionReporter.
+            engine (str): 'object' steps every customer object, 'vector' steps all
+                customers with array operations on the AgentState (see
+                step_customers). Both engines produce identical runs. 'cohort'
+                additionally keeps all customers of a type in COHORT_TYPES that
+                joined in the same tick in one row, draws their churn by binomial
+                thinning and clears their exchanges as one weighted order; its
+                aggregates are statistically equivalent to the other engines.
+                Investors and verification sponsors still take one row each, and
+                with the default growth_base they join in proportion to the
+                contributors, so they dominate the cost of large cohort runs.
+                'vector' and 'cohort' require the customer classes of CUSTOMER_CLASSES.
 
 
         """
+        # the arguments are kept so that checkpoints and forks can recreate the model
+        self.parameters = call_arguments(TeoModel.__init__, locals())
         self.step_id = 0
         self.n_contributors = n_contributors
         self.n_char_sponsors = n_char_sponsors
@@ -171,8 +263,39 @@ class TeoModel(Model):
         self.churn_prob = churn_prob/100
         self.months_with_growth = months_with_growth
         self.store_data = store_data
+        self.debug = debug
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_keep = checkpoint_keep
+        if engine not in ('object', 'vector', 'cohort'):
+            raise Exception("Unknown engine: " + str(engine))
+        if engine != 'object' and self.customer_classes is not CUSTOMER_CLASSES:
+            raise Exception("The %s engine only supports the customer classes of CUSTOMER_CLASSES." % engine)
+        self.engine = engine
+        self.timer = PhaseTimer(enabled=timing, keep_events=trace)
+        self.events = EventLog(self, EVENT_TABLE, event_level)
+        self.rng = np.random.default_rng(seed)
+        self.growth_base = {agent_type: 'Contributor' for agent_type in CUSTOMER_CLASSES}
+        if growth_base is not None:
+            self.growth_base.update(growth_base)
         self.init_datetime = datetime.datetime.now()
         self.schedule = ActivationByType(self)
+        agent_reporters = {
+            "Euro Wallet": "euro_wallet",
+            "Teo Wallet": "teo_wallet",
+            "Contribution Surplus": "contribution_surplus",
+            "Exchange Surplus": "exchange_surplus",
+            "Registered Sponsored Teos": "sponsor_intent",
+            "Registered Exchange Teos": "teo_exchange_intent",
+            "Exchanged Teos": "exchanged_teos",
+            "Registered Exchange Euros": "euro_exchange_intent",
+            "Exchanged Euros": "exchanged_euros",
+            "Contributed Hours": "contributed_hours",
+            "Registered Withdraw Euros": "withdraw_intent",
+            "Withdrawn Euros": "withdrawn_euros",
+            "Last withdraw tick": "last_withdraw_tick",
+            "Exit triggered bool": "exit_triggered"
+        }
         self.datacollector = DataCollector(model_reporters={
                                               "Total Euros": get_total_euros,
                                               "Total Teos": get_total_teos,
@@ -185,80 +308,196 @@ class TeoModel(Model):
                                               "Number of Charitable Sponsors": get_number_of_char_sponsors,
                                               "Number of Verification Sponsors": get_number_of_ver_sponsors
                                           },
-                                          agent_reporters={
-                                              "Euro Wallet": lambda a: a.euro_wallet,
-                                              "Teo Wallet": lambda a: a.teo_wallet,
-                                              "Contribution Surplus": lambda a: a.contribution_surplus,
-                                              "Exchange Surplus": lambda a: a.exchange_surplus,     
-                                              "Registered Sponsored Teos": lambda a: a.sponsor_intent,
-                                              "Registered Exchange Teos": lambda a: a.teo_exchange_intent,
-                                              "Exchanged Teos": lambda a: a.exchanged_teos,
-                                              "Registered Exchange Euros": lambda a: a.euro_exchange_intent,                                              
-                                              "Exchanged Euros": lambda a: a.exchanged_euros,                                              
-                                              "Contributed Hours": lambda a: a.contributed_hours,
-                                              "Registered Withdraw Euros": lambda a: a.withdraw_intent,
-                                              "Withdrawn Euros": lambda a: a.withdrawn_euros,
-                                              "Last withdraw tick": lambda a: a.last_withdraw_tick,
-                                              "Exit triggered bool": lambda a: a.exit_triggered 
-                                          })
+                                          agent_reporters=agent_reporters if collect_agents else None,
+                                          columnar=True,
+                                          tables={TIMING_TABLE: ['Step', 'Phase', 'Seconds', 'Calls'],
+                                                  EVENT_TABLE: EVENT_COLUMNS},
+                                          output_format=output_format,
+                                          agent_labels=self.agent_labels,
+                                          sample=agent_sample,
+                                          sample_salt=sample_salt,
+                                          compact=compact_agents,
+                                          memory_budget=agent_memory_mb * 2**20 if agent_memory_mb is not None else None,
+                                          spill_dir=spill_dir,
+                                          distribution_reporters=DISTRIBUTIONS if collect_distributions else None)
 
         # Create agents
-        self.teo = Teo(0, self)
+        self.teo = Teo(-1, self)
         self.schedule.add(self.teo)
         
-        for _ in itertools.repeat(None, self.n_contributors):
-            a = Contributor('Contributor_'+self.uniqid(), self, self.teo)
-            self.schedule.add(a)
-            
-        for _ in itertools.repeat(None, self.n_ver_sponsors):
-            a = VerificationSponsor('Ver_Sponsor_'+self.uniqid(), self, self.teo)
-            self.schedule.add(a)
-            
-        for _ in itertools.repeat(None, self.n_char_sponsors):
-            a = CharitableSponsor('Char_Sponsor_'+self.uniqid(), self, self.teo)
-            self.schedule.add(a)
-            
-        for _ in itertools.repeat(None, self.n_investors):
-            a = Investor('Investor_'+self.uniqid(), self, self.teo)
-            self.schedule.add(a)
+        self.add_customers('Contributor', self.n_contributors)
+        self.add_customers('VerificationSponsor', self.n_ver_sponsors)
+        self.add_customers('CharitableSponsor', self.n_char_sponsors)
+        self.add_customers('Investor', self.n_investors)
 
         self.running = True
 
-    def uniqid(self):
-        return hex(int(time()*10000000))[2:]
+    def save_checkpoint(self, path):
+        """Saves the model to a checkpoint file between two ticks.
 
-    def step(self):
+        Args:
+            path (str): File name of the checkpoint.
+
+        """
+        save_checkpoint(self, path)
+
+    @classmethod
+    def load_checkpoint(cls, path):
+        """Restores a model from a checkpoint file.
+
+        The restored model continues exactly like the model that was saved.
+
+        Args:
+            path (str): File name of the checkpoint.
+
+        """
+        return load_checkpoint(cls, path)
+
+    def fork(self, k=1, **overrides):
+        """Forks the model into k independent copies of its current state.
+
+        The copies are created with a bulk copy of the agent state and continue
+        with the overridden parameters and their own random streams, e.g.
+        `model.fork(3, buffer_share=30)`.
+
+        Args:
+            k (int): Number of copies.
+            **overrides: TeoModel parameters that differ in the copies.
+
+        """
+        return fork_model(self, k, **overrides)
+
+    def get_timings_dataframe(self):
+        """Returns the recorded phase timings with one row per tick and phase.
+
+        """
+        return self.datacollector.get_table_dataframe(TIMING_TABLE)
+
+    def get_histogram_dataframe(self, name):
+        """Returns the histograms of a variable in DISTRIBUTIONS per tick and customer type.
+
+        Args:
+            name (str): Name of the variable, e.g. 'Euro Wallet'.
+
+        """
+        return self.datacollector.get_histogram_dataframe(name)
+
+    def get_events_dataframe(self):
+        """Returns the customer lifecycle events recorded in the event log.
+
+        """
+        return self.events.get_dataframe()
+
+    def export_chrome_trace(self, path):
+        """Writes the recorded phase timings as a Chrome trace.
+
+        Args:
+            path (str): File name of the trace.
+
+        """
+        self.timer.export_chrome_trace(path)
+
+    def close(self):
+        """Flushes and closes the stored output at the end of a run.
+
+        """
+        self.datacollector.close()
+
+    def add_customers(self, agent_type, n):
+        """Creates n new customers of a type and inserts them in bulk.
+
+        The rows and ids of all new customers are allocated in the AgentState at
+        once, reusing the rows of customers that left, and the customers are added
+        to the schedule in one batch.
+
+        Args:
+            agent_type (str): Class name of the customers.
+            n (int): Number of new customers.
+
+        """
+        if self.engine == 'cohort' and agent_type in COHORT_TYPES:
+            if n > 0:
+                self.add_cohorts(agent_type, [n])
+            return
+        agent_class = CUSTOMER_CLASSES[agent_type]
+        state = self.schedule.state
+        rows = state.allocate(agent_type, n)
+        agent_ids = state.agent_id[rows]
+        agents = [agent_class(agent_id, self, self.teo, row) for agent_id, row in zip(agent_ids.tolist(), rows.tolist())]
+        self.schedule.add_many(agents)
+        self.events.log_many('join', agent_ids, np.ones(len(rows)))
+
+    def add_cohorts(self, agent_type, sizes, log=True):
+        """Creates cohort rows of a type for the cohort engine.
+
+        Each cohort is a single customer object on a row of the AgentState whose
+        weight is the number of members.
+
+        Args:
+            agent_type (str): Class name of the customers.
+            sizes (list): Number of members of each cohort.
+            log (bool): True if the members are logged as joins.
+
+        Returns:
+            ndarray: Rows of the new cohorts.
+
+        """
+        agent_class = CUSTOMER_CLASSES[agent_type]
+        state = self.schedule.state
+        rows = state.allocate(agent_type, len(sizes))
+        state.weight[rows] = sizes
+        agent_ids = state.agent_id[rows]
+        self.schedule.add_many([agent_class(agent_id, self, self.teo, row)
+                                for agent_id, row in zip(agent_ids.tolist(), rows.tolist())])
+        if log:
+            self.events.log_many('join', agent_ids, state.weight[rows])
+        return rows
+
+    def agent_labels(self, agent_ids):
+        """Returns human-readable labels like 'Contributor_17' for customer ids.
+
+        Args:
+            agent_ids (ndarray): Unique ids of customers.
+
+        """
+        return self.schedule.state.id_labels(agent_ids)
+
+    def grow(self):
+        """Adds the new users of the current tick.
+
+        """
         new_user_growth_adjusted = self.new_user_growth - (self.new_user_growth - self.churn_prob)/self.months_with_growth * min([self.months_with_growth, self.schedule.steps])
 
-        # generate new users
-        self.n_contributors = len([k for k, v in self.schedule.agents_by_type['Customer'].items() if v.__class__.__name__ == 'Contributor'])
-        for _ in itertools.repeat(None, self.n_contributors):
-            if np.random.uniform(0, 1) < new_user_growth_adjusted:
-                a = Contributor('Contributor_'+self.uniqid(), self, self.teo)
-                self.schedule.add(a)
-
-        self.n_ver_sponsors = len([k for k, v in self.schedule.agents_by_type['Customer'].items() if v.__class__.__name__ == 'VerificationSponsor'])
-        for _ in itertools.repeat(None, self.n_contributors):
-            if np.random.uniform(0, 1) < new_user_growth_adjusted:
-                a = VerificationSponsor('Ver_Sponsor_'+self.uniqid(), self, self.teo)
-                self.schedule.add(a)    
-
-        self.n_char_sponsors = len([k for k, v in self.schedule.agents_by_type['Customer'].items() if v.__class__.__name__ == 'CharitableSponsor'])  
-        for _ in itertools.repeat(None, self.n_contributors):
-            if np.random.uniform(0, 1) < new_user_growth_adjusted:
-                a = CharitableSponsor('Char_Sponsor'+self.uniqid(), self, self.teo)
-                self.schedule.add(a)    
-
-        self.n_investors = len([k for k, v in self.schedule.agents_by_type['Customer'].items() if v.__class__.__name__ == 'Investor'])    
-        for _ in itertools.repeat(None, self.n_contributors):
-            if np.random.uniform(0, 1) < new_user_growth_adjusted:
-                a = Investor('Investor_'+self.uniqid(), self, self.teo)
-                self.schedule.add(a)    
-
-        self.schedule.step()
- 
-        # collect data
-        self.datacollector.collect(self, self.store_data)
+        # generate new users, the number of arrivals per type is binomial in its base population
+        base_populations = {agent_type: self.schedule.get_type_count(base_type)
+                            for agent_type, base_type in self.growth_base.items()}
+        for agent_type in CUSTOMER_CLASSES:
+            n_new_users = self.rng.binomial(base_populations[agent_type], min(max(new_user_growth_adjusted, 0), 1))
+            self.add_customers(agent_type, n_new_users)
+
+        self.n_contributors = self.schedule.get_type_count('Contributor')
+        self.n_ver_sponsors = self.schedule.get_type_count('VerificationSponsor')
+        self.n_char_sponsors = self.schedule.get_type_count('CharitableSponsor')
+        self.n_investors = self.schedule.get_type_count('Investor')
+
+    def step(self):
+        timer = self.timer
+        with timer.phase('tick'):
+            with timer.phase('growth'):
+                self.grow()
+
+            self.schedule.step()
+
+            # collect data
+            with timer.phase('collect'):
+                self.datacollector.collect(self, self.store_data)
+
+            if self.checkpoint_every and self.schedule.steps % self.checkpoint_every == 0:
+                with timer.phase('checkpoint'):
+                    os.makedirs(self.checkpoint_dir, exist_ok=True)
+                    self.save_checkpoint(checkpoint_path(self.checkpoint_dir, self.schedule.steps))
+                    prune_checkpoints(self.checkpoint_dir, self.checkpoint_keep)
+        timer.flush(self.datacollector, TIMING_TABLE, self.schedule.steps - 1)
         # store data if store_data is True
         #results = model.datacollector.get_agent_vars_dataframe().reset_index()
         #results = results.rename(columns={'level_0': 'tick', 'level_1': 'agent_id'})
@@ -0,0 +1,144 @@
+import json
+import time
+from collections import defaultdict, deque
+
+
+class _NullPhase:
+    """Context manager that does nothing, used while timing is disabled.
+
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    """Context manager measuring one call of a phase.
+
+    """
+
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class PhaseTimer:
+    """Records wall time and call counts of the phases of a tick.
+
+    Phases are timed with `with timer.phase(name):`. While the timer is disabled
+    `phase` returns a shared no-op context manager, so instrumented code costs one
+    attribute lookup and a call per phase. The timer can be switched on and off at
+    any time by setting `enabled`.
+
+    The totals of the current tick are written to a table of the DataCollector
+    with `flush`. With keep_events the most recent measured calls are also kept
+    as events, which can be exported as a Chrome trace (chrome://tracing,
+    Perfetto or speedscope) with `export_chrome_trace`.
+
+    """
+
+    def __init__(self, enabled=False, keep_events=False, max_events=100000):
+        """Initializes a timer.
+
+        Args:
+            enabled (bool): True if phases are timed.
+            keep_events (bool): True if calls are kept for the trace export.
+            max_events (int): Number of most recent calls kept, older ones are dropped.
+
+        """
+        self.enabled = enabled
+        self.keep_events = keep_events
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.events = deque(maxlen=max_events)
+        self.step = 0
+
+    def phase(self, name):
+        """Returns a context manager timing one call of a phase.
+
+        Args:
+            name (str): Name of the phase.
+
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def record(self, name, start, seconds, calls=1, event=True):
+        """Adds a measurement to a phase of the current tick.
+
+        Args:
+            name (str): Name of the phase.
+            start (float): perf_counter() at the start of the measurement.
+            seconds (float): Measured wall time.
+            calls (int): Number of calls the measurement covers.
+            event (bool): False if the measurement is an aggregate that should not
+                appear in the trace.
+
+        """
+        self.seconds[name] += seconds
+        self.calls[name] += calls
+        if event and self.keep_events:
+            self.events.append((name, self.step, start, seconds))
+
+    def flush(self, datacollector, table_name, step):
+        """Writes the totals of the current tick to a table and starts a new tick.
+
+        Args:
+            datacollector (DataCollector): Collector owning the table.
+            table_name (str): Name of the table with the columns Step, Phase,
+                Seconds and Calls.
+            step (int): Tick the totals belong to.
+
+        """
+        for name, seconds in self.seconds.items():
+            datacollector.add_table_row(table_name, {
+                'Step': step,
+                'Phase': name,
+                'Seconds': seconds,
+                'Calls': self.calls[name],
+            })
+        self.seconds.clear()
+        self.calls.clear()
+        self.step = step + 1
+
+    def export_chrome_trace(self, path):
+        """Writes all kept events in the Chrome trace event format.
+
+        Args:
+            path (str): File name of the trace.
+
+        """
+        if not self.keep_events:
+            raise Exception("Trace events are not kept, create the timer with keep_events=True (trace=True in TeoModel).")
+        if not self.events:
+            origin = 0
+        else:
+            origin = min(event[2] for event in self.events)
+        trace_events = [{
+            'name': name,
+            'ph': 'X',
+            'ts': (start - origin) * 1e6,
+            'dur': seconds * 1e6,
+            'pid': 0,
+            'tid': 0,
+            'args': {'step': step},
+        } for name, step, start, seconds in self.events]
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, trace_file)
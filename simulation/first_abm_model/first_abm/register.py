@@ -0,0 +1,77 @@
+import numpy as np
+from .buffers import GrowableArray
+
+
+ACTIONS = ['deposit', 'contribution', 'sponsorship', 'withdraw', 'euro_exchange', 'teo_exchange']
+
+
+class ActionBuffer:
+    """Append buffer holding the registered actions of one type.
+
+    Each action is stored as the row index of the agent in the AgentState and
+    the registered value.
+
+    """
+
+    def __init__(self):
+        self._rows = GrowableArray(np.int64)
+        self._values = GrowableArray(np.float64)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def append(self, row, value):
+        """Appends an action.
+
+        Args:
+            row (int): Row index of the agent.
+            value (float): Registered value.
+
+        """
+        self._rows.append(row)
+        self._values.append(value)
+
+    def extend(self, rows, values):
+        """Appends several actions at once.
+
+        Args:
+            rows (ndarray): Row indices of the agents.
+            values (ndarray): Registered values.
+
+        """
+        self._rows.extend(rows)
+        self._values.extend(values)
+
+    @property
+    def rows(self):
+        return self._rows.view()
+
+    @property
+    def values(self):
+        return self._values.view()
+
+    def clear(self):
+        self._rows.clear()
+        self._values.clear()
+
+
+class ActionRegister:
+    """The action-register of Teo with one ActionBuffer per action type.
+
+    """
+
+    def __init__(self):
+        self.buffers = {action: ActionBuffer() for action in ACTIONS}
+
+    def __getitem__(self, action):
+        return self.buffers[action]
+
+    def __len__(self):
+        return sum(len(buffer) for buffer in self.buffers.values())
+
+    def reset(self):
+        """Empties all buffers at the end of a tick.
+
+        """
+        for buffer in self.buffers.values():
+            buffer.clear()
@@ -0,0 +1,69 @@
+import numpy as np
+from .state import AGENT_TYPES
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def hash_unit(agent_ids, salt=0):
+    """Maps agent ids to deterministic pseudo-random numbers in [0, 1).
+
+    Uses the splitmix64 finalizer, so the number of an agent only depends on its
+    id and the salt: it is the same in every tick, every run and every process.
+
+    Args:
+        agent_ids (ndarray): Integer agent ids.
+        salt (int): Selects an independent hash, e.g. to draw another sample.
+
+    """
+    x = np.asarray(agent_ids).astype(np.uint64)
+    x = x + np.uint64((0x9E3779B97F4A7C15 * (salt + 1)) & _MASK64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+class AgentSample:
+    """Deterministic subset of the customers whose agent-level variables are collected.
+
+    An agent is in the sample if the hash of its id is below the sampling fraction
+    of its type. Membership never changes during the life of an agent and agents
+    joining later are admitted at the same rate, so the sample stays a stable,
+    representative panel. A fraction of 1 keeps every agent of a type, 0 none.
+
+    """
+
+    def __init__(self, fraction, salt=0):
+        """Initializes a sample.
+
+        Args:
+            fraction (float or dict): Share of all customers, or a dict mapping
+                customer types to their share for a sample stratified by type.
+                Types missing from the dict are not sampled.
+            salt (int): Selects another sample of the same size.
+
+        """
+        if isinstance(fraction, dict):
+            unknown = set(fraction) - set(AGENT_TYPES)
+            if unknown:
+                raise Exception("Unknown agent types in sample: " + ', '.join(sorted(unknown)))
+            fractions = [fraction.get(agent_type, 0.) for agent_type in AGENT_TYPES]
+        else:
+            fractions = [fraction] * len(AGENT_TYPES)
+        if any(f < 0 or f > 1 for f in fractions):
+            raise Exception("Sampling fractions must be between 0 and 1.")
+        self.fraction = fraction
+        self.fractions = np.array(fractions, dtype=np.float64)
+        self.salt = salt
+
+    def select(self, rows, state):
+        """Returns the rows of the sampled agents.
+
+        Args:
+            rows (ndarray): Rows of the active customers in the AgentState.
+            state (AgentState): State of the customers.
+
+        """
+        threshold = self.fractions[state.agent_type[rows]]
+        return rows[hash_unit(state.agent_id[rows], self.salt) < threshold]
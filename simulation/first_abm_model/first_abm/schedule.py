@@ -1,16 +1,51 @@
 from collections import defaultdict
 from mesa.time import RandomActivation
+import time
+import numpy as np
+from .state import AgentState, AGENT_TYPES
+from .ledger import Ledger
+from .engine import step_customers
 
 
 class ActivationByType(RandomActivation):
     """A scheduler which activates each type of agent once per step.
     Assumes that all agents have a step() method.
+
+    The scheduler owns the AgentState that holds the state of all customers and
+    the Ledger with the running system totals. Besides the coarse 'Customer' bucket
+    it keeps the members of each concrete customer type in `customers_by_class`
+    and the customer on every AgentState row in `customers_by_row`. Customers are
+    activated in row order.
+
+    Customers that exit during a tick are queued with `remove_later` and removed in
+    one batch at the end of the tick. Their rows are reused by new customers and
+    the AgentState is compacted when more than `compact_share` of its rows are free.
     
     """
 
+    compact_share = 0.5
+
     def __init__(self, model):
         super().__init__(model)
         self.agents_by_type = defaultdict(dict)
+        self.customers_by_class = {agent_type: {} for agent_type in AGENT_TYPES}
+        self.customers_by_row = []
+        self.pending_removals = []
+        self.state = AgentState()
+        self.ledger = Ledger()
+
+    def _place(self, agents):
+        """Stores customers in customers_by_row under their rows.
+
+        Args:
+            agents: List of customers.
+
+        """
+        by_row = self.customers_by_row
+        if len(by_row) < self.state.size:
+            by_row.extend([None] * (self.state.size - len(by_row)))
+        for agent in agents:
+            by_row[agent.row] = agent
 
     def add(self, agent):
         """Add an Agent object to the schedule
@@ -22,27 +57,133 @@ class ActivationByType(RandomActivation):
 
         self._agents[agent.unique_id] = agent
         agent_type = agent.__class__.__name__
-        if agent_type in ['Investor', 
-                          'Contributor', 
-                          'VerificationSponsor',
-                          'CharitableSponsor']: agent_type = 'Customer'
+        if agent_type in AGENT_TYPES:
+            self.customers_by_class[agent_type][agent.unique_id] = agent
+            self._place([agent])
+            agent_type = 'Customer'
         self.agents_by_type[agent_type][agent.unique_id] = agent
 
+    def add_many(self, agents):
+        """Add a batch of customers of the same type to the schedule at once.
+
+        Args:
+            agents: List of customers of one concrete type.
+
+        """
+        if not agents:
+            return
+        agent_type = agents[0].__class__.__name__
+        members = [(agent.unique_id, agent) for agent in agents]
+        self._agents.update(members)
+        self.customers_by_class[agent_type].update(members)
+        self.agents_by_type['Customer'].update(members)
+        self._place(agents)
+
     def remove(self, agent):
         """Remove all instances of a given agent from the schedule.
         
         """
-        del self._agents[agent.unique_id]
+        self.remove_rows([agent.row])
+
+    def remove_later(self, agent):
+        """Queues a customer for removal at the end of the tick.
+
+        Args:
+            agent: Customer to be removed.
+
+        """
+        self.pending_removals.append(agent.row)
 
-        agent_type = self.__class__.__name__
-        del self.agents_by_type['Customer'][agent.unique_id]
+    def remove_rows(self, rows):
+        """Removes the customers on a batch of AgentState rows at once.
+
+        Their remaining funds are booked out of the ledger and their rows are put
+        on the free list of the AgentState.
+
+        Args:
+            rows: Rows of the customers.
+
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        by_row = self.customers_by_row
+        for row in rows.tolist():
+            agent = by_row[row]
+            by_row[row] = None
+            del self._agents[agent.unique_id]
+            del self.customers_by_class[agent.__class__.__name__][agent.unique_id]
+            del self.agents_by_type['Customer'][agent.unique_id]
+        state = self.state
+        weights = state.weight[rows]
+        self.ledger.record(euros=-(state.euro_wallet[rows] * weights).sum(),
+                           teos=-(state.teo_wallet[rows] * weights).sum())
+        state.release(rows)
+
+    def compact(self):
+        """Compacts the AgentState and moves the customers to their new rows.
+
+        """
+        kept = self.state.compact()
+        by_row = self.customers_by_row
+        self.customers_by_row = [by_row[row] for row in kept.tolist()]
+        for row, agent in enumerate(self.customers_by_row):
+            agent.row = row
+
+    def get_type_count(self, agent_type):
+        """Returns the number of customers of a concrete type in the schedule.
+
+        With the cohort engine every member of a cohort is counted.
+
+        Args:
+            agent_type (str): Class name of the customer type.
+
+        """
+        if self.model.engine == 'cohort':
+            return self.state.count(agent_type)
+        return len(self.customers_by_class[agent_type])
+
+    def get_customer_count(self):
+        """Returns the number of customers in the schedule.
+
+        With the cohort engine every member of a cohort is counted.
+
+        """
+        if self.model.engine == 'cohort':
+            return self.state.count()
+        return len(self.agents_by_type['Customer'])
+
+    def get_type_rows(self, agent_type):
+        """Returns the AgentState rows of all customers of a concrete type.
+
+        Args:
+            agent_type (str): Class name of the customer type.
+
+        """
+        members = self.customers_by_class[agent_type]
+        return np.fromiter((agent.row for agent in members.values()), dtype=np.int64, count=len(members))
 
     def step(self):
         """Executes the step of each agent type, one at a time.
+
+        Temporary parameters of all customers are reset and their random numbers
+        for the tick are drawn before they are activated.
         
         """
-        for agent_type in ['Customer', 'Teo']:
-            self.step_type(agent_type)
+        timer = self.model.timer
+        with timer.phase('reset'):
+            self.state.reset_parameters()
+            self.state.draw(self.model.rng)
+            self.ledger.reset_parameters()
+        with timer.phase('customers'):
+            self.step_type('Customer')
+        with timer.phase('teo'):
+            self.step_type('Teo')
+        with timer.phase('removal'):
+            self.remove_rows(self.pending_removals)
+            self.pending_removals = []
+            if len(self.state.free_rows) > self.compact_share * self.state.size:
+                self.compact()
         self.steps += 1
         self.time += 1
 
@@ -54,5 +195,34 @@ class ActivationByType(RandomActivation):
             type: Class name of the type to run.
             
         """
-        for agent_key in list(self.agents_by_type[type].keys()):
-            self.agents_by_type[type][agent_key].step()
+        if type == 'Customer' and self.model.engine in ('vector', 'cohort'):
+            step_customers(self.model)
+            return
+        if type == 'Customer' and self.model.timer.enabled:
+            self._step_customers_timed()
+            return
+        if type == 'Customer':
+            customers = self.customers_by_row
+            for row in np.flatnonzero(self.state.active[:self.state.size]).tolist():
+                customers[row].step()
+            return
+        for agent in self.agents_by_type[type].values():
+            agent.step()
+
+    def _step_customers_timed(self):
+        """Run all customers and record the step cost of each customer type.
+
+        """
+        seconds = defaultdict(float)
+        calls = defaultdict(int)
+        start = time.perf_counter()
+        customers = self.customers_by_row
+        for row in np.flatnonzero(self.state.active[:self.state.size]).tolist():
+            agent = customers[row]
+            agent_start = time.perf_counter()
+            agent.step()
+            agent_type = agent.__class__.__name__
+            seconds[agent_type] += time.perf_counter() - agent_start
+            calls[agent_type] += 1
+        for agent_type, agent_seconds in seconds.items():
+            self.model.timer.record('step:' + agent_type, start, agent_seconds, calls[agent_type], event=False)
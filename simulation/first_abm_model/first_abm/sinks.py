@@ -0,0 +1,211 @@
+"""
+Output Sinks
+============
+A sink receives the model- and agent-level data of every collected tick and
+writes it to disk. The files are opened once per run, ticks are buffered in
+memory and written in batches every `flush_every` ticks. A sink closes itself
+when the interpreter exits, so the last batch is not lost if a run is
+interrupted.
+
+Two backends are available:
+    * CSVSink writes agentdata_*.csv and modeldata_*.csv.
+    * ParquetSink writes agentdata_*.parquet and modeldata_*.parquet with one
+      row group per batch of ticks. It requires pyarrow.
+"""
+import atexit
+import csv
+import itertools
+import numpy as np
+
+
+class CSVSink:
+    """ Buffered sink writing the collected data to two CSV files. """
+
+    extension = 'csv'
+
+    def __init__(self, prefix, flush_every=12):
+        """ Create a new sink.
+        Args:
+            prefix: Suffix of the file names, the files are called
+                    agentdata_<prefix>.csv and modeldata_<prefix>.csv.
+            flush_every: Number of ticks to buffer before writing.
+        """
+        self.agent_path = 'agentdata_' + prefix + '.' + self.extension
+        self.model_path = 'modeldata_' + prefix + '.' + self.extension
+        self.flush_every = flush_every
+        self.n_buffered = 0
+        self.closed = False
+        self._opened = False
+        self._agent_rows = []
+        self._model_rows = []
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self, agent_fields, model_fields, labels=False):
+        """ Open the files and write the headers. """
+        self._agent_file = open(self.agent_path, 'w', newline='')
+        self._model_file = open(self.model_path, 'w', newline='')
+        self._agent_writer = csv.writer(self._agent_file)
+        self._model_writer = csv.writer(self._model_file)
+        label_field = ['agent_label'] if labels else []
+        self._agent_writer.writerow(['agent_id'] + label_field + ['tick'] + list(agent_fields))
+        self._model_writer.writerow(['tick'] + list(model_fields))
+        self._opened = True
+
+    def write(self, tick, model_data, agent_ids, agents_data, agent_labels=None):
+        """ Buffer the data of one tick and flush if the batch is full.
+        Args:
+            tick: Current tick of the model.
+            model_data: Dictionary mapping model-level variables to values.
+            agent_ids: Array of agent ids.
+            agents_data: Dictionary mapping agent-level variables to arrays
+                         aligned with agent_ids.
+            agent_labels: Optional array of human-readable labels aligned with
+                          agent_ids.
+        """
+        if self.closed:
+            raise Exception("Sink is closed.")
+        if not self._opened:
+            self._open(agents_data.keys(), model_data.keys(), agent_labels is not None)
+        self._buffer(tick, model_data, agent_ids, agents_data, agent_labels)
+        self.n_buffered += 1
+        if self.n_buffered >= self.flush_every:
+            self.flush()
+
+    def _buffer(self, tick, model_data, agent_ids, agents_data, agent_labels=None):
+        columns = [np.asarray(values).tolist() for values in agents_data.values()]
+        ids = [np.asarray(agent_ids).tolist()]
+        if agent_labels is not None:
+            ids.append(np.asarray(agent_labels).tolist())
+        self._agent_rows.extend(zip(*ids, itertools.repeat(tick), *columns))
+        self._model_rows.append([tick] + list(model_data.values()))
+
+    def flush(self):
+        """ Write all buffered ticks to disk. """
+        if self._opened:
+            self._agent_writer.writerows(self._agent_rows)
+            self._model_writer.writerows(self._model_rows)
+            self._agent_file.flush()
+            self._model_file.flush()
+        self._agent_rows = []
+        self._model_rows = []
+        self.n_buffered = 0
+
+    def close(self):
+        """ Flush the remaining ticks and close the files. """
+        if self.closed:
+            return
+        self.flush()
+        if self._opened:
+            self._agent_file.close()
+            self._model_file.close()
+        self.closed = True
+        atexit.unregister(self.close)
+
+
+class ParquetSink(CSVSink):
+    """ Buffered sink writing the collected data to two Parquet files.
+    Every flush writes one row group per file. The schema of the model file is
+    fixed by the first batch: model variables with integer values are stored
+    as int64 like in the CSV files, all other numeric model variables as
+    float64, so that later batches always match it.
+    """
+
+    extension = 'parquet'
+
+    def __init__(self, prefix, flush_every=12):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("ParquetSink requires pyarrow, install it with `pip3 install pyarrow`.")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        super().__init__(prefix, flush_every)
+
+    def _open(self, agent_fields, model_fields, labels=False):
+        self._agent_writer = None
+        self._model_writer = None
+        self._model_schema = None
+        self._opened = True
+
+    def _model_table(self):
+        """ Convert the buffered model rows to a table with the fixed schema. """
+        pa = self._pa
+        if self._model_schema is None:
+            schema = pa.Table.from_pylist(self._model_rows).schema
+            fields = []
+            for field in schema:
+                if pa.types.is_integer(field.type):
+                    field = field.with_type(pa.int64())
+                elif pa.types.is_floating(field.type) or pa.types.is_null(field.type):
+                    field = field.with_type(pa.float64())
+                fields.append(field)
+            self._model_schema = pa.schema(fields)
+        return pa.Table.from_pylist(self._model_rows, schema=self._model_schema)
+
+    def _buffer(self, tick, model_data, agent_ids, agents_data, agent_labels=None):
+        agent_ids = np.asarray(agent_ids)
+        batch = {'agent_id': agent_ids}
+        if agent_labels is not None:
+            batch['agent_label'] = np.asarray(agent_labels).astype(str)
+        batch['tick'] = np.full(len(agent_ids), tick, dtype=np.int64)
+        for var, values in agents_data.items():
+            batch[var] = np.asarray(values)
+        self._agent_rows.append(batch)
+        row = {'tick': tick}
+        row.update(model_data)
+        self._model_rows.append(row)
+
+    def _write_table(self, writer, path, table):
+        if writer is None:
+            writer = self._pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+        return writer
+
+    def flush(self):
+        if self._opened and self._model_rows:
+            agent_table = self._pa.table({
+                name: np.concatenate([batch[name] for batch in self._agent_rows])
+                for name in self._agent_rows[0]
+            })
+            model_table = self._model_table()
+            self._agent_writer = self._write_table(self._agent_writer, self.agent_path, agent_table)
+            self._model_writer = self._write_table(self._model_writer, self.model_path, model_table)
+        self._agent_rows = []
+        self._model_rows = []
+        self.n_buffered = 0
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        if self._opened:
+            for writer in (self._agent_writer, self._model_writer):
+                if writer is not None:
+                    writer.close()
+        self.closed = True
+        atexit.unregister(self.close)
+
+
+SINKS = {
+    'csv': CSVSink,
+    'parquet': ParquetSink,
+}
+
+
+def make_sink(output_format, prefix, flush_every=12):
+    """ Create a sink for an output format.
+    Args:
+        output_format: 'csv' or 'parquet'.
+        prefix: Suffix of the file names.
+        flush_every: Number of ticks to buffer before writing.
+    """
+    if output_format not in SINKS:
+        raise Exception("Unknown output format: " + str(output_format))
+    return SINKS[output_format](prefix, flush_every)
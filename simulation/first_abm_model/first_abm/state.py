@@ -0,0 +1,322 @@
+import numpy as np
+from .buffers import GrowableArray
+
+
+AGENT_TYPES = ['Contributor', 'VerificationSponsor', 'CharitableSponsor', 'Investor']
+
+LABEL_PREFIXES = {
+    'Contributor': 'Contributor_',
+    'VerificationSponsor': 'Ver_Sponsor_',
+    'CharitableSponsor': 'Char_Sponsor_',
+    'Investor': 'Investor_',
+}
+
+PERSISTENT_FIELDS = {
+    'monthly_deposit': np.float64,
+    'monthly_hours': np.float64,
+    'euro_wallet': np.float64,
+    'teo_wallet': np.float64,
+    'contribution_surplus': np.float64,
+    'exchange_surplus': np.float64,
+    'last_withdraw_tick': np.int64,
+    'exit_triggered': np.bool_,
+}
+
+TRANSIENT_FIELDS = {
+    'deposit_intent': np.float64,
+    'contribution_intent': np.float64,
+    'sponsor_intent': np.float64,
+    'teo_exchange_intent': np.float64,
+    'euro_exchange_intent': np.float64,
+    'withdraw_intent': np.float64,
+    'hour_wallet': np.float64,
+    'staged_euro': np.float64,
+    'staged_teo': np.float64,
+    'contributed_hours': np.float64,
+    'exchanged_euros': np.float64,
+    'exchanged_teos': np.float64,
+    'withdrawn_euros': np.float64,
+}
+
+FIELDS = dict(PERSISTENT_FIELDS, **TRANSIENT_FIELDS)
+
+DRAW_FIELDS = {
+    'churn_draw': np.float64,
+    'action_draw': np.float64,
+    'amount_draw': np.float64,
+}
+
+COLUMNS = dict(FIELDS, **DRAW_FIELDS)
+
+DEFAULTS = {
+    'last_withdraw_tick': -1,
+}
+
+
+class AgentState:
+    """Struct-of-arrays store holding the state of all customer agents.
+
+    Every field is a typed numpy array with one row per customer, so per-tick
+    resets and system totals are single array operations. Besides COLUMNS each
+    row has an `agent_type` (index into AGENT_TYPES), an `active` flag, an
+    `ordinal` within its type for labels, a `weight` (members of a cohort row)
+    and the `agent_id` of its customer.
+
+    Rows of customers that left are reused, see `allocate` and `compact`. Ids
+    are never reused; `id_rows` maps them to their current rows.
+
+    """
+
+    def __init__(self, capacity=1024):
+        """Initializes an empty state store.
+
+        Args:
+            capacity (int): Number of rows to preallocate.
+
+        """
+        self.size = 0
+        self.capacity = capacity
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, np.full(capacity, DEFAULTS.get(name, 0), dtype=dtype))
+        self.agent_type = np.full(capacity, -1, dtype=np.int8)
+        self.active = np.zeros(capacity, dtype=np.bool_)
+        self.ordinal = np.zeros(capacity, dtype=np.int64)
+        self.weight = np.ones(capacity, dtype=np.int64)
+        self.agent_id = np.full(capacity, -1, dtype=np.int64)
+        self.type_counts = np.zeros(len(AGENT_TYPES), dtype=np.int64)
+        self.next_id = 0
+        self.id_rows = GrowableArray(np.int64, capacity)
+        self.id_types = GrowableArray(np.int8, capacity)
+        self.id_ordinals = GrowableArray(np.int64, capacity)
+        self.free_rows = GrowableArray(np.int64)
+
+    def _grow(self, min_capacity):
+        """Grows all columns geometrically until min_capacity rows fit.
+
+        Args:
+            min_capacity (int): Number of rows that must fit into the store.
+
+        """
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        for name, dtype in COLUMNS.items():
+            column = np.full(capacity, DEFAULTS.get(name, 0), dtype=dtype)
+            column[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, column)
+        agent_type = np.full(capacity, -1, dtype=np.int8)
+        agent_type[:self.size] = self.agent_type[:self.size]
+        self.agent_type = agent_type
+        active = np.zeros(capacity, dtype=np.bool_)
+        active[:self.size] = self.active[:self.size]
+        self.active = active
+        ordinal = np.zeros(capacity, dtype=np.int64)
+        ordinal[:self.size] = self.ordinal[:self.size]
+        self.ordinal = ordinal
+        weight = np.ones(capacity, dtype=np.int64)
+        weight[:self.size] = self.weight[:self.size]
+        self.weight = weight
+        agent_id = np.full(capacity, -1, dtype=np.int64)
+        agent_id[:self.size] = self.agent_id[:self.size]
+        self.agent_id = agent_id
+        self.capacity = capacity
+
+    def allocate(self, agent_type, n=1, weight=1):
+        """Allocates rows and unique ids for n new agents of one type.
+
+        Rows on the free list are reused first, most recently freed first, further
+        rows are appended at the end of the store.
+
+        Args:
+            agent_type (str): Class name of the agents.
+            n (int): Number of rows to allocate.
+            weight (int): Number of customers each row stands for.
+
+        Returns:
+            ndarray: Row indices of the new agents, their ids are in `agent_id`.
+
+        """
+        n_reused = min(n, len(self.free_rows))
+        reused = self.free_rows.view()[len(self.free_rows) - n_reused:][::-1].copy()
+        self.free_rows.size -= n_reused
+        for name in COLUMNS:
+            getattr(self, name)[reused] = DEFAULTS.get(name, 0)
+        n_new = n - n_reused
+        if self.size + n_new > self.capacity:
+            self._grow(self.size + n_new)
+        rows = np.concatenate([reused, np.arange(self.size, self.size + n_new)])
+        self.size += n_new
+        type_index = AGENT_TYPES.index(agent_type)
+        self.agent_type[rows] = type_index
+        self.active[rows] = True
+        self.weight[rows] = weight
+        self.ordinal[rows] = np.arange(self.type_counts[type_index], self.type_counts[type_index] + n)
+        self.type_counts[type_index] += n
+        self.agent_id[rows] = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        self.id_rows.extend(rows)
+        self.id_types.extend(self.agent_type[rows])
+        self.id_ordinals.extend(self.ordinal[rows])
+        return rows
+
+    def release(self, rows):
+        """Releases the rows of agents that left the system and puts them on the free list.
+
+        All fields of the rows are reset to their defaults, so that totals over
+        the store only account for agents in the system.
+
+        Args:
+            rows (int or ndarray): Row indices of the agents.
+
+        """
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        for name in FIELDS:
+            getattr(self, name)[rows] = DEFAULTS.get(name, 0)
+        self.active[rows] = False
+        self.weight[rows] = 1
+        self.id_rows.view()[self.agent_id[rows]] = -1
+        self.agent_id[rows] = -1
+        self.free_rows.extend(rows)
+
+    def compact(self):
+        """Moves all active rows to the front of the store, keeping their order.
+
+        The free list is emptied and the store shrinks to the number of agents in
+        the system.
+
+        Returns:
+            ndarray: Previous rows of the agents, the agent now on row i was on row
+            kept[i] before.
+
+        """
+        kept = np.flatnonzero(self.active[:self.size])
+        n = len(kept)
+        defaults = dict({name: DEFAULTS.get(name, 0) for name in COLUMNS},
+                        agent_type=-1, active=False, ordinal=0, weight=1, agent_id=-1)
+        for name, default in defaults.items():
+            column = getattr(self, name)
+            column[:n] = column[kept]
+            column[n:self.size] = default
+        self.id_rows.view()[self.agent_id[:n]] = np.arange(n)
+        self.free_rows.clear()
+        self.size = n
+        return kept
+
+    def rows_of(self, agent_ids):
+        """Returns the rows of agents by their unique ids, -1 for agents that left.
+
+        Args:
+            agent_ids (ndarray): Unique ids of the agents.
+
+        """
+        return self.id_rows.view()[np.asarray(agent_ids, dtype=np.int64)]
+
+    def reset_parameters(self):
+        """Resets temporary parameters of all agents at the beginning of a new tick.
+
+        """
+        n = self.size
+        for name in TRANSIENT_FIELDS:
+            getattr(self, name)[:n] = 0
+        self.hour_wallet[:n] = self.monthly_hours[:n]
+
+    def reset_row(self, row):
+        """Resets temporary parameters of a single agent.
+
+        Args:
+            row (int): Row index of the agent.
+
+        """
+        for name in TRANSIENT_FIELDS:
+            getattr(self, name)[row] = 0
+        self.hour_wallet[row] = self.monthly_hours[row]
+
+    def draw(self, rng):
+        """Draws the random numbers of all agents for the current tick.
+
+        Every stochastic decision gets one uniform vector over all rows, so the
+        number an agent receives depends only on its row and not on the order in
+        which agents are activated.
+
+        Args:
+            rng (Generator): Random number generator of the model.
+
+        """
+        n = self.size
+        for name in DRAW_FIELDS:
+            getattr(self, name)[:n] = rng.random(n)
+
+    def total(self, name):
+        """Returns the sum of a field over all agents in the system.
+
+        Args:
+            name (str): Name of the field.
+
+        """
+        return (getattr(self, name)[:self.size] * self.weight[:self.size]).sum()
+
+    def count(self, agent_type=None):
+        """Returns the number of customers in the system, counting every member of a cohort.
+
+        Args:
+            agent_type (str): Class name of the agent type, None for all customers.
+
+        """
+        n = self.size
+        mask = self.active[:n]
+        if agent_type is not None:
+            mask = mask & (self.agent_type[:n] == AGENT_TYPES.index(agent_type))
+        return int(self.weight[:n][mask].sum())
+
+    def rows_of_type(self, agent_type):
+        """Returns the row indices of all active agents of a certain type.
+
+        Args:
+            agent_type (str): Class name of the agent type.
+
+        """
+        n = self.size
+        mask = self.active[:n] & (self.agent_type[:n] == AGENT_TYPES.index(agent_type))
+        return np.flatnonzero(mask)
+
+    def labels(self, rows):
+        """Returns human-readable labels like 'Contributor_17' for agent rows.
+
+        Args:
+            rows (ndarray): Row indices of the agents.
+
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        return _labels(self.agent_type[rows], self.ordinal[rows])
+
+    def id_labels(self, agent_ids):
+        """Returns human-readable labels for unique ids, including customers that left.
+
+        Args:
+            agent_ids (ndarray): Unique ids of the agents.
+
+        """
+        agent_ids = np.asarray(agent_ids, dtype=np.int64)
+        return _labels(self.id_types.view()[agent_ids], self.id_ordinals.view()[agent_ids])
+
+
+def _labels(agent_types, ordinals):
+    prefixes = np.array([LABEL_PREFIXES[agent_type] for agent_type in AGENT_TYPES], dtype=object)
+    return prefixes[agent_types] + ordinals.astype(str).astype(object)
+
+
+class StateField:
+    """Descriptor exposing one column of the AgentState as an agent attribute.
+
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, agent, owner):
+        if agent is None:
+            return self
+        return getattr(agent.state, self.name)[agent.row]
+
+    def __set__(self, agent, value):
+        getattr(agent.state, self.name)[agent.row] = value
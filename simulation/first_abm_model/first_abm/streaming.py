@@ -0,0 +1,427 @@
+"""
+Streaming Server
+================
+A web interface that runs the model in a background worker thread instead of
+stepping it on the render loop like ModularServer.
+
+The worker advances the model by `ticks_per_frame` ticks per frame at up to
+`fps` frames per second and pushes only the model variables of the new ticks
+to the browser over the websocket. The browser appends these deltas to its
+series and draws them min/max decimated, so long histories stay cheap to
+render while peaks and troughs remain visible. When a page connects it
+receives the history so far, decimated on the server.
+
+Messages from the browser:
+    {"type": "start"} / {"type": "stop"} / {"type": "step"}
+    {"type": "reset", "params": {...}}: new model with the given parameters.
+    {"type": "set", "ticks_per_frame": n, "fps": f}: change the speed.
+
+Messages to the browser:
+    {"type": "history", "data": {var: {"x": [...], "y": [...]}}}
+    {"type": "delta", "data": {var: {"x": [...], "y": [...]}}}
+    {"type": "reset"}, {"type": "status", "running": bool, "step": int}
+
+The model of the stream neither stores data nor collects agent-level
+variables (see STREAM_PARAMETERS), since only model variables are sent and a
+long-running stream would otherwise grow without bound. The websocket only
+accepts pages served from the same host.
+
+Start it with `python3 -m first_abm stream`.
+"""
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+import tornado.ioloop
+import tornado.web
+import tornado.websocket
+import mesa.visualization
+from mesa.visualization.UserParam import UserSettableParameter
+
+
+# model parameters the stream always runs with, they are not shown on the page
+STREAM_PARAMETERS = {'store_data': False, 'collect_agents': False}
+
+
+def decimate_minmax(x, y, n_buckets):
+    """ Downsample a series to the minimum and maximum of each bucket.
+    Args:
+        x: Array of the x values, e.g. the steps.
+        y: Array of the y values.
+        n_buckets: Number of buckets, the result has at most 2 * n_buckets points.
+    Returns:
+        Tuple of the kept x and y values in their original order.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= 2 * n_buckets:
+        return x, y
+    edges = np.linspace(0, len(y), n_buckets + 1).astype(np.int64)
+    keep = []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        segment = y[start:stop]
+        keep.extend(sorted({start + int(np.argmin(segment)), start + int(np.argmax(segment))}))
+    keep = np.array(keep)
+    return x[keep], y[keep]
+
+
+def _series(x, y):
+    return {'x': np.asarray(x).tolist(), 'y': np.asarray(y, dtype=np.float64).tolist()}
+
+
+class ModelWorker(threading.Thread):
+    """ Background thread owning the model. All access to the model happens in
+    this thread, other threads send commands through `send`.
+    """
+
+    def __init__(self, model_cls, model_kwargs, publish, max_points=1000):
+        """ Create a worker.
+        Args:
+            model_cls: Class of the model.
+            model_kwargs: Keyword arguments of the model.
+            publish: Function called from the worker with every message for
+                     all browsers.
+            max_points: Number of buckets of the history sent to new pages.
+        """
+        super().__init__(daemon=True)
+        self.model_cls = model_cls
+        self.model_kwargs = dict(model_kwargs)
+        self.publish = publish
+        self.max_points = max_points
+        self.commands = queue.Queue()
+        self.running = False
+        self.ticks_per_frame = 1
+        self.fps = 5
+        self.sent = 0
+        self.model = None
+
+    def send(self, command, argument=None):
+        """ Queue a command for the worker. """
+        self.commands.put((command, argument))
+
+    def run(self):
+        self._reset(self.model_kwargs)
+        while True:
+            if not self.running:
+                self._handle(*self.commands.get())
+                continue
+            frame_start = time.perf_counter()
+            self._advance(self.ticks_per_frame)
+            deadline = frame_start + 1 / max(self.fps, 1e-3)
+            while True:
+                try:
+                    command = self.commands.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                self._handle(*command)
+
+    def _handle(self, command, argument):
+        if command == 'start':
+            self.running = True
+        elif command == 'stop':
+            self.running = False
+        elif command == 'step':
+            self._advance(1)
+        elif command == 'reset':
+            self.running = False
+            self._reset(dict(self.model_kwargs, **(argument or {})))
+        elif command == 'set':
+            self.ticks_per_frame = max(int(argument.get('ticks_per_frame', self.ticks_per_frame)), 1)
+            self.fps = float(argument.get('fps', self.fps))
+        elif command == 'history':
+            argument(self._history())
+        self.publish(self._status())
+
+    def _reset(self, model_kwargs):
+        if self.model is not None:
+            self.model.close()
+        self.model_kwargs = model_kwargs
+        self.model = self.model_cls(**model_kwargs)
+        self.sent = 0
+        self.publish({'type': 'reset'})
+
+    def _advance(self, n_ticks):
+        for _ in range(n_ticks):
+            if not self.model.running:
+                self.running = False
+                break
+            self.model.step()
+        model_vars = self.model.datacollector.model_vars
+        n = len(next(iter(model_vars.values()), []))
+        if n > self.sent:
+            steps = np.arange(self.sent, n)
+            self.publish({'type': 'delta', 'data': {
+                name: _series(steps, values[self.sent:n]) for name, values in model_vars.items()
+            }})
+            self.sent = n
+        self.publish(self._status())
+
+    def _history(self):
+        model_vars = self.model.datacollector.model_vars
+        data = {}
+        for name, values in model_vars.items():
+            values = values[:self.sent]
+            data[name] = _series(*decimate_minmax(np.arange(len(values)), values, self.max_points))
+        return {'type': 'history', 'data': data}
+
+    def _status(self):
+        return {'type': 'status', 'running': self.running, 'step': self.sent,
+                'ticks_per_frame': self.ticks_per_frame, 'fps': self.fps}
+
+
+class PageHandler(tornado.web.RequestHandler):
+    """ Handler for the page holding the charts and controls. """
+
+    def get(self):
+        application = self.application
+        self.write(PAGE % {
+            'name': application.model_name,
+            'charts': json.dumps(application.charts),
+            'params': json.dumps(application.user_params),
+            'max_points': application.max_points,
+        })
+
+
+class SocketHandler(tornado.websocket.WebSocketHandler):
+    """ Handler for the websocket of one page. """
+
+    def open(self):
+        self.application.clients.add(self)
+        loop = self.application.loop
+        self.application.worker.send('history', lambda message: loop.add_callback(self._write, message))
+
+    def _write(self, message):
+        if self in self.application.clients:
+            self.write_message(message)
+
+    def on_message(self, message):
+        msg = json.loads(message)
+        if msg['type'] in ('start', 'stop', 'step'):
+            self.application.worker.send(msg['type'])
+        elif msg['type'] == 'reset':
+            self.application.worker.send('reset', self.application.model_params(msg.get('params', {})))
+        elif msg['type'] == 'set':
+            self.application.worker.send('set', msg)
+
+    def on_close(self):
+        self.application.clients.discard(self)
+
+
+class StreamingServer(tornado.web.Application):
+    """ Web interface streaming model-variable deltas from a background worker. """
+
+    port = 8522
+
+    def __init__(self, model_cls, charts, name="Mesa Model", model_params={}, max_points=1000):
+        """ Create a new streaming server.
+        Args:
+            model_cls: Class of the model.
+            charts: List of charts, each a list of series dictionaries with
+                    "Label" (name of a model variable) and "Color".
+            name: Title of the page.
+            model_params: Keyword arguments of the model, UserSettableParameters
+                          can be changed on the page.
+            max_points: Number of min/max buckets charts are decimated to.
+        """
+        self.model_name = name
+        self.charts = charts
+        self.model_kwargs = model_params
+        self.max_points = max_points
+        self.clients = set()
+        self.loop = None
+        self.worker = ModelWorker(model_cls, self.model_params({}), self.broadcast, max_points)
+        handlers = [
+            (r'/', PageHandler),
+            (r'/ws', SocketHandler),
+            (r'/static/(.*)', tornado.web.StaticFileHandler,
+             {'path': os.path.join(os.path.dirname(mesa.visualization.__file__), 'templates')}),
+        ]
+        super().__init__(handlers)
+
+    @property
+    def user_params(self):
+        return {name: value.json for name, value in self.model_kwargs.items()
+                if isinstance(value, UserSettableParameter) and name not in STREAM_PARAMETERS}
+
+    def model_params(self, values):
+        """ Return the model keyword arguments with the values set on the page. """
+        params = {}
+        for name, value in self.model_kwargs.items():
+            if isinstance(value, UserSettableParameter):
+                if value.param_type == 'static_text':
+                    continue
+                value = values.get(name, value.value)
+            params[name] = value
+        params.update(STREAM_PARAMETERS)
+        return params
+
+    def broadcast(self, message):
+        """ Send a message to all pages, may be called from any thread. """
+        self.loop.add_callback(self._broadcast, message)
+
+    def _broadcast(self, message):
+        for client in list(self.clients):
+            client.write_message(message)
+
+    def launch(self, port=None):
+        """ Start the worker and serve the page. """
+        if port is not None:
+            self.port = port
+        self.loop = tornado.ioloop.IOLoop.current()
+        self.listen(self.port)
+        print('Interface starting at http://127.0.0.1:%d' % self.port)
+        self.worker.start()
+        self.loop.start()
+
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>%(name)s</title>
+<script src="/static/js/Chart.min.js"></script>
+<style>
+body { font-family: sans-serif; margin: 0; display: flex; }
+#sidebar { width: 280px; padding: 12px; background: #f5f5f5; min-height: 100vh; box-sizing: border-box; }
+#sidebar label { display: block; margin-top: 8px; font-size: 13px; }
+#sidebar input[type=number] { width: 100%%; }
+#main { flex: 1; padding: 12px; }
+.chart { max-width: 900px; margin-bottom: 16px; }
+button { margin: 2px; }
+</style>
+</head>
+<body>
+<div id="sidebar">
+  <h3>%(name)s</h3>
+  <div>
+    <button id="start">Start</button><button id="stop">Stop</button>
+    <button id="step">Step</button><button id="reset">Reset</button>
+  </div>
+  <label>Ticks per frame (fast-forward)<input id="ticks_per_frame" type="number" min="1" value="1"></label>
+  <label>Frames per second<input id="fps" type="number" min="0.1" step="0.1" value="5"></label>
+  <p id="status"></p>
+  <div id="params"></div>
+</div>
+<div id="main"></div>
+<script>
+var CHARTS = %(charts)s;
+var PARAMS = %(params)s;
+var MAX_POINTS = %(max_points)d;
+
+function decimate(x, y, nBuckets) {
+    // keep the minimum and maximum of each bucket, in their original order
+    if (y.length <= 2 * nBuckets) { return {x: x, y: y}; }
+    var out = {x: [], y: []};
+    for (var b = 0; b < nBuckets; b++) {
+        var start = Math.floor(b * y.length / nBuckets), stop = Math.floor((b + 1) * y.length / nBuckets);
+        var lo = start, hi = start;
+        for (var i = start; i < stop; i++) {
+            if (y[i] < y[lo]) { lo = i; }
+            if (y[i] > y[hi]) { hi = i; }
+        }
+        var keep = lo === hi ? [lo] : [Math.min(lo, hi), Math.max(lo, hi)];
+        keep.forEach(function(i) { out.x.push(x[i]); out.y.push(y[i]); });
+    }
+    return out;
+}
+
+var series = {};
+var charts = CHARTS.map(function(chartSeries) {
+    var canvas = document.createElement("canvas");
+    var container = document.createElement("div");
+    container.className = "chart";
+    container.appendChild(canvas);
+    document.getElementById("main").appendChild(container);
+    return new Chart(canvas.getContext("2d"), {
+        type: "line",
+        data: {datasets: chartSeries.map(function(s) {
+            return {label: s.Label, borderColor: s.Color, backgroundColor: s.Color, fill: false,
+                    pointRadius: 0, borderWidth: 1.5, lineTension: 0, data: []};
+        })},
+        options: {animation: false, responsive: true,
+                  scales: {xAxes: [{type: "linear", scaleLabel: {display: true, labelString: "Step"}}]}}
+    });
+});
+
+var dirty = false;
+function redraw() {
+    dirty = false;
+    charts.forEach(function(chart) {
+        chart.data.datasets.forEach(function(dataset) {
+            var s = series[dataset.label];
+            if (!s) { dataset.data = []; return; }
+            if (s.y.length > 4 * MAX_POINTS) { series[dataset.label] = s = decimate(s.x, s.y, 2 * MAX_POINTS); }
+            var d = decimate(s.x, s.y, MAX_POINTS);
+            dataset.data = d.x.map(function(x, i) { return {x: x, y: d.y[i]}; });
+        });
+        chart.update();
+    });
+}
+function scheduleRedraw() {
+    if (!dirty) { dirty = true; window.requestAnimationFrame(redraw); }
+}
+
+var params = document.getElementById("params");
+Object.keys(PARAMS).forEach(function(name) {
+    var p = PARAMS[name];
+    var label = document.createElement("label");
+    var input = document.createElement("input");
+    input.id = "param_" + name;
+    if (p.param_type === "checkbox") {
+        input.type = "checkbox";
+        input.checked = p.value;
+    } else {
+        input.type = "number";
+        input.value = p.value;
+        if (p.min_value !== undefined) { input.min = p.min_value; input.max = p.max_value; input.step = p.step; }
+    }
+    label.appendChild(document.createTextNode(p.name + " "));
+    label.appendChild(input);
+    params.appendChild(label);
+});
+function paramValues() {
+    var values = {};
+    Object.keys(PARAMS).forEach(function(name) {
+        var input = document.getElementById("param_" + name);
+        values[name] = input.type === "checkbox" ? input.checked : Number(input.value);
+    });
+    return values;
+}
+
+var ws = new WebSocket("ws://" + location.host + "/ws");
+function send(msg) { ws.send(JSON.stringify(msg)); }
+ws.onmessage = function(event) {
+    var msg = JSON.parse(event.data);
+    if (msg.type === "reset") {
+        series = {};
+    } else if (msg.type === "history") {
+        series = msg.data;
+    } else if (msg.type === "delta") {
+        Object.keys(msg.data).forEach(function(name) {
+            var s = series[name] || (series[name] = {x: [], y: []});
+            Array.prototype.push.apply(s.x, msg.data[name].x);
+            Array.prototype.push.apply(s.y, msg.data[name].y);
+        });
+    } else if (msg.type === "status") {
+        document.getElementById("status").textContent =
+            (msg.running ? "Running" : "Stopped") + ", step " + msg.step;
+        return;
+    }
+    scheduleRedraw();
+};
+document.getElementById("start").onclick = function() { send({type: "start"}); };
+document.getElementById("stop").onclick = function() { send({type: "stop"}); };
+document.getElementById("step").onclick = function() { send({type: "step"}); };
+document.getElementById("reset").onclick = function() { send({type: "reset", params: paramValues()}); };
+function sendSpeed() {
+    send({type: "set", ticks_per_frame: Number(document.getElementById("ticks_per_frame").value),
+          fps: Number(document.getElementById("fps").value)});
+}
+document.getElementById("ticks_per_frame").onchange = sendSpeed;
+document.getElementById("fps").onchange = sendSpeed;
+</script>
+</body>
+</html>
+"""
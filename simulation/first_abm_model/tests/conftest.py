@@ -0,0 +1,37 @@
+import pytest
+
+from first_abm.model import TeoModel
+
+
+PARAMETERS = {
+    'n_contributors': 300,
+    'n_char_sponsors': 50,
+    'n_ver_sponsors': 50,
+    'n_investors': 50,
+    'buffer_share': 20,
+    'exchange_reward_share': 20,
+    'new_user_growth': 10,
+    'churn_prob': 5,
+    'months_with_growth': 24,
+    'store_data': False,
+    'seed': 3,
+}
+
+
+@pytest.fixture
+def parameters():
+    """Returns a copy of the parameters of the small seeded model."""
+    return dict(PARAMETERS)
+
+
+@pytest.fixture
+def make_model():
+    """Returns a factory for small seeded models, keyword arguments override PARAMETERS."""
+
+    def factory(n_ticks=0, **overrides):
+        model = TeoModel(**dict(PARAMETERS, **overrides))
+        for _ in range(n_ticks):
+            model.step()
+        return model
+
+    return factory
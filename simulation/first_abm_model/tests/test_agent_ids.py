@@ -0,0 +1,34 @@
+import numpy as np
+
+
+def test_agent_ids_are_unique_and_never_reused(make_model):
+    model = make_model(20)
+    state = model.schedule.state
+    ids = state.agent_id[:state.size][state.active[:state.size]]
+    assert len(np.unique(ids)) == len(ids)
+    assert ids.max() < state.next_id
+    events = model.get_events_dataframe()
+    joined = events[events['Event'] == 'join']
+    assert joined['AgentID'].is_monotonic_increasing
+
+
+def test_agent_frame_has_the_labels_of_the_ids(make_model):
+    model = make_model(20)
+    frame = model.datacollector.get_agent_vars_dataframe()
+    agent_ids = frame.index.get_level_values('AgentID').to_numpy()
+    assert frame['AgentLabel'].astype(str).tolist() == model.agent_labels(agent_ids).tolist()
+    # filters on the labels of the former string ids keep working
+    rows = frame.reset_index()
+    contributors = rows[rows.AgentLabel.str.contains('Contributor_')]
+    id_types = model.schedule.state.id_types.view()[agent_ids]
+    assert set(contributors.AgentID) == set(agent_ids[id_types == 0].tolist())
+
+
+def test_labels_of_customers_that_left_are_kept(make_model):
+    model = make_model(1)
+    first_ids = np.arange(10)
+    labels = model.agent_labels(first_ids)
+    for _ in range(30):
+        model.step()
+    assert model.agent_labels(first_ids).tolist() == labels.tolist()
+    assert labels[0] == 'Contributor_0'
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from first_abm.archive import RunArchive, write_archive
+
+
+@pytest.fixture(params=[False, True], ids=['panel', 'compact'])
+def archived(request, make_model, tmp_path):
+    model = make_model(30, compact_agents=request.param)
+    path = str(tmp_path / 'archive')
+    write_archive(model.datacollector, path, ticks_per_chunk=7)
+    frame = model.datacollector.get_agent_vars_dataframe().drop(columns='AgentLabel')
+    return model, frame, RunArchive(path)
+
+
+def test_model_vars_are_archived(archived):
+    model, _, archive = archived
+    pd.testing.assert_frame_equal(archive.get_model_vars_dataframe(), model.datacollector.get_model_vars_dataframe())
+
+
+def test_agent_trajectory_matches_the_panel(archived):
+    _, frame, archive = archived
+    agent_id = int(frame.index.get_level_values('AgentID')[5])
+    expected = frame.xs(agent_id, level='AgentID')
+    pd.testing.assert_frame_equal(archive.agent(agent_id), expected, check_index_type=False)
+
+
+def test_tick_and_ranges_match_the_panel(archived):
+    _, frame, archive = archived
+    assert archive.n_steps == 30
+    pd.testing.assert_frame_equal(archive.tick(9), frame.xs(9, level='Step'), check_index_type=False)
+    agent_ids = frame.index.get_level_values('AgentID').unique()[::3].tolist()
+    selected = archive.ticks(5, 20, ['Euro Wallet'], agent_ids)
+    steps = frame.index.get_level_values('Step')
+    expected = frame.loc[(steps >= 5) & (steps < 20) & frame.index.get_level_values('AgentID').isin(agent_ids),
+                         ['Euro Wallet']]
+    pd.testing.assert_frame_equal(selected, expected, check_index_type=False)
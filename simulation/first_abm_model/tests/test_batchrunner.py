@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from first_abm.batchrunner import BatchRunner, model_parameters, run_model
+from first_abm.checkpoint import restore, snapshot
+from first_abm.model import TeoModel
+
+
+def results_by_point(runner):
+    return {(parameters['buffer_share'], seed): model_vars
+            for parameters, seed, model_vars in runner.results.values()}
+
+
+def assert_same_vars(a, b):
+    assert list(a.keys()) == list(b.keys())
+    for name in a:
+        assert np.array_equal(np.asarray(a[name]), np.asarray(b[name])), name
+
+
+def switched_run(parameters, seed, fork_at, n_ticks, point):
+    model = TeoModel(**model_parameters(parameters, seed))
+    for _ in range(fork_at):
+        model.step()
+    meta, arrays = snapshot(model)
+    model = restore(TeoModel, meta, arrays, point)
+    for _ in range(n_ticks - fork_at):
+        model.step()
+    return model.datacollector.model_vars
+
+
+def test_forked_points_match_fresh_runs(parameters):
+    runner = BatchRunner(parameters, {'buffer_share': [20, 35]}, seeds=(0, 1), n_ticks=12,
+                         processes=1, fork_at=5)
+    runner.run_all()
+    results = results_by_point(runner)
+    for seed in (0, 1):
+        # the point with the values of the fixed parameters never switches
+        _, fresh = run_model((dict(parameters, buffer_share=20), seed, 12))
+        assert_same_vars(results[(20, seed)], fresh)
+        assert_same_vars(results[(35, seed)], switched_run(parameters, seed, 5, 12, {'buffer_share': 35}))
+
+
+def test_forked_sweep_is_independent_of_the_number_of_processes(parameters):
+    variable_parameters = {'buffer_share': [10, 20, 35]}
+    serial = BatchRunner(parameters, variable_parameters, seeds=(0,), n_ticks=8, processes=1, fork_at=4)
+    parallel = BatchRunner(parameters, variable_parameters, seeds=(0,), n_ticks=8, processes=3, fork_at=4)
+    assert serial.run_all().equals(parallel.run_all())
+
+
+def test_forking_rejects_parameters_that_affect_the_prefix(parameters):
+    with pytest.raises(Exception):
+        BatchRunner(parameters, {'n_contributors': [10, 20]}, fork_at=5)
+    del parameters['buffer_share']
+    with pytest.raises(Exception):
+        BatchRunner(parameters, {'buffer_share': [10, 20]}, fork_at=5)
+
+
+def test_sweep_resumes_from_the_results_directory(parameters, tmp_path, monkeypatch):
+    variable_parameters = {'buffer_share': [10, 30], 'churn_prob': [2, 5]}
+    first = BatchRunner(parameters, variable_parameters, seeds=(0, 1), n_ticks=4, processes=1,
+                        results_dir=str(tmp_path))
+    results = first.run_all()
+    assert len(results) == 2 * 2 * 2 * 4
+    assert len(list(tmp_path.iterdir())) == 8
+
+    def fail(task):
+        raise AssertionError('finished runs must not run again')
+
+    monkeypatch.setattr('first_abm.batchrunner.run_model', fail)
+    second = BatchRunner(parameters, variable_parameters, seeds=(0, 1), n_ticks=4, processes=1,
+                         results_dir=str(tmp_path))
+    assert second.run_all().equals(results)
+
+
+def test_runs_match_single_models_and_repeated_points_run_once(parameters):
+    runner = BatchRunner(parameters, [{'buffer_share': 10}, {'buffer_share': 30}, {'buffer_share': 10}],
+                         seeds=(2,), n_ticks=5, processes=1)
+    results = runner.run_all()
+    assert len(runner.parameter_points) == 2
+    model = TeoModel(**model_parameters(dict(parameters, buffer_share=30), 2))
+    for _ in range(5):
+        model.step()
+    expected = results[results['buffer_share'] == 30]['Total Euros'].tolist()
+    assert expected == model.datacollector.model_vars['Total Euros']
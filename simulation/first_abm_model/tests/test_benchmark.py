@@ -0,0 +1,32 @@
+import io
+import json
+
+import pytest
+
+from first_abm import benchmark
+
+
+class Usage:
+    ru_maxrss = 512 * 1024 * 1024
+
+
+@pytest.mark.parametrize('platform, expected', [('linux', 512 * 1024), ('darwin', 512)])
+def test_peak_rss_is_reported_in_megabytes(monkeypatch, platform, expected):
+    monkeypatch.setattr(benchmark.sys, 'platform', platform)
+    monkeypatch.setattr(benchmark.resource, 'getrusage', lambda who: Usage())
+    assert benchmark.peak_rss_mb() == expected
+
+
+def test_compare_writes_the_step_ratio(tmp_path):
+    result = benchmark.run_case((200, 'default', 'vector', 2, 0))
+    assert result['final_customers'] > 0
+    assert 'collect' in result['phases_s']
+    old = dict(result, step_mean_s=result['step_mean_s'] * 2)
+    for name, results in (('old.json', [old]), ('new.json', [result])):
+        with open(str(tmp_path / name), 'w') as result_file:
+            json.dump({'results': results}, result_file)
+    out = io.StringIO()
+    benchmark.compare(str(tmp_path / 'old.json'), str(tmp_path / 'new.json'), out)
+    lines = out.getvalue().splitlines()
+    assert lines[1].split()[:3] == ['200', 'default', 'vector']
+    assert lines[1].endswith('0.50x')
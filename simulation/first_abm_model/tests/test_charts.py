@@ -0,0 +1,18 @@
+from first_abm.charts import DISTRIBUTION_CHARTS, page_charts, page_params
+
+
+def charted_labels(charts):
+    return [series['Label'] for chart in charts for series in chart]
+
+
+def test_distribution_charts_are_only_shown_when_collected():
+    assert not any(chart in page_charts(False) for chart in DISTRIBUTION_CHARTS)
+    assert all(chart in page_charts(True) for chart in DISTRIBUTION_CHARTS)
+    assert page_params(False)['collect_distributions'] is False
+
+
+def test_every_charted_series_is_collected(make_model):
+    for collect_distributions in (False, True):
+        model_vars = make_model(2, collect_distributions=collect_distributions).datacollector.model_vars
+        for label in charted_labels(page_charts(collect_distributions)):
+            assert len(model_vars[label]) == 2, label
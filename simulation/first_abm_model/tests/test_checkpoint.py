@@ -0,0 +1,33 @@
+import os
+
+from first_abm.model import TeoModel
+
+
+def assert_same_run(a, b):
+    assert a.datacollector.get_model_vars_dataframe().equals(b.datacollector.get_model_vars_dataframe())
+    assert a.datacollector.get_agent_vars_dataframe().equals(b.datacollector.get_agent_vars_dataframe())
+
+
+def test_resume_is_identical_to_an_uninterrupted_run(make_model, tmp_path):
+    uninterrupted = make_model(30)
+    make_model(17, checkpoint_every=5, checkpoint_dir=str(tmp_path))
+    resumed = TeoModel.load_checkpoint(str(tmp_path / 'checkpoint_00000015.npz'))
+    for _ in range(15):
+        resumed.step()
+    assert_same_run(uninterrupted, resumed)
+
+
+def test_save_and_load_in_the_middle_of_a_run(make_model, tmp_path):
+    model = make_model(12, engine='vector')
+    path = str(tmp_path / 'model.npz')
+    model.save_checkpoint(path)
+    resumed = TeoModel.load_checkpoint(path)
+    for _ in range(10):
+        model.step()
+        resumed.step()
+    assert_same_run(model, resumed)
+
+
+def test_automatic_checkpoints_are_pruned(make_model, tmp_path):
+    make_model(17, checkpoint_every=5, checkpoint_dir=str(tmp_path), checkpoint_keep=2)
+    assert sorted(os.listdir(str(tmp_path))) == ['checkpoint_00000010.npz', 'checkpoint_00000015.npz']
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from first_abm.clearing import clear_exchanges, fill_orders, order_volume
+
+
+def baseline_clearing(euro_values, teo_values, permutation):
+    """Fills the orders one by one like the loop in Teo.execute_exchanges did."""
+    euro_filled = [0.] * len(euro_values)
+    teo_filled = [0.] * len(teo_values)
+    euro_volume = sum(euro_values)
+    teo_volume = sum(teo_values)
+    if euro_volume >= teo_volume:
+        teo_filled = list(teo_values)
+        larger, filled, volume = euro_values, euro_filled, teo_volume
+    else:
+        euro_filled = list(euro_values)
+        larger, filled, volume = teo_values, teo_filled, euro_volume
+    exchanged = 0
+    for i in permutation(len(larger)):
+        if exchanged + larger[i] > volume:
+            filled[i] = volume - exchanged
+            break
+        filled[i] = larger[i]
+        exchanged += larger[i]
+    return euro_filled, teo_filled
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_clear_exchanges_matches_baseline_loop(seed):
+    rng = np.random.default_rng(seed)
+    euro_values = rng.integers(0, 50, rng.integers(1, 40)).astype(float)
+    teo_values = rng.integers(0, 50, rng.integers(1, 40)).astype(float)
+    orders = {}
+
+    def permutation(n):
+        if n not in orders:
+            orders[n] = rng.permutation(n)
+        return orders[n]
+
+    euro_filled, teo_filled = clear_exchanges(euro_values, teo_values, permutation)
+    expected_euro, expected_teo = baseline_clearing(list(euro_values), list(teo_values), permutation)
+    assert list(euro_filled) == expected_euro
+    assert list(teo_filled) == expected_teo
+
+
+def test_fill_orders_fills_one_order_partially():
+    values = np.array([4., 3., 5.])
+    filled = fill_orders(values, 6., np.array([2, 0, 1]))
+    assert list(filled) == [1., 0., 5.]
+
+
+def test_order_volume_of_no_orders_is_zero():
+    assert order_volume(np.array([])) == 0
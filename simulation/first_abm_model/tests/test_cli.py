@@ -0,0 +1,33 @@
+import csv
+import glob
+import json
+
+import numpy as np
+
+from first_abm.__main__ import main
+
+
+def read_ticks(path):
+    with open(path) as csv_file:
+        return [int(row['tick']) for row in csv.DictReader(csv_file)]
+
+
+def test_model_vars_use_the_ticks_of_the_output_sink(parameters, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    parameters['store_data'] = True
+    main(['run', '--ticks', '5', '--params', json.dumps(parameters), '--out', 'run.csv'])
+    main(['run', '--ticks', '5', '--params', json.dumps(parameters), '--out', 'run.npz'])
+    sink_ticks = read_ticks(sorted(glob.glob('modeldata_*.csv'))[0])
+    assert sink_ticks == [1, 2, 3, 4, 5]
+    assert read_ticks('run.csv') == sink_ticks
+    with np.load('run.npz') as data:
+        assert data['tick'].tolist() == sink_ticks
+
+
+def test_summary_reports_the_run(parameters, tmp_path):
+    summary_path = str(tmp_path / 'summary.json')
+    assert main(['run', '--ticks', '3', '--params', json.dumps(parameters), '--summary', summary_path]) == 0
+    with open(summary_path) as summary_file:
+        summary = json.load(summary_file)
+    assert summary['ticks'] == 3
+    assert summary['final_customers'] > 0
@@ -0,0 +1,41 @@
+import json
+
+import numpy as np
+
+VARIABLES = ['Number of Agents', 'Number of Contributors', 'Number of Charitable Sponsors',
+             'Total Euros', 'Total Teos', 'Contributed Hours', 'Reward per Contrib Hour']
+
+
+def final_values(make_model, engine, seeds, n_ticks):
+    values = []
+    for seed in seeds:
+        model_vars = make_model(n_ticks, engine=engine, seed=seed, collect_agents=False).datacollector.model_vars
+        values.append([model_vars[name][-1] for name in VARIABLES])
+    return np.array(values, dtype=np.float64)
+
+
+def test_cohort_engine_matches_vector_engine_in_the_mean(make_model):
+    seeds = range(40)
+    vector = final_values(make_model, 'vector', seeds, 12)
+    cohort = final_values(make_model, 'cohort', seeds, 12)
+    standard_error = np.sqrt((vector.var(axis=0, ddof=1) + cohort.var(axis=0, ddof=1)) / len(seeds))
+    difference = np.abs(cohort.mean(axis=0) - vector.mean(axis=0))
+    for name, d, se in zip(VARIABLES, difference, standard_error):
+        assert d <= 4 * se, '%s differs by %.3g, standard error %.3g' % (name, d, se)
+
+
+def test_cohort_rows_stand_for_their_members(make_model):
+    model = make_model(6, engine='cohort')
+    schedule = model.schedule
+    assert schedule.get_customer_count() == schedule.state.count()
+    assert schedule.get_customer_count() > len(schedule.agents_by_type['Customer'])
+    assert model.datacollector.model_vars['Number of Agents'][-1] == schedule.get_customer_count()
+
+
+def test_cli_summary_counts_cohort_members(make_model, parameters, tmp_path):
+    from first_abm.__main__ import main
+    summary_path = str(tmp_path / 'summary.json')
+    main(['run', '--ticks', '6', '--engine', 'cohort', '--params', json.dumps(parameters), '--summary', summary_path])
+    with open(summary_path) as summary_file:
+        summary = json.load(summary_file)
+    assert summary['final_customers'] == make_model(6, engine='cohort').schedule.get_customer_count()
@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from first_abm.datacollection import CompactAgentPanel
+
+
+def agent_frame(model):
+    return model.datacollector.get_agent_vars_dataframe().drop(columns='AgentLabel')
+
+
+def test_compact_frame_matches_plain_frame(make_model):
+    plain = agent_frame(make_model(30))
+    compact = agent_frame(make_model(30, compact_agents=True))
+    assert compact.index.equals(plain.index)
+    assert list(compact.columns) == list(plain.columns)
+    for name in plain.columns:
+        np.testing.assert_allclose(compact[name].astype(float), plain[name].astype(float), rtol=1e-6)
+
+
+def test_spilled_chunks_are_read_back(make_model, tmp_path):
+    in_memory = make_model(30, compact_agents=True)
+    spilled = make_model(30, compact_agents=True, agent_memory_mb=1e-6, spill_dir=str(tmp_path))
+    assert os.listdir(str(tmp_path))
+    panel = spilled.datacollector.agent_panel
+    assert any(isinstance(chunk, str) for chunk in panel.chunks)
+    assert panel.memory <= panel.memory_budget
+    pd.testing.assert_frame_equal(agent_frame(spilled), agent_frame(in_memory))
+
+
+def test_sparse_columns_and_pending_steps():
+    panel = CompactAgentPanel(['Active', 'Volume'], chunk_ticks=2, sparse_share=0.25)
+    volume = np.zeros(8)
+    volume[3] = 2.5
+    for step in range(3):
+        panel.append(np.arange(8) + step, {'Active': np.ones(8, dtype=bool), 'Volume': volume})
+    assert 'var_1_index' in panel.chunks[0]
+    assert 'var_0' in panel.chunks[0]
+    assert len(panel) == 24
+    tick, agent_ids, values = panel.arrays()
+    assert np.array_equal(tick, np.repeat(np.arange(3), 8))
+    assert np.array_equal(agent_ids, np.concatenate([np.arange(8) + step for step in range(3)]))
+    assert np.array_equal(values['Volume'], np.tile(volume, 3))
+    assert values['Active'].all()
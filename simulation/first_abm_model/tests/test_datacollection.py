@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from first_abm.datacollection import AgentPanel, DataCollector
+
+
+class Model:
+    pass
+
+
+def test_reporters_are_evaluated_once_per_collect():
+    calls = []
+
+    def reporter(model):
+        calls.append(model)
+        return len(calls)
+
+    collector = DataCollector(model_reporters={'Calls': reporter}, columnar=True)
+    model = Model()
+    for _ in range(3):
+        collector.collect(model)
+    assert len(calls) == 3
+    assert collector.model_vars['Calls'] == [1, 2, 3]
+
+
+def test_panel_frame_matches_the_appended_steps():
+    panel = AgentPanel(['Wallet', 'Active'])
+    panel.append(np.array([3, 5]), {'Wallet': np.array([1., 2.]), 'Active': np.array([True, False])})
+    panel.append(np.array([5]), {'Wallet': np.array([4.]), 'Active': np.array([True])})
+    frame = panel.to_dataframe()
+    assert frame.index.names == ['Step', 'AgentID']
+    assert frame.index.tolist() == [(0, 3), (0, 5), (1, 5)]
+    assert frame['Wallet'].tolist() == [1., 2., 4.]
+    assert frame['Active'].dtype == bool
+
+
+@pytest.mark.skipif(int(pd.__version__.split('.')[0]) < 3, reason='requires copy-on-write')
+def test_panel_frame_does_not_copy_the_values(make_model):
+    panel = make_model(3).datacollector.agent_panel
+    _, _, values = panel.arrays()
+    frame = panel.to_dataframe()
+    for name in panel.names:
+        assert np.shares_memory(frame[name].to_numpy(), values[name]), name
+
+
+def test_empty_panel_frame_has_the_variables():
+    frame = AgentPanel(['Wallet']).to_dataframe()
+    assert list(frame.columns) == ['Wallet']
+    assert len(frame) == 0
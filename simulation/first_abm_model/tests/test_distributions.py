@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from first_abm.distributions import LogBucketSketch
+from first_abm.state import AGENT_TYPES
+
+
+def test_sketch_quantiles_are_within_the_relative_accuracy():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.lognormal(3, 2, 5000), -rng.lognormal(1, 1, 2000), np.zeros(500)])
+    sketch = LogBucketSketch(alpha=0.01)
+    sketch.add(values)
+    q = np.linspace(0, 1, 41)
+    exact = np.quantile(values, q, method='lower')
+    estimate = sketch.quantile(q)
+    assert sketch.count == len(values)
+    assert np.all(np.abs(estimate - exact) <= 0.01 * np.abs(exact) + 1e-12)
+
+
+def test_merged_and_weighted_sketches_equal_one_sketch():
+    rng = np.random.default_rng(1)
+    a, b = rng.exponential(10, 1000), rng.exponential(100, 1000)
+    merged = LogBucketSketch()
+    merged.add(a)
+    other = LogBucketSketch()
+    other.add(b)
+    merged.merge(other)
+    whole = LogBucketSketch()
+    whole.add(np.concatenate([a, b]))
+    assert np.array_equal(merged.keys, whole.keys)
+    assert np.array_equal(merged.counts, whole.counts)
+    weighted = LogBucketSketch()
+    weighted.add(a, weights=np.full(len(a), 3))
+    tripled = LogBucketSketch()
+    tripled.add(np.concatenate([a, a, a]))
+    assert np.array_equal(weighted.counts, tripled.counts)
+    with pytest.raises(Exception):
+        merged.merge(LogBucketSketch(alpha=0.02))
+    assert np.isnan(LogBucketSketch().quantile(0.5))
+
+
+def test_summaries_match_the_state(make_model):
+    model = make_model(12, collect_distributions=True)
+    state = model.schedule.state
+    rows = np.flatnonzero(state.active[:state.size])
+    vars_ = model.datacollector.get_model_vars_dataframe().iloc[-1]
+    histograms = model.datacollector.get_histogram_dataframe('Euro Wallet')
+    last = histograms[histograms['Step'] == model.schedule.steps]
+    for t, agent_type in enumerate(AGENT_TYPES):
+        members = rows[state.agent_type[rows] == t]
+        values = state.euro_wallet[members]
+        assert vars_['%s Euro Wallet Count' % agent_type] == len(members)
+        if len(members):
+            assert vars_['%s Euro Wallet Mean' % agent_type] == pytest.approx(values.mean())
+            assert vars_['%s Euro Wallet Var' % agent_type] == pytest.approx(values.var())
+        counts = last[last['AgentType'] == agent_type]['Count']
+        assert counts.sum() == len(members)
+    with pytest.raises(Exception):
+        model.datacollector.get_histogram_dataframe('Nothing')
@@ -0,0 +1,15 @@
+def assert_same_run(a, b):
+    assert a.datacollector.get_model_vars_dataframe().equals(b.datacollector.get_model_vars_dataframe())
+    assert a.datacollector.get_agent_vars_dataframe().equals(b.datacollector.get_agent_vars_dataframe())
+
+
+def test_object_and_vector_engines_are_identical(make_model):
+    assert_same_run(make_model(30, engine='object'), make_model(30, engine='vector'))
+
+
+def test_object_and_vector_engines_keep_the_same_state(make_model):
+    object_state = make_model(30, engine='object').schedule.state
+    vector_state = make_model(30, engine='vector').schedule.state
+    assert object_state.size == vector_state.size
+    for name in ('euro_wallet', 'teo_wallet', 'agent_id', 'agent_type', 'active'):
+        assert (getattr(object_state, name)[:object_state.size] == getattr(vector_state, name)[:vector_state.size]).all()
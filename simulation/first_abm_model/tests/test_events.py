@@ -0,0 +1,34 @@
+import pytest
+
+
+def event_totals(model):
+    events = model.get_events_dataframe()
+    return events.groupby('Event')['Value'].sum()
+
+
+def test_joins_and_exits_balance_the_population(make_model):
+    model = make_model(20)
+    totals = event_totals(model)
+    assert totals['join'] - totals['exit'] == model.schedule.get_customer_count()
+    assert totals['exit_triggered'] >= totals['exit']
+
+
+def test_event_level_filters_events(make_model):
+    info = make_model(10).get_events_dataframe()
+    debug = make_model(10, event_level='debug').get_events_dataframe()
+    disabled = make_model(10, event_level=None).get_events_dataframe()
+    assert 'withdraw' not in set(info['Event'])
+    assert 'withdraw' in set(debug['Event'])
+    assert set(debug['Severity']) == {'debug', 'info'}
+    assert debug[debug['Severity'] == 'info'].reset_index(drop=True).equals(info)
+    assert len(disabled) == 0
+    with pytest.raises(Exception):
+        make_model(event_level='verbose')
+
+
+def test_engines_record_the_same_events(make_model):
+    columns = ['Step', 'Event', 'AgentID', 'Value']
+    object_events = make_model(20, engine='object').get_events_dataframe()
+    vector_events = make_model(20, engine='vector').get_events_dataframe()
+    assert object_events.sort_values(columns).reset_index(drop=True).equals(
+        vector_events.sort_values(columns).reset_index(drop=True))
@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('engine', ['object', 'vector', 'cohort'])
+def test_ledger_matches_recompute(make_model, engine):
+    model = make_model(30, engine=engine, debug=True)
+    ledger, state = model.schedule.ledger, model.schedule.state
+    ledger.verify(state)
+    assert np.isclose(ledger.euros, state.total('euro_wallet'))
+    assert np.isclose(ledger.teos, state.total('teo_wallet'))
+
+
+def test_verify_detects_a_missed_update(make_model):
+    model = make_model(5)
+    model.schedule.ledger.record(euros=100)
+    with pytest.raises(Exception):
+        model.schedule.ledger.verify(model.schedule.state)
@@ -0,0 +1,28 @@
+import inspect
+
+from first_abm.model import TeoModel, call_arguments
+
+
+def test_parameters_hold_every_constructor_argument(make_model, parameters):
+    model = make_model(engine='vector', timing=True)
+    names = [name for name in inspect.signature(TeoModel.__init__).parameters if name != 'self']
+    assert list(model.parameters) == names
+    assert model.parameters['engine'] == 'vector'
+    assert model.parameters['timing'] is True
+    assert model.parameters['trace'] is False
+    assert model.parameters['n_contributors'] == parameters['n_contributors']
+
+
+def test_model_can_be_recreated_from_its_parameters(make_model):
+    model = make_model(8)
+    copy = TeoModel(**model.parameters)
+    for _ in range(8):
+        copy.step()
+    assert copy.datacollector.get_model_vars_dataframe().equals(model.datacollector.get_model_vars_dataframe())
+
+
+def test_call_arguments_follow_the_signature():
+    def function(self, b, a=2):
+        return call_arguments(function, locals())
+
+    assert list(function(None, 1)) == ['b', 'a']
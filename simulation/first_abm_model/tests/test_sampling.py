@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from first_abm.sampling import AgentSample, hash_unit
+
+
+def test_hash_is_deterministic_uniform_and_salted():
+    agent_ids = np.arange(100000)
+    values = hash_unit(agent_ids)
+    assert np.array_equal(values, hash_unit(agent_ids))
+    assert values.min() >= 0 and values.max() < 1
+    assert abs(values.mean() - 0.5) < 0.01
+    assert abs((values < 0.1).mean() - 0.1) < 0.01
+    assert not np.array_equal(values, hash_unit(agent_ids, salt=1))
+
+
+def test_sample_is_stable_and_salted(make_model):
+    frame = make_model(15, agent_sample=0.2).datacollector.get_agent_vars_dataframe()
+    agent_ids = frame.index.get_level_values('AgentID').unique().values
+    assert np.all(hash_unit(agent_ids) < 0.2)
+    full = make_model(15).datacollector.get_agent_vars_dataframe()
+    all_ids = full.index.get_level_values('AgentID')
+    expected = full[hash_unit(all_ids) < 0.2]
+    assert frame.index.equals(expected.index)
+    assert abs(len(agent_ids) / len(all_ids.unique()) - 0.2) < 0.05
+    other = make_model(15, agent_sample=0.2, sample_salt=1).datacollector.get_agent_vars_dataframe()
+    assert not other.index.equals(frame.index)
+
+
+def test_stratified_sample_uses_the_share_of_each_type(make_model):
+    model = make_model(10, agent_sample={'Investor': 1.0, 'Contributor': 0.5})
+    frame = model.datacollector.get_agent_vars_dataframe()
+    labels = frame['AgentLabel'].astype(str)
+    assert labels.str.startswith('Investor_').any()
+    assert not labels.str.startswith('Char_Sponsor_').any()
+    full = make_model(10).datacollector.get_agent_vars_dataframe()
+    n_investors = full['AgentLabel'].astype(str).str.startswith('Investor_').sum()
+    assert labels.str.startswith('Investor_').sum() == n_investors
+    with pytest.raises(Exception):
+        AgentSample({'Trader': 0.5})
+    with pytest.raises(Exception):
+        AgentSample(1.5)
@@ -0,0 +1,61 @@
+import glob
+
+import pandas as pd
+import pytest
+
+from first_abm.sinks import CSVSink
+
+
+def stored_run(make_model, output_format, n_ticks=5):
+    model = make_model(store_data=True, output_format=output_format)
+    model.datacollector.flush_every = 2
+    for _ in range(n_ticks):
+        model.step()
+    model.close()
+    return model
+
+
+def read(pattern):
+    path = sorted(glob.glob(pattern))[0]
+    if path.endswith('.csv'):
+        return pd.read_csv(path)
+    return pd.read_parquet(path)
+
+
+def test_csv_sink_writes_every_tick(make_model, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    model = stored_run(make_model, 'csv')
+    model_data = read('modeldata_*.csv')
+    assert model_data['tick'].tolist() == [1, 2, 3, 4, 5]
+    assert model_data['Total Euros'].tolist() == model.datacollector.model_vars['Total Euros']
+    agent_data = read('agentdata_*.csv')
+    assert sorted(agent_data['tick'].unique()) == [1, 2, 3, 4, 5]
+    assert agent_data['agent_label'].str.contains('_').all()
+
+
+def test_parquet_output_matches_csv(make_model, tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'csv').mkdir()
+    (tmp_path / 'parquet').mkdir()
+    monkeypatch.chdir(tmp_path / 'csv')
+    stored_run(make_model, 'csv')
+    monkeypatch.chdir(tmp_path / 'parquet')
+    stored_run(make_model, 'parquet')
+    monkeypatch.chdir(tmp_path)
+    csv_data = read('csv/modeldata_*.csv')
+    parquet_data = read('parquet/modeldata_*.parquet')
+    assert list(parquet_data.columns) == list(csv_data.columns)
+    assert parquet_data['Number of Agents'].dtype == 'int64'
+    assert (parquet_data.dtypes == csv_data.dtypes).all()
+    pd.testing.assert_frame_equal(parquet_data, csv_data)
+
+
+def test_sink_buffers_until_flush(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sink = CSVSink('run', flush_every=3)
+    for tick in (1, 2):
+        sink.write(tick, {'Total': 1.5}, [7], {'Wallet': [2.]})
+    assert sink.n_buffered == 2
+    sink.close()
+    assert read('modeldata_run.csv')['tick'].tolist() == [1, 2]
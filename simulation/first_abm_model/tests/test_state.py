@@ -0,0 +1,56 @@
+import numpy as np
+
+from first_abm.schedule import ActivationByType
+from first_abm.state import AgentState
+
+
+def test_released_rows_are_reused_with_new_ids():
+    state = AgentState(capacity=4)
+    rows = state.allocate('Contributor', 6)
+    assert np.array_equal(rows, np.arange(6))
+    state.euro_wallet[rows] = 10.
+    state.release(rows[[1, 4]])
+    assert state.euro_wallet[[1, 4]].sum() == 0
+    assert np.array_equal(state.rows_of([1, 4]), [-1, -1])
+    new = state.allocate('Investor', 3)
+    assert np.array_equal(new, [4, 1, 6])
+    assert np.array_equal(state.agent_id[new], [6, 7, 8])
+    assert np.array_equal(state.rows_of([6, 7, 8]), new)
+    assert state.euro_wallet[new].sum() == 0
+    assert state.size == 7 and len(state.free_rows) == 0
+
+
+def test_compact_keeps_ids_and_values_of_active_rows():
+    state = AgentState()
+    rows = state.allocate('Contributor', 10)
+    state.euro_wallet[rows] = np.arange(10.)
+    state.release([0, 3, 4, 8])
+    agent_ids = state.agent_id[:state.size][state.active[:state.size]]
+    kept = state.compact()
+    assert np.array_equal(kept, [1, 2, 5, 6, 7, 9])
+    assert state.size == 6 and len(state.free_rows) == 0
+    assert np.array_equal(state.agent_id[:6], agent_ids)
+    assert np.array_equal(state.rows_of(agent_ids), np.arange(6))
+    assert np.array_equal(state.rows_of([0, 3, 4, 8]), [-1] * 4)
+    assert np.array_equal(state.euro_wallet[:6], kept.astype(float))
+    assert state.allocate('Contributor', 1)[0] == 6
+    assert state.next_id == 11
+
+
+def test_compaction_keeps_customers_on_their_rows(make_model, monkeypatch):
+    monkeypatch.setattr(ActivationByType, 'compact_share', 0.)
+    compacted = make_model(30, engine='object')
+    schedule = compacted.schedule
+    state = schedule.state
+    assert len(state.free_rows) == 0
+    assert state.active[:state.size].all()
+    assert state.next_id > state.size
+    for agent in schedule.agents_by_type['Customer'].values():
+        assert schedule.customers_by_row[agent.row] is agent
+        assert state.rows_of([agent.unique_id])[0] == agent.row
+    schedule.ledger.verify(state)
+    vector = make_model(30, engine='vector')
+    a = compacted.datacollector
+    b = vector.datacollector
+    assert a.get_model_vars_dataframe().equals(b.get_model_vars_dataframe())
+    assert a.get_agent_vars_dataframe().equals(b.get_agent_vars_dataframe())